@@ -2,6 +2,21 @@
  * Simple Servo Controller
  * LEFT: Moves only left motor (motor1) from 0 to 180 and back
  * RIGHT: Moves only right motor (motor2) from 180 to 0 and back
+ *
+ * Commands (one per line):
+ *   L180      move the left motor out 180 degrees and back
+ *   R180      move the right motor out 180 degrees and back
+ *   H90       both motors home
+ *   L180@42   same, with sequence number 42 - the board answers
+ *             "ACK 42" as soon as it reads the command and "DONE 42" once
+ *             the motor is back home ("ERR 42 <reason>" if it can't)
+ *
+ * The host sends a command again if its ACK got lost. The board remembers
+ * the last sequence number of each motor, so the copy is only ACKed again
+ * (or answered DONE if the move is already over) - it doesn't move twice.
+ *
+ * "READY" is sent once after start-up. Motors move without delay(), so a
+ * left and a right move can run at the same time.
  */
 
 #include <Servo.h>
@@ -12,47 +27,144 @@ Servo motor2;  // Right motor on pin 12
 int motor1_home = 0;    // Home position for left motor
 int motor2_home = 180;  // Home position for right motor
 
+const unsigned long HOLD_MS = 1000;       // Time at the "out" position
+const unsigned long MS_PER_DEGREE = 3;    // Roughly how fast the servo travels
+
+// What each motor is doing
+const int IDLE = 0;
+const int HOLDING = 1;    // Out, waiting for HOLD_MS
+const int RETURNING = 2;  // Sent home, waiting for it to get there
+
+struct Motion {
+  int state;
+  long seq;                   // Sequence number to report (-1 = none)
+  long last_seq;              // Last sequence number started (kept when idle)
+  unsigned long phase_end;    // millis() when the current phase is over
+  unsigned long return_ms;    // Travel time back home
+};
+
+Motion left_motion = {IDLE, -1, -1, 0, 0};
+Motion right_motion = {IDLE, -1, -1, 0, 0};
+
 void setup() {
   Serial.begin(9600);
+  Serial.setTimeout(50);  // Don't wait long for the end of a line
   motor1.attach(13);
   motor2.attach(12);
-  
+
   // Start at home positions
   motor1.write(motor1_home);
   motor2.write(motor2_home);
+
+  Serial.println("READY");
+}
+
+void reply(const char* word, long seq) {
+  if (seq < 0) return;  // Old-style command without a sequence number
+  Serial.print(word);
+  Serial.print(' ');
+  Serial.println(seq);
+}
+
+void start_move(Servo& motor, Motion& motion, int position, int degrees, long seq) {
+  motor.write(position);
+  motion.state = HOLDING;
+  motion.seq = seq;
+  motion.last_seq = seq;
+  motion.phase_end = millis() + HOLD_MS;
+  motion.return_ms = (unsigned long)degrees * MS_PER_DEGREE;
+}
+
+void cancel(Motion& motion) {
+  if (motion.state != IDLE && motion.seq >= 0) {
+    Serial.print("ERR "); Serial.print(motion.seq); Serial.println(" cancelled");
+  }
+  motion.state = IDLE;
+}
+
+void update_motion(Servo& motor, Motion& motion, int home) {
+  // Subtracting handles millis() wrapping around after ~50 days
+  if (motion.state == IDLE || (long)(millis() - motion.phase_end) < 0) return;
+
+  if (motion.state == HOLDING) {
+    motor.write(home);  // Return to home
+    motion.state = RETURNING;
+    motion.phase_end = millis() + motion.return_ms;
+  } else {
+    motion.state = IDLE;
+    reply("DONE", motion.seq);
+  }
+}
+
+void handle_command(String command) {
+  // Optional "@<seq>" at the end
+  long seq = -1;
+  int at = command.indexOf('@');
+  if (at >= 0) {
+    seq = command.substring(at + 1).toInt();
+    command = command.substring(0, at);
+  }
+  reply("ACK", seq);
+
+  // Sent again because our ACK got lost - we already have this one
+  if (seq >= 0 && (seq == left_motion.last_seq || seq == right_motion.last_seq)) {
+    Motion& motion = (seq == left_motion.last_seq) ? left_motion : right_motion;
+    if (motion.state == IDLE) reply("DONE", seq);  // Already finished
+    return;
+  }
+
+  if (command.length() < 2) {
+    if (seq >= 0) { Serial.print("ERR "); Serial.print(seq); Serial.println(" bad command"); }
+    return;
+  }
+
+  char direction = command.charAt(0);
+  int degrees = command.substring(1).toInt();
+
+  // Clamp degrees to 0-180
+  degrees = constrain(degrees, 0, 180);
+
+  if (direction == 'L' || direction == 'l') {
+    // LEFT: Move only motor1 (left motor)
+    // Goes from 0 → degrees → 0
+    if (left_motion.state != IDLE) {
+      if (seq >= 0) { Serial.print("ERR "); Serial.print(seq); Serial.println(" busy"); }
+      return;
+    }
+    start_move(motor1, left_motion, degrees, degrees, seq);
+  }
+  else if (direction == 'R' || direction == 'r') {
+    // RIGHT: Move only motor2 (right motor)
+    // Goes from 180 → (180-degrees) → 180
+    if (right_motion.state != IDLE) {
+      if (seq >= 0) { Serial.print("ERR "); Serial.print(seq); Serial.println(" busy"); }
+      return;
+    }
+    start_move(motor2, right_motion, 180 - degrees, degrees, seq);
+  }
+  else if (direction == 'H' || direction == 'h') {
+    // HOME: Return both to home positions (cancels any move in progress)
+    cancel(left_motion);
+    cancel(right_motion);
+    motor1.write(motor1_home);
+    motor2.write(motor2_home);
+    right_motion.state = RETURNING;  // Report DONE once both are back
+    right_motion.seq = seq;
+    right_motion.last_seq = seq;
+    right_motion.phase_end = millis() + 180 * MS_PER_DEGREE;
+  }
+  else if (seq >= 0) {
+    Serial.print("ERR "); Serial.print(seq); Serial.println(" unknown command");
+  }
 }
 
 void loop() {
   if (Serial.available()) {
     String command = Serial.readStringUntil('\n');
     command.trim();
-    
-    if (command.length() >= 2) {
-      char direction = command.charAt(0);
-      int degrees = command.substring(1).toInt();
-      
-      // Clamp degrees to 0-180
-      degrees = constrain(degrees, 0, 180);
-      
-      if (direction == 'L' || direction == 'l') {
-        // LEFT: Move only motor1 (left motor)
-        // Goes from 0 → degrees → 0
-        motor1.write(degrees);
-        delay(1000);  // Hold position
-        motor1.write(motor1_home);  // Return to home (0)
-      }
-      else if (direction == 'R' || direction == 'r') {
-        // RIGHT: Move only motor2 (right motor)  
-        // Goes from 180 → (180-degrees) → 180
-        motor2.write(180 - degrees);
-        delay(1000);  // Hold position
-        motor2.write(motor2_home);  // Return to home (180)
-      }
-      else if (direction == 'H' || direction == 'h') {
-        // HOME: Return both to home positions
-        motor1.write(motor1_home);
-        motor2.write(motor2_home);
-      }
-    }
+    handle_command(command);
   }
-}
\ No newline at end of file
+
+  update_motion(motor1, left_motion, motor1_home);
+  update_motion(motor2, right_motion, motor2_home);
+}
@@ -6,36 +6,129 @@ Combines camera auto-detection with Arduino servo control
 
 import cv2
 import numpy as np
+import sys
 import time
-from datetime import datetime
+import queue
+import signal
+import argparse
+import threading
 from pathlib import Path
 from utils.analyzer import SimpleEWasteAnalyzer
+from utils.backends import MissingAPIKeyError
 from utils.sorter import ArduinoController
-from utils.camera_utils import find_available_camera
+from utils.camera_stream import CameraStream
+from utils.replay import ReplayStream, FrameRecorder, DEFAULT_FPS
+from utils.phash_cache import PerceptualHashIndex
+from utils.image_prep import ImagePreprocessor
+from utils.motion import make_motion_detector
+from utils.presence import PresenceDetector, TriggerStateMachine
+from utils.frame_select import BestFrameSelector
+from utils.pipeline import WorkerStage, StageStats, format_report
+from utils.debug_server import DebugViewServer
+from utils.photo_store import get_photo_writer
+
+# Keys (or stdin lines in headless mode) and what they do
+COMMANDS = {"q": "quit", "m": "manual capture", "r": "re-analyze queued items",
+            "s": "pipeline stats"}
 
 
 class AutoDetectorWithSorting:
-    def __init__(self):
-        # Find camera automatically
-        camera_index = find_available_camera()
-        if camera_index is None:
-            raise Exception("No camera found!")
+    def __init__(self, headless=False, debug_port=None, debug_fps=2.0,
+                 debug_host="127.0.0.1", replay=None, replay_speed=1.0, replay_loop=False,
+                 record=None):
+        """
+        Args:
+            headless: Don't open a window or draw anything - commands come
+                      from stdin and signals instead of the keyboard
+            debug_port: Serve the annotated view on this port (see
+                        utils/debug_server.py); drawn only while watched
+            debug_fps: Most frames per second drawn for the debug view
+            debug_host: Address the debug view listens on ("0.0.0.0" to
+                        watch from another computer)
+            replay: Play this video file or image folder instead of using
+                    the camera (see utils/replay.py)
+            replay_speed: 1 = recorded speed, 2 = twice as fast, 0 = every
+                          frame as fast as possible (repeatable benchmarks)
+            replay_loop: Start the recording again when it ends
+            record: Save the camera feed to this video file or folder
+        """
+        self.headless = headless
+        self.debug_port = debug_port
+        self.debug_fps = debug_fps
+        self.debug_host = debug_host
+        self.record = record
+        self.recorder = None
         
-        self.cap = cv2.VideoCapture(camera_index)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # Start loading the AI while the camera and Arduino get ready
+        self.crop_to_motion = False  # Only send the part of the frame that moved
+        self.analyzer = SimpleEWasteAnalyzer(
+            preprocessor=ImagePreprocessor(crop_to_box=self.crop_to_motion))
+        self.analyzer.warm_up_in_background()
+        
+        # Find camera automatically and keep it reading in the background
+        # (or play back a recording instead)
+        if replay:
+            self.stream = ReplayStream(replay, speed=replay_speed, loop=replay_loop)
+            if not self.stream.start():
+                raise Exception(f"Can't open recording {replay}")
+        else:
+            self.stream = CameraStream(width=640, height=480)
+            if not self.stream.start():
+                raise Exception("No camera found!")
+        # Replaying every frame as fast as possible: wait for the analyzers
+        # instead of moving on, so every run gives the same results
+        self.lockstep = bool(replay) and replay_speed == 0
         
         # Detection parameters
+        self.detection_mode = "fast"  # "fast" (downscaled) or "legacy" (full-size contours)
+        self.motion_scale = 0.25  # Fast mode works on a frame this much smaller
+        self.motion_roi = None  # (x, y, w, h) - only watch this part of the picture
         self.motion_threshold = 30  # Pixel difference threshold
         self.area_threshold = 5000  # Minimum area of changed pixels
         self.stability_frames = 10  # Frames to wait for stability
         self.cooldown_frames = 30  # Frames to wait after detection
+        self.save_photos = True  # Keep a copy of analyzed frames on disk
+        
+        # Pipeline settings - detected items wait in small queues for the
+        # analyzers and then for the sorter, so the video never stops
+        self.analysis_workers = 2  # Items analyzed at the same time
+        self.analysis_queue_size = 4  # Detected items waiting for an analyzer
+        self.sorting_queue_size = 4  # Analyzed items waiting for the servos
+        self.report_every = 60.0  # Seconds between pipeline reports (0 = only at exit)
+        
+        # Presence: "background" compares with a learned picture of the empty
+        # scene; "difference" only compares consecutive frames (the old way)
+        self.presence_mode = "background"
+        self.background_method = "mog2"  # "mog2", "knn" or "ema"
+        self.presence_area = 5000  # Foreground area that counts as an object
+        
+        # Send the sharpest frame from the stability window; with a burst > 1
+        # the next sharpest are tried if the AI can't tell what the item is
+        self.best_frame_burst = 2
+        
+        # State tracking (created in run())
+        self.motion = None  # Motion detector
+        self.presence = None  # Background model (None in "difference" mode)
+        self.trigger = None  # Decides when to take the picture
+        self.frame_selector = None  # Keeps the sharpest frames while it settles
+        self.last_motion_box = None  # Where the object was while it moved in
+        
+        # Near-duplicate lookup (created in run() once the analyzer exists)
+        self.phash_index = None
         
-        # State tracking
-        self.prev_frame = None
-        self.stable_count = 0
-        self.cooldown_count = 0
-        self.object_detected = False
+        # Pipeline stages (created in run())
+        self.analysis_stage = None
+        self.sorting_stage = None
+        self.detection_stats = StageStats()
+        self.next_seq = 0  # Number given to the next detected item
+        
+        # Commands from stdin and signals (headless) are queued for the loop
+        self.commands = queue.Queue()
+        self.debug_view = None
+        
+        # CPU used by the frame loop (this thread) and the whole program
+        self.loop_started = None  # (wall, loop thread CPU, process CPU) at start
+        self.loop_frames = 0
         
         # Initialize Arduino with auto-detection
         print("Connecting to Arduino (auto-detecting port)...")
@@ -46,188 +139,574 @@ class AutoDetectorWithSorting:
         else:
             print("✅ Arduino connected! Sorting enabled.")
         
-    def perform_sorting(self, safety_level):
+        # The AI has been loading all this time - make sure it can be used.
+        # Without an API key every item would go to the unsafe bin.
+        try:
+            self.analyzer.warm_up()
+        except (MissingAPIKeyError, ImportError):
+            self.stream.stop()
+            if self.arduino:
+                self.arduino.disconnect()
+            raise
+        
+    def perform_sorting(self, safety_level, on_done=None):
         """
         Sort item based on safety level using Arduino
+        
+        The move is queued and this returns at once - the servos work
+        through their queue in the background (a left and a right move can
+        overlap), and on_done(success) is called when the move has finished.
         """
-        if not self.arduino or not self.arduino.connected:
+        # While the Arduino is reconnecting the sort is still queued - it
+        # goes out when the Arduino is back. If it has been away too long
+        # the sort fails straight away, but still goes through the
+        # controller so it's counted as lost (see connection_stats)
+        if not self.arduino:
             print("  ⚠️ Arduino not connected - sorting skipped")
+            if on_done:
+                on_done(False)
             return
+        if not self.arduino.available:
+            print("  ⚠️ Arduino offline - this item can't be sorted")
         
         print(f"\n  --- SORTING ---")
         if safety_level == "Safe to Shred":
             print("  ✅ SAFE - Sorting to LEFT bin")
-            self.arduino.sort_safe()
+            self.arduino.sort_safe_async(on_done)
         else:
             print(f"  ⚠️ UNSAFE ({safety_level}) - Sorting to RIGHT bin")
-            self.arduino.sort_unsafe()
-        print("  Sorting complete!")
+            self.arduino.sort_unsafe_async(on_done)
+        
+    def analyze_frame(self, analyzer, frame, photo_path, box=None):
+        """
+        Analyze a captured frame, reusing the verdict of a near-identical
+        item seen earlier instead of calling the AI again
+        """
+        frame_hash = self.phash_index.hash_frame(frame, box)
+        match = self.phash_index.lookup(frame_hash)
+        if match is not None:
+            print(f"  Matched a previous item (distance {match.pop('phash_distance')})")
+            result = {
+                "filename": Path(photo_path).name,
+                "item_num": 1,
+                "hazards": [],
+                "notes": "",
+                "error": None,
+                "cached": True,
+            }
+            result.update(match)
+            return result
+        
+        result = analyzer.analyze_one_image(frame, 1, 1, name=Path(photo_path).name, box=box)
+        if not result['error']:
+            self.phash_index.add(frame_hash, result)
+        return result
+        
+    def report_deferred(self, analyzer):
+        """
+        Re-analyze items that were sorted to the RIGHT bin because the AI
+        was unavailable, and say which ones could be moved to the LEFT bin
+        """
+        if not analyzer.deferred:
+            return
+        
+        print(f"\nRe-analyzing {len(analyzer.deferred)} queued items...")
+        for result in analyzer.retry_deferred():
+            if result['error']:
+                print(f"  {result['filename']}: still unavailable ({result['error']})")
+            elif result['safety_level'] == "Safe to Shred":
+                print(f"  {result['filename']}: {result['item_name']} - Safe to Shred, "
+                      f"can be moved from the RIGHT bin to the LEFT bin")
+            else:
+                print(f"  {result['filename']}: {result['item_name']} - {result['safety_level']}")
+        
+    def measure(self, frame):
+        """
+        Look at one frame
+        
+        Returns:
+            (present, moving, area, box, mask), or None while there is
+            nothing to compare with yet
+        """
+        if self.presence:
+            result = self.presence.update(frame, learn=self.trigger.state == "empty")
+            if result is None:
+                return None
+            present = result.ready and result.area > self.presence_area
+            moving = result.motion_area > self.area_threshold
+            return present, moving, result.area, result.box, result.mask
+        
+        motion = self.motion.detect(frame)
+        if motion is None:
+            return None
+        # Only frame differences: a little change means "something still is there"
+        present = motion.area >= 500
+        moving = motion.area > self.area_threshold
+        return present, moving, motion.area, motion.box, motion.mask
+    
+    def status_text(self):
+        """Text and colour showing what the trigger is doing"""
+        state = self.trigger.state
+        if state == "empty" and self.presence and not self.presence.ready:
+            return "LEARNING BACKGROUND...", (128, 128, 128)
+        if state == "moving":
+            return "MOTION DETECTED", (0, 255, 0)
+        if state == "settling":
+            return (f"STABILIZING... {self.trigger.stable_count}/{self.stability_frames}",
+                    (255, 255, 0))
+        if state == "held":
+            # Backpressure - the item waits here until an analyzer is free
+            return "WAITING FOR ANALYZER...", (0, 128, 255)
+        if state == "triggered":
+            return "QUEUED FOR ANALYSIS", (0, 0, 255)
+        if state == "present":
+            return "OBJECT PRESENT", (255, 0, 0)
+        if state == "cooldown":
+            return f"COOLDOWN: {self.trigger.cooldown_count}", (0, 255, 255)
+        return "WAITING", (255, 255, 255)
+    
+    def analyze_item(self, item):
+        """
+        Analysis stage: ask the AI about one detected item (runs on a worker thread)
+        
+        Never raises - the sorter waits for every item in order, so a failed
+        analysis still produces a (safe, RIGHT bin) result.
+        """
+        try:
+            result = self.analyze_frame(self.analyzer, item["frame"], item["photo_path"],
+                                        item["box"])
+            # The AI couldn't tell what it was - try the next sharpest frame
+            for alternate in item.get("alternates", []):
+                if result['item_name'] != "Unknown" or result.get('deferred'):
+                    break
+                print(f"  Item #{item['seq'] + 1} unclear, trying another frame...")
+                result = self.analyze_frame(self.analyzer, alternate, item["photo_path"],
+                                            item["box"])
+        except Exception as e:
+            result = {"filename": Path(item["photo_path"]).name, "item_name": "Unknown",
+                      "safety_level": "Do Not Shred", "hazards": [], "error": str(e)}
+        
+        # Display results
+        lines = [f"\n{'='*40}", f"RESULT #{item['seq'] + 1} ({item['source']}):",
+                 f"  Item: {result['item_name']}",
+                 f"  Safety: {result['safety_level']}"]
+        if result['hazards']:
+            lines.append(f"  Hazards: {', '.join(result['hazards'])}")
+        if result.get('deferred'):
+            lines.append("  ⚠️ AI unavailable - queued for re-analysis")
+        if 'bytes_saved' in result:
+            lines.append(f"  Upload: {result['bytes_sent'] / 1e3:.0f} KB "
+                         f"(saved {result['bytes_saved'] / 1e3:.0f} KB)")
+        if item.get("sharpness") is not None:
+            lines.append(f"  Sharpness: {item['sharpness']:.0f} (best of the stability window)")
+        lines.append(f"  Waited {time.monotonic() - item['detected_at']:.1f} s since detection")
+        print("\n".join(lines))
+        
+        item["result"] = result
+        item["frame"] = item["alternates"] = None  # Not needed any more - free the memory
+        return item
+    
+    def sort_item(self, item):
+        """Sorting stage: move one analyzed item to its bin (items arrive in detection order)"""
+        def done(success):
+            print(f"  Item #{item['seq'] + 1} {'sorted' if success else 'NOT sorted'} "
+                  f"{time.monotonic() - item['detected_at']:.1f} s after detection")
+        
+        self.perform_sorting(item["result"]['safety_level'], on_done=done)
+        print('='*40 + '\n')
+    
+    def submit_item(self, frame, photo_path, box=None, source="auto", block=False,
+                    alternates=(), sharpness=None):
+        """
+        Queue a captured item for analysis and sorting
+        
+        Args:
+            frame: Our own copy of the frame
+            photo_path: Where the photo is (being) saved
+            box: Motion box around the object
+            source: "auto" or "manual", for the printout
+            block: Wait for room in the queue instead of giving up
+            alternates: Other frames of the same object, tried if the AI
+                        can't tell what the first one shows
+            sharpness: Sharpness score of the frame, for the printout
+            
+        Returns:
+            bool: False if the analysis queue is full (try again later)
+        """
+        item = {"seq": self.next_seq, "frame": frame, "photo_path": photo_path,
+                "box": box, "source": source, "detected_at": time.monotonic(),
+                "alternates": list(alternates), "sharpness": sharpness}
+        if not self.analysis_stage.submit(item, block=block, timeout=5.0 if block else None):
+            return False
+        self.next_seq += 1
+        return True
+    
+    def pipeline_report(self):
+        """Throughput and queue depth of every stage"""
+        detection = self.detection_stats.snapshot()
+        detection["camera_fps"] = self.stream.fps
+        detection.update(self.cpu_usage())
+        return {
+            "detect": detection,
+            "analyze": self.analysis_stage.report(),
+            "sort": self.sorting_stage.report(),
+        }
+    
+    def cpu_usage(self):
+        """
+        CPU used since the loop started
         
+        Returns:
+            dict: loop_cpu_percent (the frame loop's thread, % of one core),
+                  loop_cpu_ms (per frame) and process_cpu_percent (every
+                  thread, including the camera and the analyzers)
+        """
+        if self.loop_started is None:
+            return {"loop_cpu_percent": 0.0, "loop_cpu_ms": 0.0, "process_cpu_percent": 0.0}
+        wall_start, loop_start, process_start = self.loop_started
+        wall = max(time.monotonic() - wall_start, 1e-9)
+        loop_cpu = time.thread_time() - loop_start
+        return {
+            "loop_cpu_percent": 100 * loop_cpu / wall,
+            "loop_cpu_ms": 1000 * loop_cpu / max(self.loop_frames, 1),
+            "process_cpu_percent": 100 * (time.process_time() - process_start) / wall,
+        }
+    
+    def print_pipeline_report(self):
+        report = self.pipeline_report()
+        detect = report['detect']
+        print(f"\nPipeline (camera {detect['camera_fps']:.1f} FPS):")
+        print(format_report(report))
+        triggers = self.trigger.stats()
+        print(f"  Triggers: {triggers['triggers']} ({triggers['per_hour']:.0f} per hour), "
+              f"{triggers['average_latency']:.2f} s from arrival to capture on average")
+        mode = "headless" if self.headless else "window"
+        print(f"  Frame loop CPU ({mode}): {detect['loop_cpu_ms']:.2f} ms per frame, "
+              f"{detect['loop_cpu_percent']:.0f}% of one core "
+              f"(whole program {detect['process_cpu_percent']:.0f}%)")
+        if self.arduino:
+            link = self.arduino.connection_stats()
+            state = ("connected" if link["connected"]
+                     else f"RECONNECTING for {link['offline_seconds']:.0f} s")
+            print(f"  Arduino: {state}; {link['losses']} drops, {link['reconnects']} "
+                  f"reconnects ({link['reconnect_time']['mean']:.1f} s on average), "
+                  f"{link['replayed']} commands replayed, {link['commands_lost']} lost")
+        if self.arduino and self.arduino.acknowledged:
+            servos = self.arduino.protocol_stats()
+            print(f"  Servos: {servos['completed']} moves done, {servos['resent']} resent, "
+                  f"{servos['dropped'] + servos['timed_out'] + servos['errors']} failed; "
+                  f"{servos['actuation_latency']['mean']:.2f} s per move "
+                  f"(p95 {servos['actuation_latency']['p95']:.2f} s)")
+
+    def render(self, frame, present, moving, total_area, box, mask):
+        """
+        Draw the boxes, status and motion mask on a copy of the frame
+        
+        Only called when someone will look at it (the window, or a debug
+        view client) - headless runs skip all of this.
+        """
+        # Create display frame
+        display = frame.copy()
+        
+        # Draw boxes around what moved, or around the object
+        if moving:
+            for (x, y, w, h) in self.motion.boxes():
+                cv2.rectangle(display, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        elif present and box and self.presence:
+            x, y, w, h = box
+            cv2.rectangle(display, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        
+        if self.motion_roi:
+            x, y, w, h = self.motion_roi
+            cv2.rectangle(display, (x, y), (x + w, y + h), (255, 255, 0), 1)
+        
+        status, color = self.status_text()
+        
+        # Add status text to display
+        cv2.putText(display, status, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        cv2.putText(display, f"Changed Area: {int(total_area)}", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
+        # Arduino status
+        if self.arduino and self.arduino.connected:
+            arduino_status, arduino_color = "Arduino: Connected", (0, 255, 0)
+        elif self.arduino and self.arduino.available:
+            arduino_status, arduino_color = "Arduino: Reconnecting...", (0, 165, 255)
+        else:
+            arduino_status, arduino_color = "Arduino: Not Connected", (0, 0, 255)
+        cv2.putText(display, arduino_status, (10, 90),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, arduino_color, 1)
+        
+        # Pipeline status
+        queue_status = (f"Analyzing: {self.analysis_stage.pending}  "
+                        f"Sorting: {self.sorting_stage.pending}")
+        cv2.putText(display, queue_status, (10, 120),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
+        # Show motion threshold view in corner
+        thresh_small = cv2.resize(mask, (160, 120))
+        thresh_color = cv2.cvtColor(thresh_small, cv2.COLOR_GRAY2BGR)
+        display[10:130, display.shape[1]-170:display.shape[1]-10] = thresh_color
+        return display
+    
+    def start_command_sources(self):
+        """
+        Headless mode: take commands from stdin lines and from signals
+        
+        SIGINT/SIGTERM quit cleanly (queued items are still finished),
+        SIGUSR1 takes a manual capture and SIGUSR2 prints the stats.
+        """
+        def on_signal(command):
+            return lambda signum, frame: self.commands.put(command)
+        
+        signal.signal(signal.SIGINT, on_signal("q"))
+        signal.signal(signal.SIGTERM, on_signal("q"))
+        if hasattr(signal, "SIGUSR1"):  # Not on Windows
+            signal.signal(signal.SIGUSR1, on_signal("m"))
+            signal.signal(signal.SIGUSR2, on_signal("s"))
+    
+        def read_stdin():
+            # Stops quietly at end of input (e.g. when started as a service)
+            for line in sys.stdin:
+                command = line.strip().lower()[:1]
+                if command in COMMANDS:
+                    self.commands.put(command)
+                elif command:
+                    print(f"Unknown command '{line.strip()}' - use "
+                          + ", ".join(f"{key} = {name}" for key, name in COMMANDS.items()))
+        
+        if sys.stdin is not None and not sys.stdin.closed:
+            threading.Thread(target=read_stdin, name="stdin-commands", daemon=True).start()
+    
+    def next_command(self):
+        """The next key press or queued command ('' if there is none)"""
+        if not self.headless:
+            # Check for keyboard input
+            key = cv2.waitKey(1) & 0xFF
+            if key != 0xFF and chr(key) in COMMANDS:
+                return chr(key)
+        try:
+            return self.commands.get_nowait()
+        except queue.Empty:
+            return ""
+    
     def run(self):
         print("="*60)
         print("AUTO DETECTION WITH SORTING - E-WASTE ANALYZER")
         print("="*60)
         print("\nPlace object in front of camera for auto-analysis & sorting")
-        print("Press 'q' to quit, 'm' for manual capture\n")
+        if self.headless:
+            print("Headless: type q (quit), m (manual capture), r (re-analyze queued items) "
+                  "or s (pipeline stats) and press Enter")
+            if hasattr(signal, "SIGUSR1"):
+                print("Or send SIGTERM to quit, SIGUSR1 for a manual capture, SIGUSR2 for stats\n")
+            self.start_command_sources()
+        else:
+            print("Press 'q' to quit, 'm' for manual capture, 'r' to re-analyze queued items, "
+                  "'s' for pipeline stats\n")
+        
+        if self.debug_port:
+            self.debug_view = DebugViewServer(self.debug_port, fps=self.debug_fps,
+                                              host=self.debug_host)
+            self.debug_view.start()
+            shown_host = "<this-computer>" if self.debug_host == "0.0.0.0" else self.debug_host
+            print(f"Debug view: http://{shown_host}:{self.debug_port}/\n")
+        
+        analyzer = self.analyzer
+        self.phash_index = PerceptualHashIndex(namespace=analyzer.cache_namespace)
+        
+        # Camera thread -> detection (this loop) -> analyzers -> sorter.
+        # The sorter handles items in the order they were detected.
+        self.sorting_stage = WorkerStage("sort", self.sort_item,
+                                         max_queue=self.sorting_queue_size, ordered=True)
+        self.analysis_stage = WorkerStage("analyze", self.analyze_item,
+                                          workers=self.analysis_workers,
+                                          max_queue=self.analysis_queue_size,
+                                          output=self.sorting_stage)
+        self.sorting_stage.start()
+        self.analysis_stage.start()
+        last_report = time.monotonic()
         
-        analyzer = SimpleEWasteAnalyzer()
+        self.motion = make_motion_detector(self.detection_mode, threshold=self.motion_threshold,
+                                           scale=self.motion_scale, roi=self.motion_roi)
+        if self.presence_mode == "background":
+            if self.detection_mode != "fast":
+                raise ValueError("The background presence model needs detection_mode 'fast'")
+            self.presence = PresenceDetector(self.background_method, motion=self.motion)
+        self.trigger = TriggerStateMachine(self.stability_frames, self.cooldown_frames)
+        self.frame_selector = BestFrameSelector(self.best_frame_burst)
         
-        # Create save directory
-        Path("captured_photos").mkdir(exist_ok=True)
+        # Photos are encoded and written on a background thread, and the
+        # oldest are deleted once captured_photos/ reaches its size limit
+        self.photos = get_photo_writer()
         
+        if self.record:
+            # The camera has been running since __init__, so its rate is known
+            self.recorder = FrameRecorder(self.record, fps=round(self.stream.fps) or DEFAULT_FPS)
+            self.recorder.start()
+            print(f"Recording the camera to {self.record}\n")
+        
+        self.loop_started = (time.monotonic(), time.thread_time(), time.process_time())
         while True:
-            ret, frame = self.cap.read()
+            # The newest frame, straight from the stream's ring buffer (no copy)
+            ret, frame = self.stream.read()
             if not ret:
+                if getattr(self.stream, "ended", False):
+                    print("\nEnd of the recording")
                 break
+            if self.recorder:
+                self.recorder.write(frame)
+            detect_start = time.perf_counter()
             
-            # Convert to grayscale for detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-            
-            # Initialize prev_frame on first iteration
-            if self.prev_frame is None:
-                self.prev_frame = gray
+            # Is something there, and is it moving? (see utils/presence.py)
+            measured = self.measure(frame)
+            if measured is None:  # First frame - nothing to compare with yet
                 continue
+            present, moving, total_area, box, mask = measured
             
-            # Calculate frame difference
-            frame_diff = cv2.absdiff(self.prev_frame, gray)
-            thresh = cv2.threshold(frame_diff, self.motion_threshold, 255, cv2.THRESH_BINARY)[1]
-            thresh = cv2.dilate(thresh, None, iterations=2)
-            
-            # Find contours (areas of change)
-            contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Calculate total area of changed pixels
-            total_area = sum(cv2.contourArea(c) for c in contours)
-            
-            # Create display frame
-            display = frame.copy()
+            # Remember the area that moved - that's where the object is
+            if moving and box:
+                self.last_motion_box = box
             
-            # Draw contours and status
-            motion_detected = False
-            if total_area > self.area_threshold:
-                motion_detected = True
-                # Draw bounding boxes around detected areas
-                for contour in contours:
-                    if cv2.contourArea(contour) > 1000:
-                        (x, y, w, h) = cv2.boundingRect(contour)
-                        cv2.rectangle(display, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            if self.lockstep:
+                while self.analysis_stage.full():
+                    time.sleep(0.005)
             
-            # Status text
-            status = "WAITING"
-            color = (255, 255, 255)
+            # Decide whether to take the picture (once per object, after it settles)
+            fire = self.trigger.update(present, moving, can_trigger=not self.analysis_stage.full())
             
-            # Cooldown after detection
-            if self.cooldown_count > 0:
-                self.cooldown_count -= 1
-                status = f"COOLDOWN: {self.cooldown_count}"
-                color = (0, 255, 255)
+            # While the object settles, keep the sharpest frames of it
+            if present and self.trigger.state in ("settling", "held", "triggered"):
+                self.frame_selector.offer(frame, box if self.presence else None)
+            elif self.trigger.state in ("moving", "empty"):
+                self.frame_selector.reset()
             
-            # Check for stable object
-            elif motion_detected:
-                self.stable_count = 0
-                status = "MOTION DETECTED"
-                color = (0, 255, 0)
-            else:
-                if total_area < 500:  # Very little change
-                    self.stable_count += 1
-                    if self.stable_count > self.stability_frames and not self.object_detected:
-                        status = "STABLE - NO OBJECT"
-                        color = (128, 128, 128)
+            if fire:
+                # CAPTURE AND QUEUE FOR ANALYSIS & SORTING!
+                # The selector's frames are our own copies - the ring buffer
+                # slot behind `frame` is reused in a moment
+                best = self.frame_selector.take()
+                if best:
+                    captured, score = best[0]
                 else:
-                    # Object present but stable
-                    self.stable_count += 1
-                    if self.stable_count > self.stability_frames:
-                        if not self.object_detected:
-                            # CAPTURE, ANALYZE, AND SORT!
-                            status = "ANALYZING & SORTING..."
-                            color = (0, 0, 255)
-                            
-                            # Save photo
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            photo_path = f"captured_photos/auto_{timestamp}.jpg"
-                            cv2.imwrite(photo_path, frame)
-                            
-                            # Analyze
-                            print(f"\n{'='*40}")
-                            print(f"Object detected! Analyzing...")
-                            result = analyzer.analyze_one_image(Path(photo_path), 1, 1)
-                            
-                            # Display results
-                            print(f"\nRESULT:")
-                            print(f"  Item: {result['item_name']}")
-                            print(f"  Safety: {result['safety_level']}")
-                            if result['hazards']:
-                                print(f"  Hazards: {', '.join(result['hazards'])}")
-                            
-                            # SORT THE ITEM!
-                            self.perform_sorting(result['safety_level'])
-                            
-                            print(f"{'='*40}\n")
-                            
-                            self.object_detected = True
-                            self.cooldown_count = self.cooldown_frames
-                        else:
-                            status = "OBJECT PRESENT"
-                            color = (255, 0, 0)
-                    else:
-                        status = f"STABILIZING... {self.stable_count}/{self.stability_frames}"
-                        color = (255, 255, 0)
-            
-            # Reset object detection when area is very small
-            if total_area < 500 and self.cooldown_count == 0:
-                self.object_detected = False
-            
-            # Add status text to display
-            cv2.putText(display, status, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
-            cv2.putText(display, f"Changed Area: {int(total_area)}", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-            # Arduino status
-            arduino_status = "Arduino: Connected" if (self.arduino and self.arduino.connected) else "Arduino: Not Connected"
-            arduino_color = (0, 255, 0) if (self.arduino and self.arduino.connected) else (0, 0, 255)
-            cv2.putText(display, arduino_status, (10, 90), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, arduino_color, 1)
+                    captured, score = frame.copy(), None
+                alternates = [alternate for alternate, _ in best[1:]]
+                
+                # Save photo (in the background - the analyzer gets the frame directly)
+                photo_path = self.photos.new_path("auto")
+                if self.save_photos:
+                    self.photos.save(captured, photo_path)
+                
+                # With a background model we know exactly where the object is
+                object_box = box if self.presence else self.last_motion_box
+                print(f"\nObject detected! Queued as item #{self.next_seq + 1} "
+                      f"({self.trigger.last_latency or 0:.1f} s after it arrived)")
+                self.submit_item(captured, photo_path, object_box,
+                                 alternates=alternates, sharpness=score)
+                self.last_motion_box = None
             
-            # Show motion threshold view in corner
-            thresh_small = cv2.resize(thresh, (160, 120))
-            thresh_color = cv2.cvtColor(thresh_small, cv2.COLOR_GRAY2BGR)
-            display[10:130, display.shape[1]-170:display.shape[1]-10] = thresh_color
+            # Only draw when someone is looking: the window, or a debug view
+            # client that is due another frame
+            show_debug = self.debug_view is not None and self.debug_view.wanted()
+            if not self.headless or show_debug:
+                display = self.render(frame, present, moving, total_area, box, mask)
+                if not self.headless:
+                    cv2.imshow('Auto Detection with Sorting', display)
+                if show_debug:
+                    self.debug_view.publish(display)
             
-            # Display the frame
-            cv2.imshow('Auto Detection with Sorting', display)
+            self.detection_stats.record(time.perf_counter() - detect_start)
+            self.loop_frames += 1
             
-            # Update prev_frame
-            self.prev_frame = gray
+            if self.report_every and time.monotonic() - last_report >= self.report_every:
+                self.print_pipeline_report()
+                last_report = time.monotonic()
             
-            # Check for keyboard input
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
+            # Keyboard (window) or stdin/signal (headless) commands
+            command = self.next_command()
+            if command == 'q':
                 break
-            elif key == ord('m'):
+            elif command == 'm':
                 # Manual capture
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                photo_path = f"captured_photos/manual_{timestamp}.jpg"
-                cv2.imwrite(photo_path, frame)
+                captured = frame.copy()
+                photo_path = self.photos.new_path("manual")
+                if self.save_photos:
+                    self.photos.save(captured, photo_path)
                 print(f"\n📸 Manual capture: {photo_path}")
                 
-                # Analyze and sort
-                result = analyzer.analyze_one_image(Path(photo_path), 1, 1)
-                print(f"  Item: {result['item_name']}")
-                print(f"  Safety: {result['safety_level']}")
-                self.perform_sorting(result['safety_level'])
+                # Analyze and sort (waits briefly if the queue is full)
+                if not self.submit_item(captured, photo_path, source="manual", block=True):
+                    print("  ⚠️ Analyzers busy - manual capture skipped")
+            elif command == 'r':
+                self.report_deferred(analyzer)
+            elif command == 's':
+                self.print_pipeline_report()
+        
+        # Finish the items already detected before shutting down
+        if self.analysis_stage.pending or self.sorting_stage.pending:
+            print(f"\nFinishing {self.analysis_stage.pending + self.sorting_stage.pending} "
+                  f"queued items...")
+        self.analysis_stage.stop()
+        self.sorting_stage.stop()
+        self.print_pipeline_report()
+        
+        # Look at anything that was skipped while the AI was unavailable
+        self.report_deferred(analyzer)
+        analyzer.close()
         
         # Cleanup
-        self.cap.release()
-        cv2.destroyAllWindows()
+        self.phash_index.save()
+        stats = self.phash_index.stats()
+        print(f"Duplicate lookup: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} of analyses skipped)")
+        self.photos.flush(timeout=10.0)
+        photos = self.photos.stats()
+        print(f"Photos: {photos['written']} saved, {photos['dropped']} dropped (disk too slow), "
+              f"{photos['deleted']} old ones deleted - {photos['files']} files, "
+              f"{photos['bytes'] / 1e6:.0f} MB in {self.photos.directory}/")
+        self.stream.stop()
+        if self.recorder:
+            self.recorder.close()
+            print(f"Recorded {self.recorder.written} frames to {self.record}")
+        if self.debug_view:
+            self.debug_view.stop()
+        if not self.headless:
+            cv2.destroyAllWindows()
         if self.arduino:
             self.arduino.disconnect()
             print("Arduino disconnected")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auto-detect e-waste and sort it with the Arduino")
+    parser.add_argument("--headless", action="store_true",
+                        help="No window - commands come from stdin and signals")
+    parser.add_argument("--debug-port", type=int,
+                        help="Serve a low-rate view of the camera on this port")
+    parser.add_argument("--debug-fps", type=float, default=2.0,
+                        help="Frames per second for the debug view (default 2)")
+    parser.add_argument("--debug-host", default="127.0.0.1",
+                        help="Address for the debug view (default 127.0.0.1, this computer "
+                             "only; 0.0.0.0 lets anyone on the network watch)")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Play a video file or image folder instead of the camera")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed: 1 = recorded speed, 0 = every frame, as fast "
+                             "as possible")
+    parser.add_argument("--loop", action="store_true", help="Replay the recording forever")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Save the camera feed to a video file (.mp4/.avi) or folder")
+    args = parser.parse_args()
+    
     try:
-        detector = AutoDetectorWithSorting()
+        detector = AutoDetectorWithSorting(headless=args.headless, debug_port=args.debug_port,
+                                           debug_fps=args.debug_fps, debug_host=args.debug_host,
+                                           replay=args.replay,
+                                           replay_speed=args.speed, replay_loop=args.loop,
+                                           record=args.record)
         detector.run()
+    except (MissingAPIKeyError, ImportError) as error:
+        print(f"\n{error}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -3,16 +3,31 @@
 import sys
 import time
 from pathlib import Path
-from utils.phone_coms import take_photo_from_front_camera
+from utils.phone_coms import capture_frame_from_front_camera, photo_path_for_now
+from utils.photo_store import get_photo_writer
 from utils.analyzer import SimpleEWasteAnalyzer
+from utils.backends import MissingAPIKeyError
+from utils.image_prep import ImagePreprocessor
 from utils.sorter import ArduinoController
 
+# Keep a copy of every photo in captured_photos/ (written in the background)
+SAVE_PHOTOS = True
+
+# "system" sets the instructions once per session, "cached" keeps them in a
+# server-side context cache, "inline" sends them with every photo
+PROMPT_MODE = "system"
+
 
 def main():
     print("\n" + "="*50)
     print("E-WASTE ANALYZER WITH SORTING")
     print("="*50)
     
+    # One analyzer for the whole session - the AI loads while the Arduino connects.
+    # The instructions are given to the AI once, not resent with every photo.
+    analyzer = SimpleEWasteAnalyzer(preprocessor=ImagePreprocessor(), prompt_mode=PROMPT_MODE)
+    analyzer.warm_up_in_background()
+    
     # Initialize Arduino with auto port detection
     print("\nConnecting to Arduino (auto-detecting port)...")
     arduino = ArduinoController()  # Auto-detects port
@@ -23,20 +38,33 @@ def main():
     else:
         print("Arduino connected successfully!")
     
+    # Wait for the AI to finish loading - without an API key every item
+    # would go to the RIGHT bin, so stop here instead
+    try:
+        analyzer.warm_up()
+    except (MissingAPIKeyError, ImportError) as error:
+        print(f"\n{error}")
+        if arduino:
+            arduino.disconnect()
+        sys.exit(1)
+    
     # Main loop
     while True:
         # Take photo
         print("\nCapturing photo...")
-        photo_path = take_photo_from_front_camera()
+        frame = capture_frame_from_front_camera()
         
-        if not photo_path:
+        if frame is None:
             print("Failed to capture photo")
             continue
         
-        # Analyze
+        photo_path = photo_path_for_now()
+        if SAVE_PHOTOS:
+            get_photo_writer().save(frame, photo_path)
+        
+        # Analyze (the frame is sent straight from memory)
         print("Analyzing...")
-        analyzer = SimpleEWasteAnalyzer()
-        result = analyzer.analyze_one_image(Path(photo_path), 1, 1)
+        result = analyzer.analyze_one_image(frame, 1, 1, name=Path(photo_path).name)
         
         # Display results
         print("\n" + "="*50)
@@ -49,23 +77,37 @@ def main():
         if result['notes']:
             print(f"Notes: {result['notes']}")
         
+        if 'bytes_saved' in result:
+            print(f"Upload: {result['bytes_sent'] / 1e3:.0f} KB "
+                  f"(saved {result['bytes_saved'] / 1e3:.0f} KB, ~{result['latency_saved']:.2f} s)")
+        
+        if 'latency' in result:
+            latency = analyzer.latency_summary()
+            print(f"AI time: {result['latency']:.2f} s "
+                  f"(average {latency['mean']:.2f} s over {latency['count']} calls)")
+        
         # Perform sorting based on safety level
-        if arduino and arduino.connected:
+        if arduino:
             print("\n--- SORTING DECISION ---")
+            if not arduino.available:
+                # Still sent, so it fails (and is counted) instead of vanishing
+                print("⚠️ Arduino offline for too long - this item will NOT be sorted")
             safety_level = result['safety_level']
             
             if safety_level == "Safe to Shred":
                 # SAFE: Sort to left bin
                 print("✅ SAFE TO SHRED - Sorting to LEFT bin")
-                arduino.sort_safe()
-                print("Item sorted to SAFE bin")
+                # The servo moves in the background while you place the next item
+                arduino.sort_safe_async(
+                    lambda ok: print("Item sorted to SAFE bin" if ok else "⚠️ Sorting failed"))
                 
             else:
                 # NOT SAFE: Sort to right bin
                 # This includes: "Requires Preprocessing", "Do Not Shred", "Discard", or unknown
                 print(f"⚠️ NOT SAFE TO SHRED ({safety_level}) - Sorting to RIGHT bin")
-                arduino.sort_unsafe()
-                print("Item sorted to SPECIAL HANDLING bin")
+                arduino.sort_unsafe_async(
+                    lambda ok: print("Item sorted to SPECIAL HANDLING bin" if ok
+                                     else "⚠️ Sorting failed"))
         
         print("="*50)
         
@@ -74,9 +116,13 @@ def main():
             break
     
     # Cleanup
+    analyzer.close()  # Frees the AI-side instruction cache
     if arduino:
         print("\nDisconnecting Arduino...")
         arduino.disconnect()
+        link = arduino.connection_stats()
+        print(f"Arduino: {link['losses']} drops, {link['reconnects']} reconnects, "
+              f"{link['commands_lost']} sorts lost")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark analyze_folder throughput offline with the mock backend
+
+Run from the project folder:
+    python tests/bench_analyzer.py --images 200 --latency 0.5 --workers 1,4,8
+"""
+
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+import numpy as np
+
+from utils.analyzer import analyze_folder
+from utils.backends import MockBackend
+
+
+def make_images(folder: Path, count: int, size=(480, 640)):
+    """Write `count` distinct synthetic photos"""
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, size + (3,), dtype=np.uint8), (31, 31), 0)
+    for i in range(count):
+        frame = base.copy()
+        cv2.putText(frame, f"item {i}", (40, 240), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+        cv2.imwrite(str(folder / f"item_{i:05d}.jpg"), frame)
+
+
+def run_once(folder: Path, workers: int, batch_size: int, args) -> float:
+    """Analyze the folder once and return the wall time"""
+    backend = MockBackend(latency=args.latency, latency_jitter=args.jitter,
+                          error_rate=args.error_rate, seed=1)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_folder(str(folder), workers=workers, requests_per_minute=args.rpm,
+                       cache_path=None, batch_size=batch_size, backend=backend)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock median seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Mock lognormal sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=100000, help="Rate limit (requests per minute)")
+    parser.add_argument("--workers", default="1,4,8,16")
+    parser.add_argument("--batch-sizes", default="1,4")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        folder = Path(temp)
+        make_images(folder, args.images)
+
+        print(f"{args.images} images, mock latency {args.latency}s, rpm {args.rpm:g}")
+        print(f"{'workers':>8} {'batch':>6} {'seconds':>9} {'images/s':>9}")
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            for workers in (int(w) for w in args.workers.split(",")):
+                seconds = run_once(folder, workers, batch_size, args)
+                print(f"{workers:>8} {batch_size:>6} {seconds:>9.2f} {args.images / seconds:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
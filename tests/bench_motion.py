@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark motion detection speed: legacy contours vs the fast path
+
+Frames are synthetic (a box sliding over a noisy background) unless a video
+file is given. Also reports how often the two methods agree on "motion"
+(changed area above the threshold).
+
+Run from the project folder:
+    python tests/bench_motion.py --size 640x480 --frames 300
+    python tests/bench_motion.py --video belt.mp4 --roi 100,50,400,380
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+import numpy as np
+
+from utils.motion import FastMotionDetector, LegacyMotionDetector
+
+AREA_THRESHOLD = 5000  # Same as AutoDetectorWithSorting.area_threshold
+
+
+def synthetic_frames(count: int, width: int, height: int):
+    """A box moving in and out of view on a noisy, slightly flickering scene"""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8),
+                                  (15, 15), 0)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        noise = rng.integers(-6, 7, (height, width, 1), dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        phase = i % 120
+        if phase < 80:  # Object slides in and then sits still
+            x = min(phase, 40) * width // 80
+            cv2.rectangle(frame, (x, height // 3), (x + width // 4, height // 3 + height // 4),
+                          (40, 200, 90), -1)
+        frames.append(frame)
+    return frames
+
+
+def video_frames(path: str, count: int):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(detector, frames, draw_boxes: bool):
+    """Frames per second and the per-frame 'motion' decisions"""
+    detector.reset()
+    decisions = []
+    start = time.perf_counter()
+    for frame in frames:
+        result = detector.detect(frame)
+        if result is None:
+            continue
+        moving = result.area > AREA_THRESHOLD
+        if draw_boxes and moving:
+            detector.boxes()
+        decisions.append(moving)
+    seconds = time.perf_counter() - start
+    return len(frames) / seconds, decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="640x480", help="Synthetic frame size WxH")
+    parser.add_argument("--video", help="Use frames from this video instead")
+    parser.add_argument("--scale", type=float, default=0.25, help="Fast path working scale")
+    parser.add_argument("--roi", help="Fast path region of interest x,y,w,h")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method (best is kept)")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = video_frames(args.video, args.frames)
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        frames = synthetic_frames(args.frames, width, height)
+    if len(frames) < 2:
+        sys.exit("Need at least 2 frames")
+    roi = tuple(int(v) for v in args.roi.split(",")) if args.roi else None
+
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}, fast scale {args.scale}, roi {roi}\n")
+
+    methods = [
+        ("legacy", LegacyMotionDetector(), True),
+        ("fast", FastMotionDetector(scale=args.scale, roi=roi), False),
+        ("fast+boxes", FastMotionDetector(scale=args.scale, roi=roi), True),
+    ]
+    decisions = {}
+    print(f"{'method':<12} {'FPS':>9} {'ms/frame':>9} {'speedup':>8}")
+    legacy_fps = None
+    for name, detector, draw_boxes in methods:
+        fps = 0.0
+        for _ in range(args.repeat):
+            run_fps, decisions[name] = run(detector, frames, draw_boxes)
+            fps = max(fps, run_fps)
+        legacy_fps = legacy_fps or fps
+        print(f"{name:<12} {fps:>9.0f} {1000 / fps:>9.2f} {fps / legacy_fps:>7.1f}x")
+
+    agree = np.mean(np.array(decisions["legacy"]) == np.array(decisions["fast"]))
+    print(f"\nFast and legacy agree on motion in {agree:.0%} of frames")
+
+
+if __name__ == "__main__":
+    main()
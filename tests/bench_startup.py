@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold-start import time of each entry point
+
+Every measurement runs in a fresh Python process, and the time Python itself
+needs to start is subtracted. The slowest imports of each entry point are
+listed (from python -X importtime) to show what to make lazy next.
+
+Run from the project folder:
+    python tests/bench_startup.py --repeat 10
+    python tests/bench_startup.py --json startup.json   # to track over time
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = ["utils.analyzer", "auto_detect_sort", "manuel_detect_sort"]
+
+
+def time_import(module: str) -> float:
+    """Seconds to start Python and import `module` (empty string = just start)"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}" if module else "pass"],
+                   cwd=PROJECT_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def import_times(code: str):
+    """Cumulative microseconds per top-level package imported by `code`"""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=PROJECT_DIR, check=True, capture_output=True, text=True).stderr
+    timings = {}
+    for line in output.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        # Sub-modules are already counted in their package's cumulative time
+        if "." not in name:
+            timings[name] = max(timings.get(name, 0), int(parts[1]))
+    return timings
+
+
+def slowest_imports(module: str, count: int = 5):
+    """The `count` slowest packages `module` pulls in, as (microseconds, name)"""
+    startup = import_times("pass")
+    timings = import_times(f"import {module}")
+    return sorted(((us, name) for name, us in timings.items()
+                   if name not in startup and name != module.split(".")[0]),
+                  reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", default=",".join(ENTRY_POINTS))
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports to list")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("") for _ in range(args.repeat))
+    print(f"Python startup: {baseline * 1000:.0f} ms (subtracted below)\n")
+    print(f"{'entry point':<22} {'median ms':>10} {'min ms':>8}")
+
+    results = {"python_startup_ms": baseline * 1000, "entry_points": {}}
+    for module in args.modules.split(","):
+        times = [time_import(module) - baseline for _ in range(args.repeat)]
+        median, best = statistics.median(times) * 1000, min(times) * 1000
+        print(f"{module:<22} {median:>10.0f} {best:>8.0f}")
+        results["entry_points"][module] = {
+            "median_ms": median,
+            "min_ms": best,
+            "slowest": [{"module": name, "ms": us / 1000}
+                        for us, name in slowest_imports(module, args.top)],
+        }
+
+    for module, result in results["entry_points"].items():
+        print(f"\nSlowest imports for {module}:")
+        for item in result["slowest"]:
+            print(f"  {item['ms']:>8.1f} ms  {item['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
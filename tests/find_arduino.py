@@ -1,54 +1,96 @@
 #!/usr/bin/env python3
 """
 Find Arduino port automatically
+
+Uses the same search as the sorter (utils/arduino_utils.py): the last port
+that worked, then USB IDs, then asking every candidate for READY at once.
+
+    python tests/find_arduino.py            # find it (using the saved port)
+    python tests/find_arduino.py --rescan   # ignore the saved port
+    python tests/find_arduino.py --watch    # report plugging in and out
 """
 
-import serial.tools.list_ports
+import sys
 import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serial.tools.list_ports
 
-def find_arduino():
+from utils.arduino_utils import PortWatcher, find_arduino_port, forget_arduino_port, is_known_board
+
+
+def find_arduino(use_cache=True):
     """Find Arduino port automatically"""
     print("Searching for Arduino...")
     print("-" * 40)
-    
+
     ports = list(serial.tools.list_ports.comports())
-    
+
     if not ports:
         print("❌ No serial ports found!")
         return None
-    
+
     print("All available ports:")
     for p in ports:
-        print(f"  {p.device}: {p.description}")
-    
+        usb_id = f" [{p.vid:04X}:{p.pid:04X}]" if p.vid is not None else ""
+        known = " (Arduino USB ID)" if is_known_board(p) else ""
+        print(f"  {p.device}: {p.description}{usb_id}{known}")
+
     print("\nLooking for Arduino...")
-    
-    # Common Arduino identifiers
-    arduino_ids = ['usbmodem', 'usbserial', 'Arduino', 'CH340', 'CP210', 'FTDI']
-    
-    for port in ports:
-        port_lower = port.device.lower()
-        desc_lower = port.description.lower()
-        
-        for id in arduino_ids:
-            if id.lower() in port_lower or id.lower() in desc_lower:
-                print(f"✅ Found possible Arduino at: {port.device}")
-                return port.device
-    
+    start = time.monotonic()
+    port = find_arduino_port(use_cache=use_cache)
+    if port:
+        print(f"✅ Found Arduino at: {port} ({time.monotonic() - start:.2f} s)")
+        return port
+
     print("❌ No Arduino found. Please:")
     print("1. Connect your Arduino via USB")
     print("2. Close Arduino IDE Serial Monitor if open")
     print("3. Check that you're using a data USB cable (not charge-only)")
     print("4. Try unplugging and reconnecting the Arduino")
-    
+
     return None
 
+
+def watch():
+    """Print the Arduino's port whenever something is plugged in or out"""
+    def changed(added, removed):
+        for device in removed:
+            print(f"🔌 Unplugged: {device}")
+        for device in added:
+            print(f"🔌 Plugged in: {device}")
+        port = find_arduino_port()
+        print(f"   Arduino: {port or 'not found'}")
+
+    watcher = PortWatcher(changed)
+    watcher.start()
+    print("Watching for USB changes - press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
 if __name__ == "__main__":
-    port = find_arduino()
-    
+    parser = argparse.ArgumentParser(description="Find the Arduino's serial port")
+    parser.add_argument("--rescan", action="store_true", help="Ignore the saved port")
+    parser.add_argument("--watch", action="store_true", help="Report plugging in and out")
+    args = parser.parse_args()
+
+    if args.rescan:
+        forget_arduino_port()
+    port = find_arduino(use_cache=not args.rescan)
+
     if port:
         print(f"\n✅ Arduino found at: {port}")
         print(f"\nUpdate your scripts with:")
         print(f"PORT = '{port}'")
     else:
-        print("\n⚠️ Please connect your Arduino and run this script again")
\ No newline at end of file
+        print("\n⚠️ Please connect your Arduino and run this script again")
+
+    if args.watch:
+        watch()
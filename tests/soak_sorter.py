@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Soak test the sorter against the virtual Arduino - no board needed
+
+Starts utils/virtual_arduino.py on a pseudo-terminal, connects an ordinary
+ArduinoController to it, and sorts items at a steady rate (randomly safe or
+unsafe), like a busy conveyor. Reports the throughput actually reached,
+failed sorts and the board's move times. With --drop-rate some commands are
+lost on the way to the board, to check they are noticed and sent again;
+with --reply-drop-rate some of the board's replies are lost instead, to
+check a command sent again because of a lost ACK doesn't fail or move twice.
+With --unplug-every the board is unplugged now and then, to check the
+controller reconnects and that every sort it loses is reported as failed.
+
+--speed runs the servos faster than real, so a long shift fits in a short
+CI job; --rate and the reported throughput are in real (wall clock) items
+per hour.
+
+Run from the project folder:
+    python tests/soak_sorter.py --items 200 --rate 3000
+    python tests/soak_sorter.py --items 1000 --rate 20000 --speed 10 --drop-rate 0.02
+    python tests/soak_sorter.py --items 500 --rate 20000 --speed 10 --reply-drop-rate 0.02
+    python tests/soak_sorter.py --legacy --items 50
+    python tests/soak_sorter.py --items 500 --rate 20000 --speed 10 --unplug-every 10
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.sorter import ArduinoController
+from utils.virtual_arduino import VirtualArduino
+
+
+def unplugger(sim: VirtualArduino, every: float, seconds: float, stop: threading.Event):
+    """Pull the board's cable every `every` seconds, for `seconds` seconds"""
+    while not stop.wait(every):
+        sim.unplug()
+        stop.wait(seconds)
+        sim.plug()
+
+
+def soak(sim: VirtualArduino, items: int, rate: float, seed: int):
+    """Sort `items` items, `rate` per hour; returns (results, seconds, stats...)"""
+    arduino = ArduinoController(port=sim.port)
+    if not arduino.connect():
+        sys.exit(f"Couldn't connect to the virtual Arduino on {sim.port}")
+    if not arduino.acknowledged:
+        # Old firmware: the controller times moves itself - at the sim's speed
+        arduino.actuator.move_seconds = {letter: seconds / sim.speed for letter, seconds
+                                         in arduino.actuator.move_seconds.items()}
+    arduino.actuator.wait_idle(5.0)  # The start-up H90
+
+    chooser = random.Random(seed)
+    interval = 3600.0 / rate
+    futures = []
+    start = time.monotonic()
+    for i in range(items):
+        # Keep to the schedule (items arrive whether or not the gates keep up)
+        delay = start + i * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if chooser.random() < 0.5:
+            futures.append(arduino.sort_safe_async())
+        else:
+            futures.append(arduino.sort_unsafe_async())
+
+    results = [future.result() for future in futures]
+    seconds = time.monotonic() - start
+    protocol = arduino.protocol_stats()
+    protocol.update(arduino.connection_stats())
+    actuator = arduino.actuator.stats()
+    board = sim.stats()  # Before disconnect() centers the gates
+    arduino.disconnect()
+    return results, seconds, protocol, actuator, board
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=200, help="Items to sort")
+    parser.add_argument("--rate", type=float, default=3000, help="Items per hour to feed")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Servo speed-up in the simulator")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Fraction of commands lost on the way to the board")
+    parser.add_argument("--reply-drop-rate", type=float, default=0.0,
+                        help="Fraction of the board's replies lost on the way back")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Simulate the old firmware (no READY/ACK/DONE)")
+    parser.add_argument("--unplug-every", type=float, default=0,
+                        help="Unplug the board every this many seconds (0 = never)")
+    parser.add_argument("--unplug-for", type=float, default=1.0,
+                        help="How long it stays unplugged (seconds)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the controller's log")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as folder, \
+            VirtualArduino(link=str(Path(folder) / "arduino"), speed=args.speed,
+                           drop_rate=args.drop_rate, legacy=args.legacy, seed=args.seed,
+                           reply_drop_rate=args.reply_drop_rate) as sim:
+        stop = threading.Event()
+        if args.unplug_every:
+            threading.Thread(target=unplugger, daemon=True,
+                             args=(sim, args.unplug_every, args.unplug_for, stop)).start()
+        try:
+            results, seconds, protocol, actuator, board = soak(sim, args.items, args.rate,
+                                                               args.seed)
+        finally:
+            stop.set()
+
+    sorted_ok = sum(results)
+    moves = board["moves"]["left"] + board["moves"]["right"]
+    results = {
+        "items": args.items,
+        "sorted": sorted_ok,
+        "failed": args.items - sorted_ok,
+        "seconds": seconds,
+        "items_per_hour": 3600.0 * sorted_ok / seconds if seconds else 0.0,
+        "target_per_hour": args.rate,
+        "board_moves": moves,
+        "board_dropped": board["dropped"],
+        "replies_dropped": board["replies_dropped"],
+        "acknowledged": protocol["acknowledged"],
+        "resent": protocol["resent"],
+        "lost": protocol["dropped"] + protocol["timed_out"],
+        "disconnects": protocol["losses"],
+        "reconnects": protocol["reconnects"],
+        "reconnect_time": protocol["reconnect_time"],
+        "lost_to_disconnects": protocol["commands_lost"],
+        "replayed": protocol["replayed"],
+        "average_wait": actuator["average_wait"],
+        "actuation_latency": protocol["actuation_latency"],
+    }
+    # Every sort the controller reports as done must really have moved a gate,
+    # and every failed one must show up in the counts of lost commands
+    if args.legacy:
+        consistent = moves <= args.items
+    elif args.unplug_every or args.reply_drop_rate:
+        # A move cut short by the unplugging, or whose DONE was lost, did
+        # happen but reports failure
+        consistent = moves >= sorted_ok and results["failed"] <= (
+            results["lost"] + results["lost_to_disconnects"] + protocol["errors"])
+    else:
+        consistent = moves == sorted_ok
+    results["consistent"] = consistent
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.items} items at {args.rate:.0f}/hour"
+              f"{' (old firmware)' if args.legacy else ''}, servos x{args.speed:g}: "
+              f"{sorted_ok} sorted, {results['failed']} failed in {seconds:.1f} s")
+        print(f"Throughput: {results['items_per_hour']:.0f} items/hour")
+        print(f"Board: {moves} moves, {board['dropped']} commands and "
+              f"{board['replies_dropped']} replies lost on the wire, "
+              f"{results['resent']} sent again, {results['lost']} given up on")
+        if results["disconnects"]:
+            print(f"Unplugged {results['disconnects']} times: {results['reconnects']} "
+                  f"reconnects ({results['reconnect_time']['mean']:.2f} s average), "
+                  f"{results['replayed']} commands replayed, "
+                  f"{results['lost_to_disconnects']} failed")
+        if results["acknowledged"]:
+            latency = results["actuation_latency"]
+            print(f"Move time: {latency['mean']:.2f} s average, {latency['p95']:.2f} s p95")
+        print(f"Queued behind a busy gate: {results['average_wait']:.2f} s on average")
+        print(f"Board moves match reported sorts: {'yes' if consistent else 'NO'}")
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
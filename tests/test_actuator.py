@@ -0,0 +1,99 @@
+"""ActuatorWorker: per-servo order, and left and right moving together"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.actuator import ActuatorWorker, servos_for
+
+
+class Board:
+    """send() that records when each command went out"""
+
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, command):
+        with self.lock:
+            self.sent.append((command, time.monotonic()))
+        return self.ok
+
+
+def sent_at(board, command):
+    return [at for text, at in board.sent if text == command]
+
+
+def test_servos_for():
+    assert servos_for("L180") == {"left"}
+    assert servos_for("r0") == {"right"}
+    assert servos_for("H90") == {"left", "right"}
+
+
+def test_same_servo_waits_other_servo_overlaps():
+    board = Board()
+    worker = ActuatorWorker(board, move_seconds={"L": 0.2, "R": 0.2, "H": 0.1})
+    worker.start()
+    start = time.monotonic()
+    futures = [worker.submit("L180"), worker.submit("R180"), worker.submit("L90")]
+    assert worker.wait_idle(2.0)
+    worker.stop()
+
+    assert all(future.result(0) for future in futures)
+    assert [text for text, _ in board.sent] == ["L180", "R180", "L90"]
+    assert sent_at(board, "R180")[0] - start < 0.1  # Didn't wait for the left gate
+    assert sent_at(board, "L90")[0] - sent_at(board, "L180")[0] >= 0.19
+
+
+def test_both_servos_command_waits_for_both():
+    board = Board()
+    worker = ActuatorWorker(board, move_seconds={"L": 0.1, "R": 0.2, "H": 0.0})
+    worker.start()
+    worker.submit("L180")
+    worker.submit("R180")
+    worker.submit("H90")
+    worker.submit("L0")  # Queued behind H90, which uses the left gate too
+    assert worker.wait_idle(2.0)
+    worker.stop()
+    order = [text for text, _ in board.sent]
+    assert order == ["L180", "R180", "H90", "L0"]
+    assert sent_at(board, "H90")[0] - sent_at(board, "R180")[0] >= 0.19
+
+
+def test_failed_send_frees_the_servo():
+    worker = ActuatorWorker(Board(ok=False), move_seconds={"L": 5.0})
+    worker.start()
+    assert worker.submit("L180").result(1.0) is False
+    assert worker.busy_until("left") == 0.0
+    worker.stop()
+    assert worker.stats()["failed"] == 1
+
+
+def test_board_reported_moves_keep_the_servo_busy():
+    replies = []
+
+    def send(command):
+        reply = Future()
+        replies.append(reply)
+        return reply
+
+    worker = ActuatorWorker(send, move_seconds={"L": 0.0})
+    worker.start()
+    first = worker.submit("L180")
+    second = worker.submit("L90")
+    time.sleep(0.1)
+    assert len(replies) == 1  # The board hasn't said DONE yet
+    replies[0].set_result(True)
+    assert first.result(1.0) is True
+    deadline = time.monotonic() + 1.0
+    while len(replies) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    replies[1].set_result(False)
+    assert second.result(1.0) is False
+    worker.stop()
+
+
+def test_submit_after_stop_fails():
+    worker = ActuatorWorker(Board())
+    assert worker.submit("L180").result(0) is False
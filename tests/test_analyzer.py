@@ -0,0 +1,135 @@
+"""SimpleEWasteAnalyzer with the offline mock backend"""
+
+import json
+
+import pytest
+
+from utils import analyzer as analyzer_module
+from utils.analyzer import SimpleEWasteAnalyzer
+from utils.backends import MissingAPIKeyError, MockBackend, MockServiceError
+from utils.retry import CircuitBreaker, RetryPolicy
+
+
+@pytest.fixture
+def no_api_key(monkeypatch):
+    def make_backend(*args, **kwargs):
+        raise MissingAPIKeyError("no key")
+
+    monkeypatch.setattr(analyzer_module, "make_backend", make_backend)
+
+
+def test_missing_key_is_raised_not_sorted_as_unsafe(no_api_key):
+    analyzer = SimpleEWasteAnalyzer()
+    analyzer._instructions = "Sort e-waste"
+    with pytest.raises(MissingAPIKeyError):
+        analyzer.analyze_one_image(b"\xff\xd8 jpeg", name="item.jpg")
+    assert not analyzer.deferred
+
+
+def test_failed_background_warm_up_is_raised_by_warm_up(no_api_key):
+    analyzer = SimpleEWasteAnalyzer()
+    analyzer._instructions = "Sort e-waste"
+    analyzer.warm_up_in_background().join(2.0)
+    with pytest.raises(MissingAPIKeyError):
+        analyzer.warm_up()
+
+
+class ScriptedBackend(MockBackend):
+    """MockBackend whose batch answers can be rewritten, or that fails"""
+
+    def __init__(self, rewrite=None, error=None):
+        super().__init__(latency=0.0, distribution="fixed")
+        self.rewrite = rewrite
+        self.error = error
+        self.requests = 0
+        self.batch_requests = 0
+
+    def generate(self, prompt, images, response_schema, labels=None, timeout=None):
+        self.requests += 1
+        if response_schema.get("type") == "array":
+            self.batch_requests += 1
+            if self.error:
+                raise self.error
+        answer = super().generate(prompt, images, response_schema, labels, timeout)
+        if response_schema.get("type") == "array" and self.rewrite:
+            answer = json.dumps(self.rewrite(json.loads(answer)))
+        return answer
+
+
+def batch_analyzer(backend, **kwargs):
+    analyzer = SimpleEWasteAnalyzer(backend=backend, retry_policy=RetryPolicy(max_attempts=1),
+                                    **kwargs)
+    analyzer._instructions = "Sort e-waste"
+    return analyzer
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"img{index}.jpg"
+        path.write_bytes(f"picture {index}".encode())
+        paths.append(path)
+    return paths
+
+
+def verdicts_for(images):
+    levels = ["Safe to Shred", "Requires Preprocessing", "Do Not Shred", "Discard"]
+    return {path.name: {"item_name": path.stem, "safety_level": levels[index],
+                        "hazards": [], "notes": ""}
+            for index, path in enumerate(images)}
+
+
+def test_batch_answers_are_matched_by_image_index(images):
+    backend = ScriptedBackend(rewrite=lambda answers: list(reversed(answers)))
+    backend.verdicts = verdicts_for(images)
+    results = batch_analyzer(backend).analyze_batch(images, batch_size=4)
+
+    assert backend.requests == 1
+    assert [result["item_name"] for result in results] == [path.stem for path in images]
+    assert [result["item_num"] for result in results] == [1, 2, 3, 4]
+
+
+def test_missing_or_broken_answers_are_asked_again_alone(images):
+    def damage(answers):
+        del answers[1]["safety_level"]
+        return [answer for answer in answers if answer["image_index"] != 3]
+
+    backend = ScriptedBackend(rewrite=damage)
+    backend.verdicts = verdicts_for(images)
+    results = batch_analyzer(backend).analyze_batch(images, batch_size=4)
+
+    assert backend.requests == 3  # One batch, then img1 and img3 on their own
+    assert [result["item_name"] for result in results] == [path.stem for path in images]
+    assert not any(result["error"] for result in results)
+
+
+def test_batch_outage_defers_instead_of_asking_one_by_one(images):
+    backend = ScriptedBackend(error=MockServiceError("503 Mock service unavailable"))
+    analyzer = batch_analyzer(backend)
+    results = analyzer.analyze_batch(images, batch_size=2)
+
+    assert backend.requests == 2  # One per batch, none per image
+    assert all(result["deferred"] for result in results)
+    assert [name for _, name, _ in analyzer.deferred] == [path.name for path in images]
+
+
+def test_open_breaker_defers_without_calling(images):
+    backend = ScriptedBackend()
+    analyzer = batch_analyzer(backend, breaker=CircuitBreaker(failure_threshold=1))
+    analyzer.breaker.record_failure()
+    results = analyzer.analyze_batch(images, batch_size=2)
+
+    assert backend.requests == 0
+    assert len(analyzer.deferred) == 4
+    assert all(result["deferred"] for result in results)
+
+
+def test_bad_batch_request_falls_back_to_one_by_one(images):
+    backend = ScriptedBackend(error=ValueError("batch too large"))
+    backend.verdicts = verdicts_for(images)
+    results = batch_analyzer(backend).analyze_batch(images, batch_size=4)
+
+    assert backend.batch_requests == 1
+    assert backend.requests == 5
+    assert [result["item_name"] for result in results] == [path.stem for path in images]
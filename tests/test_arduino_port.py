@@ -0,0 +1,108 @@
+"""find_arduino_port: USB IDs, probing and the saved port (no hardware)"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("serial")
+
+from utils import arduino_utils
+from utils.arduino_utils import find_arduino_port, forget_arduino_port
+
+
+def usb_port(device, vid=None, pid=None, serial_number=None, description="n/a"):
+    return SimpleNamespace(device=device, vid=vid, pid=pid, serial_number=serial_number,
+                           description=description)
+
+
+BLUETOOTH = usb_port("/dev/ttyS0", description="Bluetooth serial")
+UNO = usb_port("/dev/ttyACM0", 0x2341, 0x0043, "UNO1")
+CLONE = usb_port("/dev/ttyUSB0", 0x1A86, 0x7523, "CLONE1")
+OTHER_FTDI = usb_port("/dev/ttyUSB1", 0x0403, 0x6001, "FTDI1")
+
+
+@pytest.fixture
+def usb(monkeypatch, tmp_path):
+    """Fake plugged-in ports; records which devices were opened"""
+    state = SimpleNamespace(ports=[], replies={}, probed=[],
+                            cache_path=str(tmp_path / "arduino_port.json"))
+
+    def probe_port(device, baud_rate=9600, timeout=None):
+        state.probed.append(device)
+        return state.replies.get(device)
+
+    monkeypatch.setattr(arduino_utils.serial.tools.list_ports, "comports",
+                        lambda: list(state.ports))
+    monkeypatch.setattr(arduino_utils, "probe_port", probe_port)
+    monkeypatch.setattr(arduino_utils, "_last_scan", (None, None))
+    return state
+
+
+def find(usb, **kwargs):
+    return find_arduino_port(cache_path=usb.cache_path, **kwargs)
+
+
+def test_single_known_board_is_picked_without_opening_anything(usb):
+    usb.ports = [BLUETOOTH, CLONE]
+    assert find(usb) == "/dev/ttyUSB0"
+    assert usb.probed == []
+    with open(usb.cache_path) as f:
+        assert json.load(f) == {"device": "/dev/ttyUSB0", "vid": 0x1A86, "pid": 0x7523,
+                                "serial_number": "CLONE1"}
+
+
+def test_unknown_usb_ids_are_only_tried_by_name(usb):
+    usb.ports = [BLUETOOTH, usb_port("/dev/ttyUSB3", 0x1A86, 0x1234)]
+    assert find(usb) is None
+    assert usb.probed == ["/dev/ttyUSB3"]  # "USB" in the name; Bluetooth never opened
+
+
+def test_several_boards_ask_the_firmware(usb):
+    usb.ports = [OTHER_FTDI, UNO]
+    usb.replies = {"/dev/ttyUSB1": False, "/dev/ttyACM0": True}
+    assert find(usb) == "/dev/ttyACM0"
+    assert sorted(usb.probed) == ["/dev/ttyACM0", "/dev/ttyUSB1"]
+
+
+def test_old_firmware_falls_back_to_the_first_port_that_opened(usb):
+    usb.ports = [OTHER_FTDI, UNO]
+    usb.replies = {"/dev/ttyUSB1": None, "/dev/ttyACM0": False}
+    assert find(usb) == "/dev/ttyACM0"
+
+
+def test_saved_board_is_found_under_a_new_name(usb):
+    usb.ports = [OTHER_FTDI, UNO]
+    usb.replies = {"/dev/ttyACM0": True}
+    find(usb)
+
+    arduino_utils._last_scan = (None, None)  # A new run
+    usb.probed.clear()
+    usb.ports = [OTHER_FTDI, usb_port("/dev/ttyACM1", 0x2341, 0x0043, "UNO1")]
+    assert find(usb) == "/dev/ttyACM1"
+    assert usb.probed == []
+
+
+def test_scan_is_reused_until_something_is_plugged_in(usb):
+    usb.ports = [OTHER_FTDI, UNO]
+    usb.replies = {"/dev/ttyACM0": True}
+    assert find(usb) == "/dev/ttyACM0"
+    os.remove(usb.cache_path)  # Only the in-memory scan is left
+    usb.probed.clear()
+    assert find(usb) == "/dev/ttyACM0"
+    assert usb.probed == []
+
+    usb.ports = [OTHER_FTDI, UNO, CLONE]  # Hot-plug: look again
+    usb.replies = {"/dev/ttyUSB0": True}
+    assert find(usb) == "/dev/ttyUSB0"
+    assert usb.probed
+
+
+def test_forget_drops_the_saved_port(usb):
+    usb.ports = [CLONE]
+    find(usb)
+    forget_arduino_port(usb.cache_path)
+    usb.ports = [OTHER_FTDI, CLONE]
+    usb.replies = {"/dev/ttyUSB1": True}
+    assert find(usb) == "/dev/ttyUSB1"
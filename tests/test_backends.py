@@ -0,0 +1,96 @@
+"""GeminiBackend context cache upkeep (with a stand-in for the Google library)"""
+
+import threading
+
+from utils import backends
+from utils.backends import GeminiBackend
+
+
+class FakeCache:
+    def __init__(self, expired=False):
+        self.expired = expired
+        self.updates = 0
+
+    def update(self, ttl):
+        if self.expired:
+            raise RuntimeError("404 CachedContent not found")
+        self.updates += 1
+
+
+class FakeModel:
+    def __init__(self, source):
+        self.source = source
+
+    def generate_content(self, contents, generation_config=None, request_options=None):
+        return type("Response", (), {"text": "{}"})()
+
+
+class FakeGenAI:
+    class GenerativeModel(FakeModel):
+        def __init__(self, model_name, system_instruction=None):
+            super().__init__(("system", system_instruction))
+
+        @classmethod
+        def from_cached_content(cls, cache):
+            return FakeModel(("cached", cache))
+
+    @staticmethod
+    def GenerationConfig(**kwargs):
+        return kwargs
+
+
+def make_backend(cache):
+    """A GeminiBackend in "cached" mode without the real library or a key"""
+    backend = GeminiBackend.__new__(GeminiBackend)
+    backend.genai = FakeGenAI
+    backend.model_name = "gemini-test"
+    backend.ai_model = FakeModel(("cached", cache))
+    backend.context_cache = cache
+    backend._owns_context_cache = True
+    backend._instructions = "Sort e-waste"
+    backend._cache_refreshed_at = 0.0
+    backend._cache_lock = threading.Lock()
+    backend._configs = {}
+    return backend
+
+
+def generate(backend):
+    return backend.generate([], [], {"type": "object"})
+
+
+def test_ttl_is_renewed_once_half_has_passed(monkeypatch):
+    cache = FakeCache()
+    backend = make_backend(cache)
+    clock = [backends.CONTEXT_CACHE_TTL]
+    monkeypatch.setattr(backends.time, "monotonic", lambda: clock[0])
+
+    generate(backend)
+    assert cache.updates == 1
+    clock[0] += backends.CONTEXT_CACHE_TTL / 4
+    generate(backend)
+    assert cache.updates == 1  # Still fresh
+    clock[0] += backends.CONTEXT_CACHE_TTL / 2
+    generate(backend)
+    assert cache.updates == 2
+
+
+def test_expired_cache_is_set_up_again(monkeypatch):
+    replacement = FakeCache()
+    backend = make_backend(FakeCache(expired=True))
+    monkeypatch.setattr(backend, "_context_cache_for", lambda instructions: replacement)
+
+    generate(backend)
+    assert backend.context_cache is replacement
+    assert backend.ai_model.source == ("cached", replacement)
+
+
+def test_falls_back_to_a_system_instruction_if_it_cant_be_cached(monkeypatch):
+    backend = make_backend(FakeCache(expired=True))
+
+    def cannot_cache(instructions):
+        raise RuntimeError("400 too small to cache")
+
+    monkeypatch.setattr(backend, "_context_cache_for", cannot_cache)
+    generate(backend)
+    assert backend.context_cache is None
+    assert backend.ai_model.source == ("system", "Sort e-waste")
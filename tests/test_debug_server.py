@@ -0,0 +1,34 @@
+"""DebugViewServer: who can connect and what it serves"""
+
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from utils.debug_server import DebugViewServer
+
+
+def test_listens_on_this_computer_only_by_default():
+    server = DebugViewServer(port=0, fps=50)
+    server.start()
+    running = True
+
+    def frame_loop():
+        while running:
+            if server.wanted():
+                server.publish(np.zeros((8, 8, 3), dtype=np.uint8))
+            time.sleep(0.01)
+
+    loop = threading.Thread(target=frame_loop, daemon=True)
+    loop.start()
+    try:
+        host, port = server._server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/snapshot.jpg", timeout=5) as reply:
+            assert reply.headers["Content-Type"] == "image/jpeg"
+            assert reply.read()[:2] == b"\xff\xd8"
+    finally:
+        running = False
+        loop.join()
+        server.stop()
@@ -0,0 +1,60 @@
+"""BestFrameSelector: which frames are kept, and what scoring may cost"""
+
+import cv2
+import numpy as np
+
+from utils.frame_select import BestFrameSelector, sharpness
+
+
+def checkerboard(blur=0, size=(120, 160)):
+    rows, cols = np.indices(size)
+    frame = (((rows // 8 + cols // 8) % 2) * 255).astype(np.uint8)
+    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if blur:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    return frame
+
+
+def test_blur_lowers_the_score():
+    scores = [sharpness(checkerboard(blur)) for blur in (0, 1, 3)]
+    assert scores[0] > scores[1] > scores[2]
+
+
+def test_box_scores_only_the_object():
+    frame = checkerboard(blur=4)
+    frame[:40, :40] = checkerboard()[:40, :40]
+    assert sharpness(frame, box=(0, 0, 40, 40)) > sharpness(frame, box=(80, 60, 40, 40))
+
+
+def test_keeps_the_sharpest_frames_sharpest_first():
+    selector = BestFrameSelector(burst=2, max_cost_ms=1000)
+    frames = {blur: checkerboard(blur) for blur in (3, 0, 2, 1)}
+    for frame in frames.values():
+        selector.offer(frame)
+
+    kept = selector.take()
+    assert len(kept) == 2
+    assert np.array_equal(kept[0][0], frames[0])
+    assert np.array_equal(kept[1][0], frames[1])
+    assert kept[0][1] > kept[1][1]
+    assert selector.take() == []  # take() resets
+
+
+def test_kept_frames_are_copies_and_belong_to_the_caller():
+    selector = BestFrameSelector(burst=1, max_cost_ms=1000)
+    frame = checkerboard()
+    selector.offer(frame)
+    frame[:] = 0  # The camera reuses its buffer
+    (kept, _), = selector.take()
+    assert kept.any()
+
+    selector.offer(checkerboard(blur=2))
+    assert kept.any() and np.array_equal(kept, checkerboard())  # Not overwritten
+
+
+def test_slow_scoring_is_thinned_out():
+    selector = BestFrameSelector(burst=1, max_cost_ms=1e-6)
+    frame = checkerboard()
+    assert selector.offer(frame) is not None  # The first frame is always scored
+    assert selector.stride > 4
+    assert all(selector.offer(frame) is None for _ in range(3))
@@ -0,0 +1,90 @@
+"""ImagePreprocessor: resizing, cropping and what it reports as saved"""
+
+import cv2
+import numpy as np
+import pytest
+
+from utils import image_prep
+from utils.image_prep import ImagePreprocessor, encode_frame, guess_mime_type
+
+
+def noisy_frame(width=1280, height=960, seed=0):
+    """Something that doesn't compress to nothing"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_guess_mime_type():
+    assert guess_mime_type(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert guess_mime_type(b"RIFF\0\0\0\0WEBPVP8 ") == "image/webp"
+    assert guess_mime_type(b"???") == "image/jpeg"
+
+
+def test_large_file_is_shrunk(tmp_path):
+    path = tmp_path / "big.png"
+    cv2.imwrite(str(path), noisy_frame())
+    prepared = ImagePreprocessor(max_long_edge=640).prepare(path)
+
+    assert prepared["mime_type"] == "image/jpeg"
+    assert decode(prepared["data"]).shape[:2] == (480, 640)
+    assert prepared["original_bytes"] == path.stat().st_size
+    assert prepared["bytes_saved"] == prepared["original_bytes"] - prepared["bytes_sent"] > 0
+
+
+def test_small_file_is_sent_as_it_is():
+    original = encode_frame(noisy_frame(320, 240), quality=40)
+    prepared = ImagePreprocessor(max_long_edge=640, quality=95).prepare(original)
+    assert prepared["data"] == original  # Re-encoding would only make it bigger
+    assert prepared["bytes_saved"] == 0
+
+
+def test_crop_to_box_keeps_a_margin():
+    frame = noisy_frame(640, 480)
+    preprocessor = ImagePreprocessor(max_long_edge=0, crop_to_box=True, box_margin=0.5)
+    prepared = preprocessor.prepare(frame, box=(100, 100, 100, 50))
+    assert decode(prepared["data"]).shape[:2] == (100, 200)
+
+
+def test_raw_frame_savings_are_sampled(monkeypatch):
+    full_size_encodes = []
+    real_encode = image_prep.encode_frame
+
+    def counting_encode(frame, *args, **kwargs):
+        full_size_encodes.append(frame.shape)
+        return real_encode(frame, *args, **kwargs)
+
+    monkeypatch.setattr(image_prep, "encode_frame", counting_encode)
+    monkeypatch.setattr(image_prep, "SAVINGS_SAMPLE_EVERY", 3)
+    preprocessor = ImagePreprocessor(max_long_edge=640)
+
+    results = [preprocessor.prepare(noisy_frame(seed=seed)) for seed in range(6)]
+    assert len(full_size_encodes) == 2  # Frames 0 and 3
+    for prepared in results:
+        assert prepared["bytes_saved"] > 0
+        assert prepared["original_bytes"] > prepared["bytes_sent"]
+        assert prepared["latency_saved"] is not None
+
+
+def test_measure_savings_encodes_every_frame(monkeypatch):
+    calls = []
+    real_encode = image_prep.encode_frame
+    monkeypatch.setattr(image_prep, "encode_frame",
+                        lambda frame, *a, **k: calls.append(1) or real_encode(frame, *a, **k))
+    preprocessor = ImagePreprocessor(max_long_edge=640, measure_savings=True)
+    frame = noisy_frame()
+    for _ in range(3):
+        prepared = preprocessor.prepare(frame)
+    assert len(calls) == 3
+    assert prepared["original_bytes"] == len(real_encode(frame))
+
+
+@pytest.mark.parametrize("output_format", ["jpeg", "webp"])
+def test_signature_changes_with_settings(output_format):
+    signature = ImagePreprocessor(output_format=output_format).signature()
+    assert signature["format"] == output_format
+    assert signature != ImagePreprocessor(output_format=output_format, quality=50).signature()
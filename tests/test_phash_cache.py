@@ -0,0 +1,64 @@
+"""PerceptualHashIndex: what gets reused, and how close it has to be"""
+
+from utils.phash_cache import PerceptualHashIndex
+
+
+def verdict(item_name, safety_level):
+    return {"item_name": item_name, "safety_level": safety_level, "hazards": [], "notes": ""}
+
+
+def test_unknown_items_are_not_reused(tmp_path):
+    index = PerceptualHashIndex(path=str(tmp_path / "index.json"))
+    assert index.add(0x1234, verdict("Unknown", "Requires Preprocessing")) is False
+    assert index.add(0x5678, {"safety_level": "Discard"}) is False  # No name at all
+    assert index.lookup(0x1234) is None
+    assert index.stats()["entries"] == 0
+
+
+def test_unknown_items_in_old_files_are_ignored(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = PerceptualHashIndex(path=path)
+    index.add(0x1, verdict("Phone charger", "Safe to Shred"))
+    index.entries[0x2] = verdict("Unknown", "Requires Preprocessing")  # Saved by an old version
+    index.save()
+
+    reloaded = PerceptualHashIndex(path=path)
+    assert list(reloaded.entries) == [0x1]
+
+
+def test_safety_critical_verdicts_need_a_closer_match():
+    index = PerceptualHashIndex(path=None, max_distance=6, critical_max_distance=2)
+    index.add(0b0, verdict("Phone charger", "Safe to Shred"))
+    index.add(0xFF << 32, verdict("Keyboard", "Requires Preprocessing"))
+
+    assert index.lookup(0b11)["item_name"] == "Phone charger"  # Distance 2
+    assert index.lookup(0b111) is None  # Distance 3: too far for Safe to Shred
+    match = index.lookup((0xFF << 32) ^ 0b11111)  # Distance 5
+    assert match["item_name"] == "Keyboard"
+    assert match["phash_distance"] == 5
+
+
+def test_near_critical_item_is_not_skipped_for_a_farther_one():
+    index = PerceptualHashIndex(path=None, max_distance=6, critical_max_distance=2)
+    index.add(0b0, verdict("Battery pack", "Do Not Shred"))
+    index.add(0b111111, verdict("Keyboard", "Requires Preprocessing"))
+
+    # Distance 3 from the battery, 3 from the keyboard: the critical one decides
+    assert index.lookup(0b111) is None
+    # Distance 3 from the battery, 5 from the keyboard
+    assert index.lookup(0b1000011) is None
+    assert index.lookup(0b011111)["item_name"] == "Keyboard"  # 1 away, battery 5 away
+
+
+def test_do_not_shred_is_strict_too():
+    index = PerceptualHashIndex(path=None, max_distance=6, critical_max_distance=2)
+    index.add(0, verdict("Laptop battery", "Do Not Shred"))
+    assert index.lookup(0b1111) is None
+
+
+def test_other_namespace_starts_fresh(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = PerceptualHashIndex(path=path, namespace="prompt-v1")
+    index.add(0x1, verdict("Phone charger", "Safe to Shred"))
+    index.save()
+    assert PerceptualHashIndex(path=path, namespace="prompt-v2").stats()["entries"] == 0
@@ -0,0 +1,75 @@
+"""PhotoWriter: names, retention and surviving bad frames"""
+
+import os
+import time
+
+import numpy as np
+
+from utils.photo_store import PhotoWriter
+
+
+def frame(value=0):
+    return np.full((24, 32, 3), value, dtype=np.uint8)
+
+
+def test_names_never_collide(tmp_path):
+    writer = PhotoWriter(tmp_path)
+    writer.directory.mkdir(exist_ok=True)
+    taken = writer.directory / os.path.basename(writer.new_path()).replace("_0001", "_0002")
+    taken.write_bytes(b"already here")
+
+    paths = [writer.new_path() for _ in range(50)]
+    assert len(set(paths)) == 50
+    assert str(taken) not in paths
+
+
+def test_same_second_photos_are_all_kept(tmp_path):
+    writer = PhotoWriter(tmp_path, max_queue=100)
+    saved = [writer.save(frame(i), block=True) for i in range(20)]
+    assert writer.flush(5)
+    writer.close()
+
+    assert len(set(saved)) == 20
+    assert all(os.path.exists(path) for path in saved)
+    assert writer.stats()["written"] == 20
+
+
+def test_retention_deletes_the_oldest(tmp_path):
+    old = tmp_path / "old_photo.jpg"
+    old.write_bytes(b"x" * 10)
+    os.utime(old, (time.time() - 3600,) * 2)
+
+    writer = PhotoWriter(tmp_path, max_files=3, max_bytes=None, max_queue=100)
+    saved = [writer.save(frame(i), block=True) for i in range(4)]
+    writer.close()
+
+    assert not old.exists()
+    assert not os.path.exists(saved[0])
+    assert all(os.path.exists(path) for path in saved[1:])
+    stats = writer.stats()
+    assert stats["files"] == 3
+    assert stats["deleted"] == 2
+
+
+def test_byte_limit(tmp_path):
+    writer = PhotoWriter(tmp_path, max_files=None, max_bytes=1, max_queue=100)
+    for i in range(3):
+        writer.save(frame(i), block=True)
+    writer.close()
+    assert writer.stats()["files"] == 0
+    assert writer.stats()["deleted"] == 3
+
+
+def test_bad_frame_doesnt_stop_the_writer(tmp_path):
+    writer = PhotoWriter(tmp_path, max_queue=100)
+    bad = writer.save(np.zeros((0, 0, 7), dtype=np.float64), block=True)
+    good = writer.save(frame(), block=True)
+    assert writer.flush(5)
+    writer.close()
+
+    assert not os.path.exists(bad)
+    assert os.path.exists(good)
+    stats = writer.stats()
+    assert stats["failed"] == 1
+    assert stats["written"] == 1
+    assert not list(tmp_path.glob("*.part"))
@@ -0,0 +1,85 @@
+"""WorkerStage: ordering, and items that fail or vanish on the way"""
+
+import threading
+
+from utils.pipeline import WorkerStage, placeholder
+
+
+class Collector:
+    """Handler that remembers what it saw"""
+
+    def __init__(self):
+        self.seen = []
+        self.done = threading.Event()
+        self.expected = None
+
+    def __call__(self, item):
+        self.seen.append(item["seq"])
+        if self.expected is not None and len(self.seen) >= self.expected:
+            self.done.set()
+        return item
+
+
+def test_ordered_stage_reorders_items():
+    collector = Collector()
+    stage = WorkerStage("sink", collector, ordered=True, max_queue=10)
+    stage.start()
+    for seq in (2, 0, 3, 1):
+        stage.submit({"seq": seq})
+    stage.stop(drain=True, timeout=2.0)
+    assert collector.seen == [0, 1, 2, 3]
+
+
+def test_ordered_stage_skips_items_an_earlier_stage_lost():
+    collector = Collector()
+    collector.expected = 4
+    sink = WorkerStage("sink", collector, ordered=True, max_queue=10)
+
+    def analyze(item):
+        if item["seq"] == 1:
+            raise RuntimeError("AI down")
+        if item["seq"] == 3:
+            return None  # Nothing worth passing on
+        return item
+
+    source = WorkerStage("analyze", analyze, workers=3, max_queue=10, output=sink)
+    sink.start()
+    source.start()
+    for seq in range(6):
+        source.submit({"seq": seq})
+    source.stop(drain=True, timeout=2.0)
+
+    # Without placeholders the sink would wait for item 1 forever
+    assert collector.done.wait(2.0)
+    sink.stop(drain=True, timeout=2.0)
+    assert collector.seen == [0, 2, 4, 5]
+    assert sink.skipped == 2
+    assert sink.report()["skipped"] == 2
+    assert source.report()["errors"] == 1
+
+
+def test_placeholders_pass_through_ordered_stages():
+    final = WorkerStage("final", Collector(), ordered=True, max_queue=10)
+    middle = WorkerStage("middle", lambda item: item, ordered=True, max_queue=10,
+                         output=final)
+    final.start()
+    middle.start()
+    middle.submit({"seq": 1})
+    middle.submit(placeholder(0, "camera lost it"))
+    middle.stop(drain=True, timeout=2.0)
+    final.stop(drain=True, timeout=2.0)
+    assert middle.skipped == 1
+    assert final.skipped == 1
+    assert final.handler.seen == [1]
+
+
+def test_unordered_output_gets_no_placeholders():
+    collector = Collector()
+    sink = WorkerStage("sink", collector, max_queue=10)
+    source = WorkerStage("source", lambda item: None, max_queue=10, output=sink)
+    sink.start()
+    source.start()
+    source.submit({"seq": 0})
+    source.stop(drain=True, timeout=2.0)
+    sink.stop(drain=True, timeout=2.0)
+    assert collector.seen == []
@@ -0,0 +1,59 @@
+"""TriggerStateMachine: fire once per item, after it has settled"""
+
+from utils.presence import TriggerStateMachine
+
+
+def feed(machine, frames, **kwargs):
+    """Feed (present, moving) frames; returns the frame numbers that fired"""
+    fired = []
+    for number, (present, moving) in enumerate(frames):
+        if machine.update(present, moving, now=float(number), **kwargs):
+            fired.append(number)
+    return fired
+
+
+def test_fires_once_after_settling():
+    machine = TriggerStateMachine(stability_frames=3, cooldown_frames=2)
+    frames = [(True, True)] * 2 + [(True, False)] * 10
+    assert feed(machine, frames) == [5]  # 2 moving frames, then 4 still ones
+    assert machine.state == "present"
+    assert machine.stats()["triggers"] == 1
+    assert machine.stats()["last_latency"] == 5.0
+
+
+def test_motion_restarts_settling():
+    machine = TriggerStateMachine(stability_frames=3, cooldown_frames=0)
+    frames = [(True, False)] * 3 + [(True, True)] + [(True, False)] * 4
+    assert feed(machine, frames) == [7]
+
+
+def test_empty_frames_reset_settling():
+    machine = TriggerStateMachine(stability_frames=3, cooldown_frames=0)
+    frames = [(True, False)] * 3 + [(False, False)] + [(True, False)] * 3
+    assert feed(machine, frames) == []
+    assert machine.stable_count == 3
+
+
+def test_next_item_fires_after_the_last_one_left():
+    machine = TriggerStateMachine(stability_frames=1, cooldown_frames=1, clear_frames=2)
+    frames = ([(True, False)] * 3          # First item: fires on frame 1
+              + [(False, False)]           # One empty frame isn't enough
+              + [(True, False)] * 2        # Same item still there
+              + [(False, False)] * 2       # Gone
+              + [(True, False)] * 3)       # Second item
+    assert feed(machine, frames) == [1, 9]
+
+
+def test_holds_while_busy():
+    machine = TriggerStateMachine(stability_frames=1, cooldown_frames=0)
+    assert feed(machine, [(True, False)] * 4, can_trigger=False) == []
+    assert machine.state == "held"
+    assert machine.update(True, False, can_trigger=True, now=4.0)
+
+
+def test_cooldown_ignores_frames():
+    machine = TriggerStateMachine(stability_frames=0, cooldown_frames=3)
+    assert machine.update(True, False, now=0.0)
+    for number in range(1, 4):
+        assert not machine.update(True, True, now=float(number))
+        assert machine.state == "cooldown"
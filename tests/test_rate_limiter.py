@@ -0,0 +1,22 @@
+"""TokenBucket"""
+
+import pytest
+
+from utils.rate_limiter import TokenBucket
+
+
+def test_burst_then_empty():
+    bucket = TokenBucket(requests_per_minute=60, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_refills_at_the_configured_rate():
+    bucket = TokenBucket(requests_per_minute=600, burst=1)  # One every 0.1 s
+    assert bucket.acquire() == 0.0
+    waited = bucket.acquire()
+    assert 0.05 < waited < 0.2
+
+
+def test_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(requests_per_minute=0)
@@ -0,0 +1,62 @@
+"""ResultCache: namespaces, persistence and eviction"""
+
+import time
+
+from utils.result_cache import ResultCache, hash_bytes, make_namespace
+
+VERDICT = {"item_name": "Phone charger", "safety_level": "Safe to Shred"}
+
+
+def test_namespace_changes_with_the_prompt():
+    schema = {"type": "object"}
+    first = make_namespace("Sort e-waste", schema, "gemini")
+    assert first == make_namespace("Sort e-waste", schema, "gemini")
+    assert first != make_namespace("Sort e-waste!", schema, "gemini")
+    assert first != make_namespace("Sort e-waste", schema, "gemini", extra={"max_side": 768})
+
+
+def test_get_put_and_reopen(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(path)
+    image_hash = hash_bytes(b"jpeg bytes")
+    assert cache.get("v1", image_hash) is None
+    cache.put("v1", image_hash, VERDICT)
+    assert cache.get("v1", image_hash) == VERDICT
+    assert cache.get("v2", image_hash) is None  # Other configuration
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+
+    reopened = ResultCache(path)
+    assert reopened.contains("v1", image_hash)
+    assert reopened.get("v1", image_hash) == VERDICT
+    reopened.close()
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_age_days=0.1 / 86400)
+    cache.put("v1", "abc", VERDICT)
+    time.sleep(0.15)
+    assert cache.get("v1", "abc") is None
+    assert not cache.contains("v1", "abc")
+    cache.close()
+
+
+def test_evicts_the_oldest_above_max_entries(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put("v1", name, VERDICT)
+        time.sleep(0.01)
+    cache.evict()
+    assert not cache.contains("v1", "a")
+    assert cache.contains("v1", "b") and cache.contains("v1", "c")
+    cache.close()
+
+
+def test_file_hash_is_reused_until_the_file_changes(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    image = tmp_path / "photo.jpg"
+    image.write_bytes(b"first")
+    assert cache.hash_file(image) == hash_bytes(b"first")
+    image.write_bytes(b"second!")
+    assert cache.hash_file(image) == hash_bytes(b"second!")
+    cache.close()
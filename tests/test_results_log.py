@@ -0,0 +1,82 @@
+"""Results log, resume and the summary totals"""
+
+import pytest
+
+from utils import analyzer as analyzer_module
+from utils.analyzer import analyze_folder
+from utils.backends import MockBackend
+from utils.results_log import SummaryStats, read_results
+from utils.scanner import in_shard
+
+
+@pytest.fixture
+def prompt(tmp_path, monkeypatch):
+    path = tmp_path / "prompt.md"
+    path.write_text("Sort e-waste")
+    monkeypatch.setattr(analyzer_module, "PROMPT_PATH", str(path))
+
+
+def make_folder(root, names):
+    root.mkdir()
+    for name in names:
+        (root / name).write_bytes(name.encode())
+    return root
+
+
+def run(folder, log, **kwargs):
+    backend = MockBackend(latency=0.0, distribution="fixed", seed=0)
+    stats = analyze_folder(str(folder), cache_path=None, output_path=str(log),
+                           requests_per_minute=60000, backend=backend, **kwargs)
+    return stats, backend.calls
+
+
+def test_resume_skips_done_files(tmp_path, prompt):
+    folder = make_folder(tmp_path / "a", ["img1.jpg", "img2.jpg"])
+    log = tmp_path / "results.jsonl"
+    run(folder, log)
+    stats, calls = run(folder, log, resume=True)
+    assert calls == 0
+    assert stats.total == 2
+
+
+def test_resume_ignores_other_folders_in_the_same_log(tmp_path, prompt):
+    first = make_folder(tmp_path / "a", ["img1.jpg"])
+    second = make_folder(tmp_path / "b", ["img1.jpg", "img2.jpg"])
+    log = tmp_path / "results.jsonl"
+    run(first, log)
+
+    stats, calls = run(second, log, resume=True)
+    assert calls == 2  # b/img1.jpg is not a's img1.jpg
+    assert stats.total == 2
+    assert len(list(read_results(str(log)))) == 3
+    assert len(list(read_results(str(log), root=str(second.resolve())))) == 2
+
+
+def test_resume_only_counts_this_shard(tmp_path, prompt):
+    names = [f"img{number}.jpg" for number in range(20)]
+    folder = make_folder(tmp_path / "a", names)
+    log = tmp_path / "results.jsonl"
+    for index in range(2):
+        run(folder, log, shard=(index, 2))
+    mine = [name for name in names if in_shard(name, (0, 2))]
+    assert 0 < len(mine) < len(names)
+
+    stats, calls = run(folder, log, shard=(0, 2), resume=True)
+    assert calls == 0
+    assert stats.total == len(mine)
+
+
+def test_summary_counts_a_file_once():
+    stats = SummaryStats()
+    stats.add({"path": "a.jpg", "filename": "a.jpg", "safety_level": "Do Not Shred",
+               "error": "503"})
+    stats.add({"path": "a.jpg", "filename": "a.jpg", "safety_level": "Safe to Shred",
+               "bytes_saved": 100, "latency_saved": 0.5})
+    stats.add({"path": "a.jpg", "filename": "a.jpg", "safety_level": "Discard",
+               "bytes_saved": 40, "latency_saved": 0.25})
+    stats.add({"path": "b.jpg", "filename": "b.jpg", "safety_level": "Safe to Shred"})
+
+    assert stats.total == 2
+    assert stats.errors == 0
+    assert dict(stats.levels) == {"Do Not Shred": 0, "Safe to Shred": 1, "Discard": 1}
+    assert (stats.prepared, stats.bytes_saved, stats.latency_saved) == (1, 40, 0.25)
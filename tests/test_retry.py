@@ -0,0 +1,81 @@
+"""CircuitBreaker and call_with_retry"""
+
+import time
+
+import pytest
+
+from utils.retry import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry
+
+
+class ServiceError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def open_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # The trial is still running
+
+
+def test_failed_trial_opens_again():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_bad_request_during_trial_does_not_close_the_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    def bad_request():
+        raise ServiceError(400)
+
+    policy = RetryPolicy(max_attempts=1, base_delay=0.0)
+    with pytest.raises(ServiceError):
+        call_with_retry(bad_request, policy, breaker)
+
+    # Still not known to work: half-open, and the next trial may go
+    assert breaker.state == "half-open"
+    assert breaker.opened_at is not None
+    assert call_with_retry(lambda: "ok", policy, breaker) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_transient_errors_are_retried():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ServiceError(503)
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=4, base_delay=0.0, max_delay=0.01)
+    assert call_with_retry(flaky, policy, CircuitBreaker(failure_threshold=5)) == "ok"
+    assert len(calls) == 3
@@ -0,0 +1,67 @@
+"""scan_images: filtering, order and sharding"""
+
+import os
+
+import pytest
+
+from utils.scanner import parse_shard, scan_images
+
+
+@pytest.fixture
+def archive(tmp_path):
+    for relative in ("a.jpg", "b.PNG", "notes.txt", "day1/c.jpg", "day1/d.jpeg",
+                     "day2/e.jpg", "day2/skip/f.jpg"):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+    return tmp_path
+
+
+def names(root, **kwargs):
+    return [path.relative_to(root).as_posix() for path in scan_images(root, **kwargs)]
+
+
+def test_parse_shard():
+    assert parse_shard("2/8") == (2, 8)
+    for bad in ("8/8", "-1/4", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_finds_images_only(archive):
+    assert sorted(names(archive)) == ["a.jpg", "b.PNG", "day1/c.jpg", "day1/d.jpeg",
+                                      "day2/e.jpg", "day2/skip/f.jpg"]
+    assert sorted(names(archive, recursive=False)) == ["a.jpg", "b.PNG"]
+
+
+def test_include_and_exclude(archive):
+    assert sorted(names(archive, include=["day1/*"])) == ["day1/c.jpg", "day1/d.jpeg"]
+    assert "day2/skip/f.jpg" not in names(archive, exclude=["skip"])
+
+
+def test_order_is_stable(archive):
+    assert names(archive) == names(archive)
+
+
+def test_shards_split_the_archive(archive):
+    everything = sorted(names(archive))
+    shards = [names(archive, shard=(index, 3)) for index in range(3)]
+    combined = sorted(name for shard in shards for name in shard)
+    assert combined == everything  # Every file once, none twice
+
+
+def test_modified_since(archive):
+    old = archive / "a.jpg"
+    os.utime(old, (1000, 1000))
+    assert "a.jpg" not in names(archive, modified_since=2000)
+
+
+def test_symlink_loop_is_scanned_once(archive):
+    try:
+        os.symlink(archive, archive / "day1" / "loop", target_is_directory=True)
+        os.symlink(archive / "day2", archive / "also_day2", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("Can't create symlinks here")
+    found = names(archive)
+    assert len(found) == len(set(found)) == 6
+    assert "also_day2/e.jpg" in found or "day2/e.jpg" in found
@@ -0,0 +1,115 @@
+"""CommandTracker: replies, timeouts, and what survives a lost connection"""
+
+import time
+
+from utils.serial_protocol import CommandTracker, format_command, parse_reply
+
+
+def test_format_and_parse():
+    assert format_command("L180", 42) == "L180@42"
+    assert parse_reply("ACK 42\r\n") == ("ACK", 42, "")
+    assert parse_reply("ERR 7 busy") == ("ERR", 7, "busy")
+    assert parse_reply("READY") == ("READY", None, "")
+    assert parse_reply("ACK nope")[0] == "OTHER"
+
+
+def test_done_and_err_resolve_futures():
+    tracker = CommandTracker()
+    done_seq, done = tracker.track("L180", 2.0)
+    err_seq, err = tracker.track("R180", 2.0)
+
+    assert tracker.on_line(f"ACK {done_seq}") == "ACK"
+    assert not done.done()
+    tracker.on_line(f"DONE {done_seq}")
+    tracker.on_line(f"ERR {err_seq} busy")
+
+    assert done.result(0) is True
+    assert err.result(0) is False
+    stats = tracker.stats()
+    assert (stats["completed"], stats["errors"], stats["waiting"]) == (1, 1, 0)
+
+
+def test_unacknowledged_command_is_resent_then_dropped():
+    tracker = CommandTracker(ack_timeout=0.01, max_resends=1)
+    seq, future = tracker.track("L180", 2.0)
+    time.sleep(0.02)
+    assert tracker.check_timeouts() == [(seq, "L180")]
+    assert not future.done()
+    time.sleep(0.02)
+    assert tracker.check_timeouts() == []
+    assert future.result(0) is False
+    assert tracker.stats()["dropped"] == 1
+
+
+def test_acknowledged_command_times_out_without_resend():
+    tracker = CommandTracker(ack_timeout=0.01, done_margin=0.01)
+    seq, future = tracker.track("L180", 0.0)
+    tracker.on_line(f"ACK {seq}")
+    time.sleep(0.03)
+    assert tracker.check_timeouts() == []  # It may have moved - never resend
+    assert future.result(0) is False
+    assert tracker.stats()["timed_out"] == 1
+
+
+def test_connection_lost_keeps_only_unacknowledged_commands():
+    tracker = CommandTracker()
+    moving_seq, moving = tracker.track("L180", 2.0)
+    _, queued = tracker.track("R180", 2.0)
+    tracker.on_line(f"ACK {moving_seq}")
+
+    assert tracker.connection_lost() == 1
+    assert moving.result(0) is False  # The board resets - it won't finish
+    assert not queued.done()
+    assert tracker.stats()["interrupted"] == 1
+
+
+def test_replay_is_oldest_first():
+    tracker = CommandTracker()
+    seqs = [tracker.track(command, 2.0)[0] for command in ("L180", "R180", "L180", "H90")]
+    tracker.connection_lost()
+    assert tracker.replay(max_age=10.0) == list(zip(seqs, ["L180", "R180", "L180", "H90"]))
+    assert tracker.waiting == 4  # Still waiting for their replies
+
+
+def test_replay_fails_commands_that_are_too_old():
+    tracker = CommandTracker()
+    _, old = tracker.track("L180", 2.0)
+    time.sleep(0.05)
+    new_seq, new = tracker.track("R180", 2.0)
+    tracker.connection_lost()
+
+    assert tracker.replay(max_age=0.03) == [(new_seq, "R180")]
+    assert old.result(0) is False
+    assert not new.done()
+    assert tracker.stats()["expired"] == 1
+
+
+def test_late_reply_after_giving_up_is_ignored():
+    tracker = CommandTracker()
+    seq, future = tracker.track("L180", 2.0)
+    tracker.fail_all("port closed")
+    assert future.result(0) is False
+    assert tracker.on_line(f"DONE {seq}") == "DONE"
+    assert tracker.stats()["completed"] == 0
+
+
+def test_busy_reply_to_a_resend_means_the_first_copy_arrived():
+    tracker = CommandTracker(ack_timeout=0.01)
+    seq, future = tracker.track("L180", 2.0)
+    time.sleep(0.02)
+    assert tracker.check_timeouts() == [(seq, "L180")]  # The ACK got lost
+
+    # Older firmware refuses the copy because the gate is already moving
+    tracker.on_line(f"ACK {seq}")
+    tracker.on_line(f"ERR {seq} busy")
+    assert not future.done()
+    tracker.on_line(f"DONE {seq}")
+    assert future.result(0) is True
+    assert tracker.stats()["errors"] == 0
+
+
+def test_busy_reply_to_a_first_send_is_an_error():
+    tracker = CommandTracker()
+    seq, future = tracker.track("L180", 2.0)
+    tracker.on_line(f"ERR {seq} busy")
+    assert future.result(0) is False
@@ -0,0 +1,69 @@
+"""ArduinoController against the virtual board: sorts across an unplug"""
+
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+pty = pytest.importorskip("pty")
+
+from utils.sorter import ArduinoController
+from utils.virtual_arduino import VirtualArduino
+
+
+@pytest.fixture
+def board(tmp_path):
+    with VirtualArduino(link=str(tmp_path / "arduino"), speed=10.0, boot_seconds=0.1) as sim:
+        yield sim
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_sorts_queued_while_unplugged_go_out_after_reconnect(board):
+    arduino = ArduinoController(port=board.port, replay_window=5.0)
+    assert arduino.connect()
+    assert arduino.acknowledged
+    assert arduino.actuator.wait_idle(5.0)  # The start-up H90
+    try:
+        board.unplug()
+        assert wait_for(lambda: not arduino.connected, 2.0)
+        assert arduino.available  # Reconnecting - still worth sending sorts
+
+        moves_before = board.stats()["moves"]
+        safe = arduino.sort_safe_async()
+        unsafe = arduino.sort_unsafe_async()
+        board.plug()
+
+        assert safe.result(5.0) is True
+        assert unsafe.result(5.0) is True
+        moves = board.stats()["moves"]
+        assert moves["left"] == moves_before["left"] + 1
+        assert moves["right"] == moves_before["right"] + 1
+        assert arduino.connection_stats()["reconnects"] == 1
+    finally:
+        arduino.disconnect()
+
+
+def test_sorts_fail_when_the_board_stays_away(board):
+    arduino = ArduinoController(port=board.port, replay_window=0.5)
+    assert arduino.connect()
+    assert arduino.actuator.wait_idle(5.0)
+    try:
+        board.unplug()
+        assert wait_for(lambda: not arduino.connected, 2.0)
+        assert arduino.sort_safe_async().result(5.0) is False
+        assert wait_for(lambda: not arduino.available, 2.0)
+
+        # Long gone: sorts still go through the controller, fail at once
+        # and are counted
+        assert arduino.sort_unsafe_async().result(1.0) is False
+        assert arduino.connection_stats()["commands_lost"] == 2
+    finally:
+        arduino.disconnect()
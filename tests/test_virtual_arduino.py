@@ -0,0 +1,57 @@
+"""ArduinoController against the virtual board: lost replies"""
+
+import pytest
+
+pytest.importorskip("serial")
+pytest.importorskip("pty")
+
+from utils.sorter import ArduinoController
+from utils.virtual_arduino import VirtualArduino
+
+
+class LosesFirstAck(VirtualArduino):
+    """Board whose ACK for the first sort never reaches the host"""
+
+    lost = False
+    losing = False
+
+    def _handle_command(self, command, now):
+        self.losing = command.startswith("L") and not self.lost
+        super()._handle_command(command, now)
+
+    def _reply(self, word, seq, reason=""):
+        if word == "ACK" and self.losing:
+            self.losing, self.lost = False, True
+            self.replies_dropped += 1
+            return
+        super()._reply(word, seq, reason)
+
+
+@pytest.fixture
+def board(tmp_path):
+    with LosesFirstAck(link=str(tmp_path / "arduino"), speed=1.0, boot_seconds=0.1) as sim:
+        yield sim
+
+
+def test_lost_ack_does_not_fail_or_repeat_the_move(board):
+    arduino = ArduinoController(port=board.port, auto_reconnect=False)
+    assert arduino.connect()
+    assert arduino.actuator.wait_idle(5.0)  # The start-up H90
+    try:
+        assert arduino.sort_safe() is True
+        assert board.lost
+        assert board.stats()["moves"] == {"left": 1, "right": 0}
+        assert board.stats()["errors"] == 0
+        assert arduino.protocol_stats()["resent"] == 1
+    finally:
+        arduino.disconnect()
+
+
+def test_duplicate_of_a_finished_command_is_answered_done():
+    with VirtualArduino(boot_seconds=0.0) as sim:
+        sim._handle_command("L180@7", 0.0)
+        sim._update_motors(10.0)
+        sim._update_motors(20.0)
+        sim._handle_command("L180@7", 30.0)
+        assert sim.stats()["moves"]["left"] == 1
+        assert sim.stats()["errors"] == 0
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Actuator worker - send servo commands without waiting for the servos
+
+A sort used to block its caller for two seconds while the servo moved and
+came back. ActuatorWorker instead queues commands and sends them from its
+own thread. It remembers until when each servo is busy, and only holds a
+command back while *its* servo is still moving. The left and right gates are
+separate motors, so a left move and a right move can run at the same time.
+
+Every command gets a Future that completes when the move is finished - as
+reported by the board when it acknowledges commands, otherwise after the
+expected move time - or fails if the command couldn't be carried out.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVOS = ("left", "right")
+
+# How long each command keeps its servo busy (seconds): out, hold, back
+MOVE_SECONDS = {"L": 2.0, "R": 2.0, "H": 0.5}
+
+
+def servos_for(command: str) -> FrozenSet[str]:
+    """Which servos a command moves (L = left, R = right, H = both)"""
+    letter = command[:1].upper()
+    if letter == "L":
+        return frozenset(["left"])
+    if letter == "R":
+        return frozenset(["right"])
+    return frozenset(SERVOS)
+
+
+class _Command:
+    __slots__ = ("text", "servos", "seconds", "future", "queued_at")
+
+    def __init__(self, text: str, servos: FrozenSet[str], seconds: float, future: Future):
+        self.text = text
+        self.servos = servos
+        self.seconds = seconds
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class ActuatorWorker:
+    """
+    Sends queued servo commands in the background
+
+    Commands for the same servo run one after another, in the order they
+    were submitted. Commands for different servos overlap.
+    """
+
+    def __init__(self, send: Callable[[str], bool],
+                 move_seconds: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            send: Function that writes one command (e.g. "L180") and returns
+                  True if it was sent - or a Future that completes (True or
+                  False) when the board reports the move as finished
+            move_seconds: Busy time per command letter (MOVE_SECONDS if None)
+        """
+        self.send = send
+        self.move_seconds = dict(MOVE_SECONDS, **(move_seconds or {}))
+
+        self._pending = deque()  # Waiting for their servo
+        self._moving: List[tuple] = []  # (done_at, command) - sent, still moving
+        self._busy_until = {servo: 0.0 for servo in SERVOS}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        self.sent = 0
+        self.failed = 0
+        self.total_wait = 0.0  # Time commands spent queued behind a busy servo
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="actuator", daemon=True)
+        self._thread.start()
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = 10.0):
+        """
+        Stop the worker
+
+        Args:
+            drain: Finish the queued commands first (otherwise they fail)
+            timeout: Longest wait for the queue to finish
+        """
+        if drain:
+            self.wait_idle(timeout)
+        with self._condition:
+            self._running = False
+            abandoned = list(self._pending)
+            self._pending.clear()
+            self._condition.notify_all()
+        for command in abandoned:
+            command.future.set_result(False)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def submit(self, command: str, seconds: Optional[float] = None,
+               callback: Optional[Callable[[bool], None]] = None) -> Future:
+        """
+        Queue a command
+
+        Args:
+            command: Command text (e.g. "L180")
+            seconds: How long it keeps its servo busy (by command letter if None)
+            callback: Called with True/False when the move is done or failed
+                      (on the worker thread - keep it short)
+
+        Returns:
+            Future whose result is True once the move is finished, False if
+            it couldn't be sent
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(done.result()))
+        if seconds is None:
+            seconds = self.move_seconds.get(command[:1].upper(), 0.0)
+
+        with self._condition:
+            if not self._running:
+                logger.error(f"Actuator not running - {command} not sent")
+                self.failed += 1
+                future.set_result(False)
+                return future
+            self._pending.append(_Command(command, servos_for(command), seconds, future))
+            self._condition.notify_all()
+        return future
+
+    def busy_until(self, servo: str) -> float:
+        """time.monotonic() at which a servo is free (in the past if it is)"""
+        with self._condition:
+            return self._busy_until[servo]
+
+    @property
+    def pending(self) -> int:
+        """Commands queued or still moving"""
+        with self._condition:
+            return len(self._pending) + len(self._moving)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued move has finished (False on timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._moving:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "queued": len(self._pending),
+                "moving": len(self._moving),
+                "average_wait": self.total_wait / self.sent if self.sent else 0.0,
+            }
+
+    def _next_ready(self, now: float) -> Optional[_Command]:
+        """First queued command whose servos are free (keeping per-servo order)"""
+        blocked = set()
+        for command in self._pending:
+            if not (command.servos & blocked) and all(
+                    self._busy_until[servo] <= now for servo in command.servos):
+                return command
+            blocked |= command.servos
+        return None
+
+    def _run(self):
+        while True:
+            finished = []
+            with self._condition:
+                now = time.monotonic()
+                still_moving = []
+                for done_at, command in self._moving:
+                    (finished if done_at <= now else still_moving).append((done_at, command))
+                self._moving = still_moving
+
+                ready = self._next_ready(now) if self._running else None
+                if ready is not None:
+                    self._pending.remove(ready)
+                    # Mark the servos busy before sending, so nothing else
+                    # slips in for them while the serial write happens
+                    done_at = now + ready.seconds
+                    for servo in ready.servos:
+                        self._busy_until[servo] = done_at
+                elif not finished:
+                    if not self._running and not self._moving:
+                        return
+                    # Sleep until a servo frees up or a command arrives
+                    wake_times = [done_at for done_at, _ in self._moving]
+                    wake_times += [self._busy_until[servo] for command in self._pending
+                                   for servo in command.servos]
+                    wake_times = [t for t in wake_times if now < t < float("inf")]
+                    self._condition.wait(min(wake_times) - now if wake_times else None)
+                    continue
+
+            for _, command in finished:
+                command.future.set_result(True)
+            if finished:
+                with self._condition:
+                    self._condition.notify_all()
+
+            if ready is not None:
+                self._send(ready, done_at)
+
+    def _send(self, command: _Command, done_at: float):
+        ok = False
+        try:
+            ok = self.send(command.text)
+        except Exception as e:
+            logger.error(f"Error sending {command.text}: {e}")
+
+        if isinstance(ok, Future):
+            # The board reports when the move is done - the servos stay busy
+            # until it does, instead of for a guessed time
+            with self._condition:
+                self.sent += 1
+                self.total_wait += time.monotonic() - command.queued_at
+                for servo in command.servos:
+                    self._busy_until[servo] = float("inf")
+                self._moving.append((float("inf"), command))
+            ok.add_done_callback(lambda reply: self._board_done(command, reply.result()))
+            return
+
+        with self._condition:
+            if ok:
+                self.sent += 1
+                self.total_wait += time.monotonic() - command.queued_at
+                self._moving.append((done_at, command))
+            else:
+                self.failed += 1
+                for servo in command.servos:
+                    self._busy_until[servo] = 0.0
+            self._condition.notify_all()
+        if not ok:
+            command.future.set_result(False)
+
+    def _board_done(self, command: _Command, ok: bool):
+        """The board finished (or failed) a command sent with send() returning a Future"""
+        with self._condition:
+            now = time.monotonic()
+            self._moving = [(done_at, moving) for done_at, moving in self._moving
+                            if moving is not command]
+            for servo in command.servos:
+                self._busy_until[servo] = now
+            if not ok:
+                self.failed += 1
+            self._condition.notify_all()
+        command.future.set_result(bool(ok))
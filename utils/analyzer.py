@@ -18,47 +18,67 @@ How it works:
 # Import the tools we need
 import os
 import sys
+import copy
 import json
 import time
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict
-from dotenv import load_dotenv
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+from .rate_limiter import TokenBucket
+from .result_cache import ResultCache, make_namespace, hash_bytes, DEFAULT_CACHE_PATH
+from .image_prep import ImageInput, ImagePreprocessor, encode_image, encode_frame
+from .scanner import scan_images, parse_shard, parse_since, in_shard
+from .retry import RetryPolicy, CircuitBreaker, CircuitOpenError, call_with_retry, is_transient
+from .results_log import (ResultLog, SummaryStats, completed_files, read_results, result_key,
+                          DEFAULT_LOG_PATH)
 
-# Google's AI library for analyzing images
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("Error: Please install the required library:")
-    print("   pip install google-generativeai")
-    sys.exit(1)
+# The AI that looks at the pictures - Google's by default, or an offline
+# stand-in for testing (set EWASTE_BACKEND=mock)
+from .backends import (AnalyzerBackend, MockBackend, MissingAPIKeyError, make_backend,
+                       BACKEND_ENV_VAR, PROMPT_MODES)
 
-# Load settings from .env file (this is where your API key lives)
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # CONFIGURATION - These are settings you can change
 # ============================================================================
 
-# Get your Google API key from the .env file
-API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Check if we have an API key
-if not API_KEY:
-    print("\nERROR: No Google API key found!")
-    print("\nHow to fix this:")
-    print("1. Create a file called '.env' in this folder")
-    print("2. Add this line to it: GOOGLE_API_KEY=your_actual_key_here")
-    print("3. Get a free key from: https://makersuite.google.com/app/apikey")
-    sys.exit(1)
-
-# Set up Google's AI with our key
-genai.configure(api_key=API_KEY)
+# Instructions for the AI (read the first time the analyzer needs them)
+PROMPT_PATH = "prompt.md"
 
 # What types of image files we can analyze
 ALLOWED_IMAGE_TYPES = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
 
+# Give up on a single request after this many seconds
+REQUEST_TIMEOUT = 30.0
+
+# Most items kept for re-analysis while the AI service is down
+MAX_DEFERRED = 500
+
+# How many recent AI call times are kept for the latency numbers
+LATENCY_HISTORY = 1000
+
+# Extra instructions when several images are sent in one request
+BATCH_INSTRUCTIONS = """
+## MULTIPLE IMAGES
+
+You will be shown {count} images. Each one comes right after a line like
+"Image <number>: <file name>". Analyze every image on its own and answer with
+a list containing exactly one object per image, with image_index set to the
+image's number.
+"""
+
 # Rate limiting settings (requests per minute)
 RATE_LIMIT_DELAY = 2.0  # Seconds between requests (30 requests per minute)
+REQUESTS_PER_MINUTE = 60.0 / RATE_LIMIT_DELAY
+
+# How many images can be analyzed at the same time
+MAX_CONCURRENT_REQUESTS = 1
 
 
 
@@ -68,15 +88,45 @@ class SimpleEWasteAnalyzer:
     looks at pictures and tells you about the electronic waste in them.
     """
     
-    def __init__(self):
-        """Set up the analyzer when we create it"""
+    def __init__(self, backend: Optional[AnalyzerBackend] = None,
+                 cache: Optional[ResultCache] = None,
+                 preprocessor: Optional[ImagePreprocessor] = None,
+                 limiter: Optional[TokenBucket] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 prompt_mode: str = "inline"):
+        """
+        Set up the analyzer when we create it
+        
+        Create one analyzer and keep using it - the AI connection, prompt and
+        answer format are all set up once and reused for every picture.
         
-        # This is Google's AI model - like choosing which expert to consult
-        self.ai_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        Args:
+            backend: Which AI to ask (defaults to Gemini, or $EWASTE_BACKEND)
+            cache: Optional result cache so images we've seen before
+                   don't need to be sent to the AI again
+            preprocessor: Optional resize/re-encode step that makes images
+                          smaller before they are sent
+            limiter: Optional rate limiter every API request waits for
+            retry_policy: How to retry temporary errors (rate limits, outages)
+            breaker: Circuit breaker that stops calling the AI while it's down
+            prompt_mode: How the instructions reach the AI - "inline" sends
+                         them with every picture, "system" and "cached" set
+                         them once so each request is much smaller
+        """
+        if prompt_mode not in PROMPT_MODES:
+            raise ValueError(f"Unknown prompt mode: {prompt_mode}")
         
-        # Instructions we give to the AI about what to look for
-        with open("prompt.md", 'r') as f:
-            self.instructions = f.read()
+        # The AI model and the instructions are set up the first time
+        # they are needed (or by warm_up), so creating an analyzer is instant
+        # and the program can open the camera while the AI library loads
+        self._backend = backend
+        self._backend_ready = False
+        self._instructions = None
+        self.prompt_mode = prompt_mode
+        self.instructions_attached = False
+        self._cache_namespace = None
+        self._setup_lock = threading.Lock()
         
         # This tells the AI exactly what format we want the answer in
         self.response_format = {
@@ -103,54 +153,389 @@ class SimpleEWasteAnalyzer:
             },
             "required": ["item_name", "safety_level", "hazards", "notes"]
         }
+        
+        # When several images are sent together, the AI answers with a list
+        # of the same objects, each saying which image it is about
+        batch_item = copy.deepcopy(self.response_format)
+        batch_item["properties"]["image_index"] = {
+            "type": "integer",
+            "description": "Number of the image this answer is for"
+        }
+        batch_item["required"] = ["image_index"] + batch_item["required"]
+        self.batch_response_format = {"type": "array", "items": batch_item}
+        
+        # Every request to the AI waits for this (None = no rate limit)
+        self.limiter = limiter
+        
+        # Temporary errors are retried; if the AI keeps failing we stop
+        # asking for a while and queue the items to look at again later
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.deferred = deque(maxlen=MAX_DEFERRED)
+        
+        # How long each AI call took (newest last), to show the speed
+        self.call_latencies = deque(maxlen=LATENCY_HISTORY)
+        
+        # Shrinks pictures before sending them (None sends them as they are)
+        self.preprocessor = preprocessor
+        
+        # Cached answers are only reused while the prompt, format, model
+        # and preprocessing settings match (see cache_namespace)
+        self.cache = cache
+    
+    @property
+    def backend(self) -> AnalyzerBackend:
+        """The AI model - like choosing which expert to consult"""
+        if not self._backend_ready:
+            with self._setup_lock:
+                if not self._backend_ready:
+                    if self._backend is None:
+                        self._backend = make_backend()
+                    # Hand the instructions over once instead of with every request
+                    if self.prompt_mode != "inline":
+                        self.instructions_attached = self._backend.attach_instructions(
+                            self.instructions, self.prompt_mode)
+                    self._backend_ready = True
+        return self._backend
+    
+    @property
+    def instructions(self) -> str:
+        """Instructions we give to the AI about what to look for (prompt.md)"""
+        if self._instructions is None:
+            with open(PROMPT_PATH, 'r') as f:
+                self._instructions = f.read()
+        return self._instructions
     
-    def analyze_one_image(self, image_path: Path, item_num: int, total: int) -> Dict:
+    @property
+    def cache_namespace(self) -> str:
+        """Fingerprint of everything that can change the AI's answer"""
+        if self._cache_namespace is None:
+            self._cache_namespace = make_namespace(
+                self.instructions, self.response_format,
+                self.backend.model_name,
+                self.preprocessor.signature() if self.preprocessor else None)
+        return self._cache_namespace
+    
+    def warm_up(self):
+        """Load the AI library, connect and read the prompt now instead of on first use"""
+        _ = self.instructions, self.backend
+    
+    def warm_up_in_background(self) -> threading.Thread:
         """
-        Analyze a single image and return the results
+        Run warm_up in a background thread (e.g. while the camera starts)
+        
+        If it fails (say the API key is missing) the error is raised again
+        by warm_up() or the first analysis - call warm_up() before relying
+        on the analyzer to find out.
         
-        Args:
-            image_path: The location of the image file
-            item_num: The item number for display
-            total: Total number of images
-            
         Returns:
-            A dictionary with the analysis results
+            The thread, in case you want to wait for it
         """
+        def warm_up():
+            try:
+                self.warm_up()
+            except Exception as error:
+                logger.debug(f"Analyzer warm-up failed: {error}")
         
-        result = {
-            "filename": image_path.name,
+        thread = threading.Thread(target=warm_up, name="analyzer-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def new_result(self, name: str, item_num: int) -> Dict:
+        """The result we report if the analysis doesn't work out"""
+        return {
+            "filename": name,
             "item_num": item_num,
             "item_name": "Unknown",
             "safety_level": "Do Not Shred",  # Default to safe option
             "hazards": [],
             "notes": "",
-            "error": None
+            "error": None,
+            "cached": False
+        }
+    
+    def prepare_image(self, image: ImageInput, result: Dict, box=None):
+        """
+        Get an image ready to send, or fill in the result from the cache
+        
+        Args:
+            image: File path, encoded bytes or a camera frame
+            result: Result dictionary to fill in
+            box: Optional motion box for the preprocessor
+            
+        Returns:
+            (image, image_hash) where image is a dict with the name, MIME type
+            and encoded bytes, or None if the cache already answered
+        """
+        
+        # Have we already analyzed this exact picture?
+        image_hash = None
+        if self.cache and isinstance(image, Path):
+            image_hash = self.cache.hash_file(image)
+            if self.use_cached_answer(image_hash, result):
+                return None
+        
+        # Get the picture as bytes (frames are encoded in memory),
+        # shrinking it first if we have a preprocessor
+        if self.preprocessor:
+            prepared = self.preprocessor.prepare(image, box)
+            image_data, mime_type = prepared["data"], prepared["mime_type"]
+            result["bytes_sent"] = prepared["bytes_sent"]
+            result["bytes_saved"] = prepared["bytes_saved"]
+            result["latency_saved"] = prepared["latency_saved"]
+        else:
+            image_data, mime_type = encode_image(image)
+        
+        if self.cache and image_hash is None:
+            image_hash = hash_bytes(image_data)
+            if self.use_cached_answer(image_hash, result):
+                return None
+        
+        return {"name": result["filename"], "mime_type": mime_type, "data": image_data}, image_hash
+    
+    def use_cached_answer(self, image_hash: str, result: Dict) -> bool:
+        """Fill in the result from the cache if we can"""
+        cached_answer = self.cache.get(self.cache_namespace, image_hash)
+        if cached_answer is None:
+            return False
+        result.update(cached_answer)
+        result["cached"] = True
+        return True
+    
+    def ask_ai(self, images: List[Dict], response_format: Dict,
+               extra_prompt: Optional[List[str]] = None, labels: Optional[List[str]] = None):
+        """
+        Send one request to the AI, retrying temporary errors
+        
+        Every attempt waits for the rate limiter first. Raises
+        CircuitOpenError straight away while the AI service is down.
+        
+        Args:
+            images: Prepared images (from prepare_image)
+            response_format: JSON schema for the answer
+            extra_prompt: Text to add after the instructions
+            labels: Text to send right before each image
+            
+        Returns:
+            The parsed JSON answer
+        """
+        backend = self.backend
+        prompt = ([] if self.instructions_attached else [self.instructions]) + (extra_prompt or [])
+        
+        def send():
+            start = time.perf_counter()
+            answer = backend.generate(prompt, images, response_format,
+                                      labels=labels, timeout=REQUEST_TIMEOUT)
+            self.call_latencies.append(time.perf_counter() - start)
+            return json.loads(answer)
+        
+        return call_with_retry(send, self.retry_policy, self.breaker,
+                               before_attempt=self.limiter.acquire if self.limiter else None)
+    
+    def close(self):
+        """Let the backend clean up on the AI side (e.g. its context cache)"""
+        if self._backend is not None:
+            self._backend.close()
+    
+    def latency_summary(self) -> Dict:
+        """
+        How long recent AI calls took
+        
+        Returns:
+            dict with count, last, mean, p50 and p95 (seconds)
+        """
+        latencies = list(self.call_latencies)
+        if not latencies:
+            return {"count": 0, "last": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0}
+        ordered = sorted(latencies)
+        return {
+            "count": len(latencies),
+            "last": latencies[-1],
+            "mean": sum(latencies) / len(latencies),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
         }
+    
+    def defer(self, image: ImageInput, name: str, box=None):
+        """Keep an image to analyze again once the AI service is back"""
+        if len(self.deferred) == self.deferred.maxlen:
+            print(f"\nWarning: re-analysis queue full, dropping {self.deferred[0][1]}\n")
+        # Keep camera frames as JPEG bytes - much smaller than raw pixels
+        if not isinstance(image, (str, Path, bytes)):
+            image = encode_frame(image)
+        self.deferred.append((image, name, box))
+    
+    def retry_deferred(self) -> List[Dict]:
+        """
+        Analyze the queued images again (ones that still fail are queued again)
+        
+        Returns:
+            Results for every image that was in the queue
+        """
+        results = []
+        for _ in range(len(self.deferred)):
+            image, name, box = self.deferred.popleft()
+            results.append(self.analyze_one_image(image, name=name, box=box))
+        return results
+    
+    def analyze_one_image(self, image: ImageInput, item_num: int = 1, total: int = 1,
+                          name: Optional[str] = None, box=None) -> Dict:
+        """
+        Analyze a single image and return the results
+        
+        Args:
+            image: The location of the image file, encoded image bytes,
+                   or a camera frame (NumPy array) - frames never touch the disk
+            item_num: The item number for display
+            total: Total number of images
+            name: Name to show for bytes/frames (files use their own name)
+            box: Optional (x, y, w, h) motion box the preprocessor may crop to
+            
+        Returns:
+            A dictionary with the analysis results
+            
+        Raises:
+            MissingAPIKeyError, ImportError: The AI can't be used at all
+        """
+        
+        if isinstance(image, (str, Path)):
+            image = Path(image)
+            name = image.name
+        
+        result = self.new_result(name or "frame", item_num)
         
         try:
-            # Step 1: Upload the image to Google
-            uploaded_image = genai.upload_file(str(image_path))
+            # Step 1: Check the cache and get the picture ready to send
+            prepared = self.prepare_image(image, result, box)
+            if prepared is None:
+                return result
+            prepared_image, image_hash = prepared
             
-            # Step 2: Ask the AI to analyze it
-            response = self.ai_model.generate_content(
-                [self.instructions, uploaded_image],
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    response_schema=self.response_format,
-                    temperature=0.1  # Makes answers more consistent
-                )
-            )
+            # Step 2: Ask the AI to analyze it (and time it, retries included)
+            start = time.perf_counter()
+            ai_answer = self.ask_ai([prepared_image], self.response_format)
+            result["latency"] = time.perf_counter() - start
             
             # Step 3: Get the answer and save it
-            ai_answer = json.loads(response.text)
             result.update(ai_answer)
             
+            # Step 4: Remember the answer for next time
+            if self.cache:
+                self.cache.put(self.cache_namespace, image_hash, ai_answer)
+            
+        except (MissingAPIKeyError, ImportError):
+            # Not a problem with this picture - every other one would fail
+            # the same way, so let the caller stop instead of sorting blind
+            raise
         except Exception as error:
             # If something goes wrong, save the error
             result["error"] = str(error)
-            print(f"\nFailed to process {image_path.name}: {error}\n")
+            print(f"\nFailed to process {result['filename']}: {error}\n")
+            
+            # The AI is down or overloaded - look at this one again later
+            if isinstance(error, CircuitOpenError) or is_transient(error):
+                result["deferred"] = True
+                self.defer(image, result["filename"], box)
         
         return result
+    
+    def is_valid_answer(self, answer) -> bool:
+        """Check that one answer from a batch has everything we asked for"""
+        if not isinstance(answer, dict):
+            return False
+        properties = self.response_format["properties"]
+        if any(field not in answer for field in self.response_format["required"]):
+            return False
+        if answer["safety_level"] not in properties["safety_level"]["enum"]:
+            return False
+        return isinstance(answer["hazards"], list)
+    
+    def analyze_batch(self, image_paths: List[Path], batch_size: int = 4,
+                      first_item_num: int = 1) -> List[Dict]:
+        """
+        Analyze several images with one request per `batch_size` images
+        
+        Every image in a request is labelled with its number and file name,
+        and the AI answers with a list. Answers are matched back to files by
+        image_index; any image whose answer is missing or broken is analyzed
+        again on its own. If the AI is down or overloaded the whole group is
+        deferred instead (see retry_deferred).
+        
+        Args:
+            image_paths: Image files to analyze
+            batch_size: How many images to send in each request
+            first_item_num: Item number of the first image (for display)
+            
+        Returns:
+            One result dictionary per image, in the same order as image_paths
+            
+        Raises:
+            MissingAPIKeyError, ImportError: The AI can't be used at all
+        """
+        
+        results = []
+        to_send = []  # (position, prepared image, image_hash)
+        
+        # Step 1: Answer what we can from the cache, prepare the rest
+        for position, image_path in enumerate(image_paths):
+            image_path = Path(image_path)
+            result = self.new_result(image_path.name, first_item_num + position)
+            results.append(result)
+            try:
+                prepared = self.prepare_image(image_path, result)
+                if prepared is not None:
+                    to_send.append((position,) + prepared)
+            except (MissingAPIKeyError, ImportError):
+                raise
+            except Exception as error:
+                result["error"] = str(error)
+                print(f"\nFailed to process {image_path.name}: {error}\n")
+        
+        # Step 2: Send the rest in groups of batch_size
+        for start in range(0, len(to_send), max(1, batch_size)):
+            group = to_send[start:start + batch_size]
+            
+            images = [prepared_image for _, prepared_image, _ in group]
+            labels = [f"Image {index}: {results[position]['filename']}"
+                      for index, (position, _, _) in enumerate(group)]
+            
+            answers = {}
+            try:
+                batch_prompt = [BATCH_INSTRUCTIONS.format(count=len(group))]
+                for answer in self.ask_ai(images, self.batch_response_format, batch_prompt, labels):
+                    if isinstance(answer, dict) and isinstance(answer.get("image_index"), int):
+                        answers[answer.pop("image_index")] = answer
+            except (MissingAPIKeyError, ImportError):
+                raise
+            except Exception as error:
+                if (isinstance(error, CircuitOpenError) or is_transient(error)
+                        or self.breaker.state == "open"):
+                    # The AI is down or overloaded - asking about each image
+                    # on its own would only multiply the load, so look at
+                    # the whole group again later
+                    print(f"\nBatch request failed, {len(group)} images queued "
+                          f"for later: {error}\n")
+                    for position, _, _ in group:
+                        results[position]["error"] = str(error)
+                        results[position]["deferred"] = True
+                        self.defer(Path(image_paths[position]), results[position]["filename"])
+                    continue
+                print(f"\nBatch request failed, analyzing images one by one: {error}\n")
+            
+            # Step 3: Match answers back to files
+            for index, (position, _, image_hash) in enumerate(group):
+                answer = answers.get(index)
+                if not self.is_valid_answer(answer):
+                    # Missing or broken - ask about this image on its own
+                    results[position] = self.analyze_one_image(
+                        Path(image_paths[position]), first_item_num + position)
+                    continue
+                
+                results[position].update(answer)
+                if self.cache:
+                    self.cache.put(self.cache_namespace, image_hash, answer)
+        
+        return results
 
 # ============================================================================
 # HELPER FUNCTIONS - These make the output look nice
@@ -180,59 +565,156 @@ def print_single_result(result: Dict):
     if result['notes'] and result['item_name'] != "Unknown":
         print(f"        Notes: {result['notes']}")
     
+    if 'bytes_saved' in result:
+        print(f"        Upload: {result['bytes_sent'] / 1e3:.0f} KB "
+              f"(saved {result['bytes_saved'] / 1e3:.0f} KB, ~{result['latency_saved']:.2f} s)")
+    
     print("\n    ====================================================================")
 
-def print_summary(all_results: List[Dict], processing_time: float):
+def print_summary(all_results: Union[Iterable[Dict], SummaryStats], processing_time: float,
+                  processed: Optional[int] = None):
     """
     Print a summary of all results
     
     Args:
-        all_results: List of all analysis results
+        all_results: All analysis results (a list, a stream read back from a
+                     results log, or running totals that were kept as we went)
         processing_time: Total time taken
+        processed: Images analyzed in this run (defaults to all of them)
     """
     
+    # Count different safety levels (one result at a time - no big list needed)
+    if isinstance(all_results, SummaryStats):
+        stats = all_results
+    else:
+        stats = SummaryStats.from_results(all_results)
+    
     print("\n" + "="*70)
     print("\nPROCESSING SUMMARY:\n")
     
-    # Count different safety levels
-    total = len(all_results)
-    safe = sum(1 for r in all_results if r['safety_level'] == 'Safe to Shred')
-    needs_work = sum(1 for r in all_results if r['safety_level'] == 'Requires Preprocessing')
-    dangerous = sum(1 for r in all_results if r['safety_level'] == 'Do Not Shred')
-    not_ewaste = sum(1 for r in all_results if r['safety_level'] == 'Discard')
-    errors = sum(1 for r in all_results if r['error'])
+    total = stats.total
+    errors = stats.errors
+    processed = total if processed is None else processed
     
     print(f"  Total Images: {total}")
     print(f"  Successfully Processed: {total - errors}")
     print(f"  Failed: {errors}")
     print(f"  Processing Time: {processing_time:.1f} seconds")
-    print(f"  Average Time per Image: {processing_time/total:.1f} seconds")
+    if processed:
+        print(f"  Average Time per Image: {processing_time/processed:.1f} seconds")
     
     print("\n  Safety Breakdown:")
-    print(f"    - Safe to Shred: {safe}")
-    print(f"    - Requires Preprocessing: {needs_work}")
-    print(f"    - Do Not Shred: {dangerous}")
-    print(f"    - Non E-waste (Discard): {not_ewaste}")
+    print(f"    - Safe to Shred: {stats.levels['Safe to Shred']}")
+    print(f"    - Requires Preprocessing: {stats.levels['Requires Preprocessing']}")
+    print(f"    - Do Not Shred: {stats.levels['Do Not Shred']}")
+    print(f"    - Non E-waste (Discard): {stats.levels['Discard']}")
+    
+    # Show what the preprocessor saved (only images that were actually sent)
+    if stats.prepared:
+        print("\n  Preprocessing:")
+        print(f"    - Upload Size Saved: {stats.bytes_saved / 1e6:.1f} MB "
+              f"({stats.bytes_saved / stats.prepared / 1e3:.0f} KB per image)")
+        print(f"    - Estimated Time Saved: {stats.latency_saved:.1f} seconds "
+              f"({stats.latency_saved / stats.prepared:.2f} s per image)")
     
     # List failed files if any
-    failed_results = [r for r in all_results if r['error']]
-    if failed_results:
+    if stats.failed:
         print("\n  Failed Files:")
-        for r in failed_results:
-            print(f"    - {r['filename']}")
+        for filename in stats.failed:
+            print(f"    - {filename}")
     
     print("\n" + "="*70)
 
+def analyze_in_order(analyzer: SimpleEWasteAnalyzer, image_files: Iterable[Path],
+                     workers: int = 1, batch_size: int = 1) -> Iterator[Tuple[Path, Dict]]:
+    """
+    Analyze images on a thread pool, yielding results in the original order
+    
+    Up to `workers` requests are in flight at once and the analyzer's rate
+    limiter decides when each one may start. Images are taken from
+    image_files lazily and only a small window is queued ahead, so results
+    are handed back as soon as everything before them is done.
+    
+    Args:
+        analyzer: The analyzer to use (shared by all threads)
+        image_files: Images to analyze (any iterable, e.g. a folder scan)
+        workers: Maximum number of requests in flight
+        batch_size: Images per request (1 = one request per image)
+        
+    Yields:
+        (image_file, result) pairs, in the same order as image_files
+    """
+    
+    def analyze(group: List[Path], first_index: int) -> List[Tuple[Path, Dict]]:
+        if batch_size > 1:
+            results = analyzer.analyze_batch(group, batch_size, first_index)
+        else:
+            results = [analyzer.analyze_one_image(group[0], first_index)]
+        return list(zip(group, results))
+    
+    image_files = iter(image_files)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    next_index = 1
+    try:
+        while True:
+            group = list(islice(image_files, batch_size))
+            if not group:
+                break
+            pending.append(executor.submit(analyze, group, next_index))
+            next_index += len(group)
+            
+            # Don't queue up more than a couple of requests per worker
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Stop anything not started yet (e.g. after Ctrl-C)
+        executor.shutdown(wait=True, cancel_futures=True)
+
 # ============================================================================
 # MAIN FUNCTION - This runs everything
 # ============================================================================
 
-def analyze_folder(folder_path: str = "images/"):
+def analyze_folder(folder_path: str = "images/",
+                   workers: int = MAX_CONCURRENT_REQUESTS,
+                   requests_per_minute: float = REQUESTS_PER_MINUTE,
+                   cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                   preprocessor: Optional[ImagePreprocessor] = None,
+                   batch_size: int = 1,
+                   output_path: Optional[str] = None,
+                   resume: bool = False,
+                   recursive: bool = False,
+                   include: Optional[List[str]] = None,
+                   exclude: Optional[List[str]] = None,
+                   modified_since: Optional[float] = None,
+                   shard: Optional[Tuple[int, int]] = None,
+                   backend: Optional[AnalyzerBackend] = None,
+                   prompt_mode: str = "inline") -> Optional[SummaryStats]:
     """
     Main function that analyzes all images in a folder
     
     Args:
         folder_path: Where to look for images (default: "images/")
+        workers: How many images to analyze at the same time
+        requests_per_minute: Maximum API calls per minute across all workers
+        cache_path: Where to keep previous answers (None turns the cache off)
+        preprocessor: How to shrink images before sending (None sends originals)
+        batch_size: Images to send in each request (1 = one at a time)
+        output_path: JSONL file every result is appended to as soon as it's done
+        resume: Skip images that already have a successful result in output_path
+        recursive: Also look in sub-folders
+        include: Only analyze files matching one of these globs
+        exclude: Skip files and folders matching any of these globs
+        modified_since: Only analyze files modified at or after this timestamp
+        shard: (index, count) - only analyze this machine's share of the files
+        backend: Which AI to ask (defaults to Gemini, or $EWASTE_BACKEND)
+        prompt_mode: "inline", "system" or "cached" (see SimpleEWasteAnalyzer)
+        
+    Returns:
+        The summary totals (None if there was nothing to analyze)
     """
     
     # Check if the folder exists
@@ -241,45 +723,95 @@ def analyze_folder(folder_path: str = "images/"):
         print(f"\nError: The folder '{folder_path}' doesn't exist!")
         return
     
-    # Find all image files in the folder
-    image_files = []
-    for file in folder.iterdir():
-        if file.is_file() and file.suffix.lower() in ALLOWED_IMAGE_TYPES:
-            image_files.append(file)
+    # Find image files in the folder - lazily, so we can start right away
+    image_files = scan_images(folder, recursive=recursive, include=include, exclude=exclude,
+                              modified_since=modified_since, shard=shard,
+                              extensions=ALLOWED_IMAGE_TYPES)
     
-    # Check if we found any images
-    if not image_files:
-        print(f"No images found in '{folder_path}'")
-        return
+    # Results are logged with the folder they came from, since one log can
+    # be shared by several folders (and by the shards of one folder)
+    root = str(folder.resolve())
+    
+    # When resuming, skip everything the results log already has for this
+    # folder and shard (and count those results towards the summary)
+    stats = SummaryStats()
+    if resume and output_path:
+        done = {key for key in completed_files(output_path, root) if in_shard(key, shard)}
+        image_files = (f for f in image_files if f.relative_to(folder).as_posix() not in done)
+        for result in read_results(output_path, root):
+            if in_shard(result_key(result), shard):
+                stats.add(result)
+        print(f"\nResuming: {len(done)} images already done")
     
-    total_images = len(image_files)
-    print(f"\nProcessing {total_images} images from '{folder_path}'\n")
+    shard_note = f" (shard {shard[0]}/{shard[1]})" if shard else ""
+    print(f"\nProcessing images from '{folder_path}'{shard_note}\n")
     
-    # Create the analyzer
-    analyzer = SimpleEWasteAnalyzer()
+    # Rate limiting - every API call takes a token from this bucket
+    workers = max(1, workers)
+    limiter = TokenBucket(requests_per_minute, burst=workers)
+    
+    # Create the analyzer (with a cache so re-runs skip images we've seen)
+    cache = ResultCache(cache_path) if cache_path else None
+    analyzer = SimpleEWasteAnalyzer(backend=backend, cache=cache,
+                                    preprocessor=preprocessor, limiter=limiter,
+                                    prompt_mode=prompt_mode)
+    
+    # Every result goes to the log right away, so nothing is lost on a crash
+    results_log = ResultLog(output_path) if output_path else None
     
     # Track time
     start_time = time.time()
     
-    # Analyze each image
-    all_results = []
-    for index, image_file in enumerate(image_files, 1):
-        # Analyze this image
-        result = analyzer.analyze_one_image(image_file, index, total_images)
-        all_results.append(result)
-        
-        # Print the result right away
-        print_single_result(result)
-        
-        # Rate limiting - pause between API calls
-        if index < len(image_files):
-            time.sleep(RATE_LIMIT_DELAY)
+    # Analyze each image (results come back in the original order)
+    processed = 0
+    try:
+        results = analyze_in_order(analyzer, image_files, workers, max(1, batch_size))
+        for image_file, result in results:
+            result["root"] = root
+            result["path"] = image_file.relative_to(folder).as_posix()
+            if results_log:
+                results_log.append(result)
+            stats.add(result)
+            processed += 1
+            
+            # Print the result right away
+            print_single_result(result)
+    except KeyboardInterrupt:
+        print("\nStopped early!")
+        if results_log:
+            print(f"Finished results are saved in '{output_path}' - use --resume to continue")
+    finally:
+        analyzer.close()
+        if results_log:
+            results_log.close()
+        if cache:
+            cache.close()
+    
+    # Check if we found any images
+    if stats.total == 0:
+        print(f"No images found in '{folder_path}'")
+        return
     
     # Calculate total time
     processing_time = time.time() - start_time
     
     # Print summary
-    print_summary(all_results, processing_time)
+    print_summary(stats, processing_time, processed)
+    
+    if cache:
+        print(f"  Cache: {cache.hits} reused, {cache.misses} analyzed")
+    
+    latency = analyzer.latency_summary()
+    if latency["count"]:
+        print(f"  AI call time: {latency['mean']:.2f} s average, "
+              f"{latency['p95']:.2f} s p95 ({latency['count']} calls)")
+    
+    if analyzer.deferred:
+        print(f"\n  {len(analyzer.deferred)} images failed because the AI service was unavailable.")
+        if output_path:
+            print("  Run again with --resume to analyze them.")
+    
+    return stats
 
 # ============================================================================
 # RUN THE PROGRAM
@@ -288,5 +820,74 @@ def analyze_folder(folder_path: str = "images/"):
 if __name__ == "__main__":
     """This runs when you execute the script"""
     
-    # Always analyze the images folder
-    analyze_folder("images/")
+    parser = argparse.ArgumentParser(description="Analyze a folder of e-waste images")
+    parser.add_argument("folder", nargs="?", default="images/",
+                        help="Folder with images (default: images/)")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="Images to analyze at the same time")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE,
+                        help="Maximum API requests per minute")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Images to send in each request")
+    parser.add_argument("--output", default=DEFAULT_LOG_PATH,
+                        help=f"Append every result to this JSONL file (default: {DEFAULT_LOG_PATH})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip images that already have a result in the output file")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Also analyze images in sub-folders")
+    parser.add_argument("--include", action="append",
+                        help="Only analyze files matching this glob (can repeat)")
+    parser.add_argument("--exclude", action="append",
+                        help="Skip files/folders matching this glob (can repeat)")
+    parser.add_argument("--since", type=parse_since,
+                        help="Only analyze files modified since this date (e.g. 2025-08-01)")
+    parser.add_argument("--shard", type=parse_shard,
+                        help="Only analyze shard i of N (e.g. 0/4) - run one per machine")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help=f"Result cache file (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Analyze every image again, ignoring the cache")
+    parser.add_argument("--max-edge", type=int, default=1536,
+                        help="Shrink images to this long edge before sending (0 = send originals)")
+    parser.add_argument("--format", choices=["jpeg", "webp"], default="jpeg",
+                        help="Format to re-encode images as")
+    parser.add_argument("--quality", type=int, default=85,
+                        help="Re-encoding quality (0-100)")
+    parser.add_argument("--prompt-mode", choices=PROMPT_MODES, default="inline",
+                        help="Send the instructions with every request (inline), once as a "
+                             "system instruction (system), or as a server-side cache (cached)")
+    parser.add_argument("--backend", choices=["gemini", "mock"],
+                        help="Which AI to use (default: gemini, or $EWASTE_BACKEND)")
+    parser.add_argument("--mock-latency", type=float, default=1.0,
+                        help="Mock backend: typical seconds per request")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0,
+                        help="Mock backend: chance (0-1) of a simulated outage error")
+    parser.add_argument("--mock-verdicts",
+                        help="Mock backend: JSON file of canned verdicts by file name or hash")
+    args = parser.parse_args()
+    
+    try:
+        if (args.backend or os.getenv(BACKEND_ENV_VAR, "")).lower() == "mock":
+            mock_settings = {"latency": args.mock_latency, "error_rate": args.mock_error_rate}
+            if args.mock_verdicts:
+                backend = MockBackend.from_file(args.mock_verdicts, **mock_settings)
+            else:
+                backend = MockBackend(**mock_settings)
+        else:
+            backend = make_backend(args.backend)
+    except (MissingAPIKeyError, ImportError) as error:
+        print(f"\n{error}")
+        sys.exit(1)
+    
+    preprocessor = None
+    if args.max_edge > 0:
+        preprocessor = ImagePreprocessor(max_long_edge=args.max_edge,
+                                         output_format=args.format, quality=args.quality)
+    
+    analyze_folder(args.folder, workers=args.workers, requests_per_minute=args.rpm,
+                   cache_path=None if args.no_cache else args.cache,
+                   preprocessor=preprocessor, batch_size=args.batch_size,
+                   output_path=args.output, resume=args.resume,
+                   recursive=args.recursive, include=args.include, exclude=args.exclude,
+                   modified_since=args.since, shard=args.shard, backend=backend,
+                   prompt_mode=args.prompt_mode)
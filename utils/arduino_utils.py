@@ -1,68 +1,304 @@
 #!/usr/bin/env python3
 """
 Arduino utilities - auto port detection
+
+Finding the board used to mean opening every USB serial port in turn. Now:
+
+1. The last port that worked is kept in .ewaste_cache/arduino_port.json.
+   If that board (same USB serial number) is still plugged in, it is used
+   straight away - no port is opened.
+2. Otherwise ports are picked by USB vendor/product ID (Arduino, CH340,
+   CP210x, FTDI). If exactly one matches, that's the board.
+3. If it's still unclear, all candidates are opened at once and the one
+   whose firmware says READY wins (see arduino/simple_arduino_servo.ino).
+
+Results are reused until a USB device is plugged in or out, so asking twice
+costs nothing. PortWatcher reports those changes as they happen.
 """
 
+import os
+import json
 import serial.tools.list_ports
 import serial
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from .serial_protocol import READY_LINE
 
 logger = logging.getLogger(__name__)
 
-def find_arduino_port():
+PORT_CACHE_PATH = ".ewaste_cache/arduino_port.json"
+
+# USB vendor ID -> product IDs (None = any product from that vendor)
+ARDUINO_USB_IDS = {
+    0x2341: None,              # Arduino
+    0x2A03: None,              # Arduino (arduino.org)
+    0x1A86: {0x7523, 0x5523},  # CH340 / CH341 (most clones)
+    0x10C4: {0xEA60},          # Silicon Labs CP210x
+    0x0403: {0x6001, 0x6015},  # FTDI
+}
+
+# Fallback for ports without USB details
+ARDUINO_KEYWORDS = ['usbmodem', 'usbserial', 'Arduino', 'CH340', 'CP210', 'FTDI', 'USB']
+
+HANDSHAKE_TIMEOUT = 2.5  # The board restarts when opened; READY follows
+
+_scan_lock = threading.Lock()
+_last_scan: Tuple[Optional[tuple], Optional[str]] = (None, None)  # (ports signature, result)
+
+
+def is_known_board(port) -> bool:
+    """True if a port's USB vendor/product ID is an Arduino or common clone"""
+    if port.vid not in ARDUINO_USB_IDS:
+        return False
+    products = ARDUINO_USB_IDS[port.vid]
+    return products is None or port.pid in products
+
+
+def _matches_keyword(port) -> bool:
+    port_str = f"{port.device} {port.description}".lower()
+    return any(keyword.lower() in port_str for keyword in ARDUINO_KEYWORDS)
+
+
+def _signature(ports) -> tuple:
+    """Identifies the set of plugged-in ports (changes on hot-plug)"""
+    return tuple(sorted((p.device, p.vid, p.pid, p.serial_number) for p in ports))
+
+
+def wait_for_ready(connection, timeout: float) -> bool:
+    """
+    Read start-up output until the firmware says READY
+
+    Args:
+        connection: Open serial.Serial with a short read timeout
+        timeout: Longest wait (seconds)
+
+    Returns:
+        True on READY, False if it never came (e.g. older firmware)
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = connection.readline().decode('utf-8', errors='replace').strip()
+        if line == READY_LINE:
+            return True
+    return False
+
+
+def probe_port(device: str, baud_rate: int = 9600,
+               timeout: float = HANDSHAKE_TIMEOUT) -> Optional[bool]:
+    """
+    Open a port and wait for the firmware's READY
+
+    Returns:
+        True if the firmware answered, False if the port opened but stayed
+        quiet (maybe older firmware), None if it couldn't be opened
+    """
+    try:
+        with serial.Serial(device, baud_rate, timeout=0.1) as conn:
+            return wait_for_ready(conn, timeout)
+    except (serial.SerialException, OSError) as e:
+        logger.debug(f"Can't open {device}: {e}")
+        return None
+
+
+def _load_cached_port(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remember_arduino_port(device: str, path: str = PORT_CACHE_PATH):
+    """Save the port that worked, so the next start finds it immediately"""
+    entry = {"device": device}
+    for port in serial.tools.list_ports.comports():
+        if port.device == device:
+            entry.update(vid=port.vid, pid=port.pid, serial_number=port.serial_number)
+            break
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        temp = f"{path}.part"
+        with open(temp, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp, path)
+    except OSError as e:
+        logger.warning(f"Couldn't save the Arduino port: {e}")
+
+
+def forget_arduino_port(path: str = PORT_CACHE_PATH):
+    """Drop the saved port (it stopped working) and scan again next time"""
+    global _last_scan
+    with _scan_lock:
+        _last_scan = (None, None)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _cached_port(ports, path: str) -> Optional[str]:
+    """The saved board, if it is still plugged in (it may have a new name)"""
+    cached = _load_cached_port(path)
+    if not cached:
+        return None
+    for port in ports:
+        if cached.get("serial_number"):
+            # Same board, even if it came back under another name
+            if (port.serial_number == cached["serial_number"]
+                    and port.vid == cached.get("vid")):
+                return port.device
+        elif port.device == cached.get("device") and port.vid == cached.get("vid"):
+            return port.device
+    return None
+
+
+def _scan(ports, baud_rate: int) -> Optional[str]:
+    """Pick the board among the plugged-in ports"""
+    known = [p.device for p in ports if is_known_board(p)]
+    if len(known) == 1:
+        logger.info(f"Found Arduino at {known[0]} (USB ID)")
+        return known[0]
+
+    candidates = known or [p.device for p in ports if _matches_keyword(p)]
+    if not candidates:
+        return None
+
+    # Several possibilities - ask them all at once which one is our board
+    quiet = []
+    pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="port-probe")
+    try:
+        probes = {pool.submit(probe_port, device, baud_rate): device for device in candidates}
+        for probe in as_completed(probes):
+            device = probes[probe]
+            answer = probe.result()
+            if answer:
+                logger.info(f"Found Arduino at {device} (firmware replied)")
+                return device
+            if answer is False:
+                quiet.append(device)
+    finally:
+        # Don't wait for the other probes - they close their ports themselves
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Nobody said READY - older firmware; take the first that opened,
+    # preferring the USB ID matches (candidates are in listing order)
+    for device in candidates:
+        if device in quiet:
+            logger.info(f"Found Arduino at {device} (no firmware reply)")
+            return device
+    return None
+
+
+def find_arduino_port(baud_rate: int = 9600, use_cache: bool = True,
+                      cache_path: str = PORT_CACHE_PATH) -> Optional[str]:
     """
     Automatically find Arduino port
-    
+
+    Args:
+        baud_rate: Speed used for the READY handshake
+        use_cache: Try the last port that worked first, and reuse the last
+                   scan while no USB device was plugged in or out
+        cache_path: Where the last port is saved
+
     Returns:
         str: Port path if found, None otherwise
     """
+    global _last_scan
     ports = list(serial.tools.list_ports.comports())
-    
-    # Common Arduino identifiers
-    arduino_keywords = ['usbmodem', 'usbserial', 'Arduino', 'CH340', 'CP210', 'FTDI', 'USB']
-    
-    for port in ports:
-        port_str = f"{port.device} {port.description}".lower()
-        
-        for keyword in arduino_keywords:
-            if keyword.lower() in port_str:
-                # Test if it's actually an Arduino by trying to connect
+    signature = _signature(ports)
+
+    with _scan_lock:
+        if use_cache:
+            if _last_scan[0] == signature:
+                return _last_scan[1]  # Nothing plugged in or out since
+            device = _cached_port(ports, cache_path)
+            if device:
+                logger.info(f"Found Arduino at {device} (last used)")
+                _last_scan = (signature, device)
+                return device
+
+        device = _scan(ports, baud_rate)
+        _last_scan = (signature, device)
+
+    if device is None:
+        logger.error("No Arduino found")
+    elif use_cache:
+        remember_arduino_port(device, cache_path)
+    return device
+
+
+class PortWatcher:
+    """
+    Notices USB serial ports being plugged in or out
+
+    Checks the port list (cheap - nothing is opened) every `interval`
+    seconds and calls `on_change(added, removed)` with the device names.
+    """
+
+    def __init__(self, on_change: Callable[[List[str], List[str]], None],
+                 interval: float = 1.0):
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="port-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _run(self):
+        devices = {p.device for p in serial.tools.list_ports.comports()}
+        while not self._stop.wait(self.interval):
+            now = {p.device for p in serial.tools.list_ports.comports()}
+            if now != devices:
+                added, removed = sorted(now - devices), sorted(devices - now)
+                devices = now
                 try:
-                    test_conn = serial.Serial(port.device, 9600, timeout=1)
-                    test_conn.close()
-                    logger.info(f"Found Arduino at {port.device}")
-                    return port.device
-                except:
-                    continue
-    
-    logger.error("No Arduino found")
-    return None
+                    self.on_change(added, removed)
+                except Exception as e:
+                    logger.error(f"Port change handler failed: {e}")
+
 
 def get_arduino_connection(baud_rate=9600):
     """
     Get Arduino serial connection with auto port detection
-    
+
     Args:
         baud_rate: Serial communication speed
-        
+
     Returns:
         serial.Serial object or None
     """
-    port = find_arduino_port()
-    
+    port = find_arduino_port(baud_rate)
+
     if not port:
         print("❌ Arduino not found! Please:")
         print("1. Connect Arduino via USB")
         print("2. Close Arduino IDE Serial Monitor")
         print("3. Check USB cable supports data")
         return None
-    
+
     try:
-        conn = serial.Serial(port, baud_rate, timeout=1)
+        conn = serial.Serial(port, baud_rate, timeout=0.1)
         print(f"✅ Connected to Arduino on {port}")
-        time.sleep(2)  # Arduino initialization
+        # Arduino initialization - done when it says READY (older firmware
+        # says nothing, so then wait the 2 seconds it needs)
+        wait_for_ready(conn, 2.0)
+        conn.timeout = 1
         return conn
     except Exception as e:
         print(f"❌ Failed to connect: {e}")
-        return None
\ No newline at end of file
+        forget_arduino_port()
+        return None
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Analyzer backends - who actually looks at the pictures
+
+GeminiBackend sends images to Google's AI. MockBackend is a deterministic
+local stand-in with configurable latency, error rate and canned verdicts, so
+the whole pipeline can be load-tested and benchmarked without a network or
+an API key.
+"""
+
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Which Google AI model looks at the pictures
+DEFAULT_GEMINI_MODEL = 'gemini-2.0-flash-exp'
+
+# Images up to this size are sent inside the request itself; bigger ones are
+# uploaded first (Google limits a whole request to 20 MB)
+INLINE_MAX_BYTES = 15 * 1024 * 1024
+
+# How the fixed instructions (prompt.md) reach the AI:
+#   "inline" - sent as text with every request
+#   "system" - set once as the model's system instruction
+#   "cached" - uploaded once to a server-side context cache (falls back to
+#              "system" if the model or prompt can't be cached)
+PROMPT_MODES = ("inline", "system", "cached")
+
+# How long a server-side context cache lives (renewed on connect, and by
+# requests once half of it has passed, so long sessions keep it alive)
+CONTEXT_CACHE_TTL = 3600
+
+# Environment variable that picks the backend ("gemini" or "mock")
+BACKEND_ENV_VAR = "EWASTE_BACKEND"
+
+MISSING_KEY_HELP = """
+ERROR: No Google API key found!
+
+How to fix this:
+1. Create a file called '.env' in this folder
+2. Add this line to it: GOOGLE_API_KEY=your_actual_key_here
+3. Get a free key from: https://makersuite.google.com/app/apikey
+"""
+
+
+class MissingAPIKeyError(RuntimeError):
+    """No GOOGLE_API_KEY in the environment or .env file"""
+
+
+class AnalyzerBackend:
+    """
+    Interface every backend implements
+
+    Images are dicts with "name", "mime_type" and "data" (encoded bytes).
+    """
+
+    name = "base"
+    model_name = ""
+
+    def attach_instructions(self, instructions: str, mode: str = "system") -> bool:
+        """
+        Keep the fixed instructions on the AI side so they aren't resent
+
+        Args:
+            instructions: The prompt text sent with every request
+            mode: "system" or "cached" (see PROMPT_MODES)
+
+        Returns:
+            True if the backend now includes them itself, False if the
+            caller must keep sending them with each request
+        """
+        return False
+
+    def generate(self, prompt: List[str], images: List[Dict], response_schema: Dict,
+                 labels: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """
+        Ask about some images
+
+        Args:
+            prompt: Text parts sent before the images
+            images: Images to analyze
+            response_schema: JSON schema the answer must follow
+            labels: Optional text sent right before each image
+            timeout: Seconds before giving up
+
+        Returns:
+            str: The JSON answer text
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release anything kept on the AI side (e.g. a context cache)"""
+
+
+class GeminiBackend(AnalyzerBackend):
+    """Google Gemini via the google-generativeai library"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = DEFAULT_GEMINI_MODEL, api_key: Optional[str] = None):
+        """
+        Args:
+            model_name: Gemini model to use
+            api_key: API key (defaults to GOOGLE_API_KEY from the environment / .env)
+
+        Raises:
+            ImportError: google-generativeai isn't installed
+            MissingAPIKeyError: No API key was found
+        """
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise ImportError("Please install the required library: pip install google-generativeai")
+
+        if api_key is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+            api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise MissingAPIKeyError(MISSING_KEY_HELP)
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+        self.ai_model = genai.GenerativeModel(model_name)
+        self.context_cache = None
+        self._owns_context_cache = False  # Created by us (not reused) - delete on close
+        self._instructions = None
+        self._cache_refreshed_at = 0.0  # time.monotonic() of the last TTL renewal
+        self._cache_lock = threading.Lock()
+
+        # One GenerationConfig per response schema, built on first use
+        self._configs = {}
+
+    def attach_instructions(self, instructions, mode="system"):
+        self._instructions = instructions
+        if mode == "cached":
+            try:
+                self.context_cache = self._context_cache_for(instructions)
+                self.ai_model = self.genai.GenerativeModel.from_cached_content(self.context_cache)
+                return True
+            except Exception as error:
+                # Models and prompts below the minimum size can't be cached
+                logger.warning(f"Context caching unavailable ({error}), "
+                               f"using a system instruction instead")
+
+        self.ai_model = self.genai.GenerativeModel(self.model_name,
+                                                   system_instruction=instructions)
+        return True
+
+    def _context_cache_for(self, instructions: str):
+        """
+        A server-side cache holding the instructions - an existing one for
+        the same model and prompt if there is one (each one is billed)
+        """
+        from google.generativeai import caching
+
+        model = f"models/{self.model_name}"
+        digest = hashlib.sha256(instructions.encode('utf-8')).hexdigest()[:12]
+        display_name = f"ewaste-instructions-{digest}"
+        for cache in caching.CachedContent.list():
+            if cache.display_name == display_name and cache.model == model:
+                cache.update(ttl=timedelta(seconds=CONTEXT_CACHE_TTL))
+                logger.info(f"Reusing context cache {cache.name}")
+                self._owns_context_cache = False
+                self._cache_refreshed_at = time.monotonic()
+                return cache
+
+        cache = caching.CachedContent.create(
+            model=model,
+            display_name=display_name,
+            system_instruction=instructions,
+            ttl=timedelta(seconds=CONTEXT_CACHE_TTL))
+        self._owns_context_cache = True
+        self._cache_refreshed_at = time.monotonic()
+        return cache
+
+    def _keep_context_cache_alive(self):
+        """Renew the context cache's TTL once half of it has passed"""
+        if self.context_cache is None:
+            return
+        with self._cache_lock:
+            if time.monotonic() - self._cache_refreshed_at < CONTEXT_CACHE_TTL / 2:
+                return
+            try:
+                self.context_cache.update(ttl=timedelta(seconds=CONTEXT_CACHE_TTL))
+                self._cache_refreshed_at = time.monotonic()
+                return
+            except Exception as error:
+                # Expired (e.g. the computer slept) or deleted by someone else
+                logger.warning(f"Context cache lost ({error}), setting it up again")
+            self.context_cache = None
+            self.attach_instructions(self._instructions, "cached")
+
+    def close(self):
+        # Another program may still be using a cache we found; it expires
+        # on its own (CONTEXT_CACHE_TTL) once nobody refreshes it
+        if self.context_cache is not None and self._owns_context_cache:
+            try:
+                self.context_cache.delete()
+                logger.info("Deleted the context cache")
+            except Exception as error:
+                logger.warning(f"Couldn't delete the context cache ({error}) - "
+                               f"it expires within {CONTEXT_CACHE_TTL // 60} minutes")
+        self.context_cache = None
+        self._owns_context_cache = False
+
+    def _generation_config(self, response_schema: Dict):
+        entry = self._configs.get(id(response_schema))
+        if entry is None:
+            config = self.genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=response_schema,
+                temperature=0.1  # Makes answers more consistent
+            )
+            # Keep the schema alive so its id can't be reused by another dict
+            entry = self._configs[id(response_schema)] = (response_schema, config)
+        return entry[1]
+
+    def _part(self, image: Dict):
+        """Small images go right inside the request - no separate upload"""
+        if len(image["data"]) <= INLINE_MAX_BYTES:
+            return {"mime_type": image["mime_type"], "data": image["data"]}
+        return self.genai.upload_file(io.BytesIO(image["data"]), mime_type=image["mime_type"])
+
+    def generate(self, prompt, images, response_schema, labels=None, timeout=None):
+        self._keep_context_cache_alive()
+        contents = list(prompt)
+        for index, image in enumerate(images):
+            if labels:
+                contents.append(labels[index])
+            contents.append(self._part(image))
+
+        response = self.ai_model.generate_content(
+            contents,
+            generation_config=self._generation_config(response_schema),
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return response.text
+
+
+class MockServiceError(Exception):
+    """Simulated API failure (looks like a 503 to the retry logic)"""
+
+    code = 503
+
+
+class MockBackend(AnalyzerBackend):
+    """
+    Offline stand-in for the AI
+
+    Verdicts come from `verdicts` (keyed by file name or SHA-256 of the image
+    bytes), then `default_verdict`, and otherwise are picked from the schema's
+    safety levels using the image hash - so the same picture always gets the
+    same answer.
+    """
+
+    name = "mock"
+    model_name = "mock"
+
+    def __init__(self, latency: float = 1.0, latency_jitter: float = 0.3,
+                 distribution: str = "lognormal", error_rate: float = 0.0,
+                 verdicts: Optional[Dict[str, Dict]] = None,
+                 default_verdict: Optional[Dict] = None, seed: Optional[int] = None):
+        """
+        Args:
+            latency: Typical (median) seconds per request
+            latency_jitter: Spread - sigma for "lognormal", stddev in seconds
+                            for "normal", ignored for "fixed"
+            distribution: "lognormal", "normal" or "fixed"
+            error_rate: Chance (0-1) that a request fails with MockServiceError
+            verdicts: Canned answers keyed by file name or image SHA-256
+            default_verdict: Answer for images not in `verdicts`
+            seed: Random seed for repeatable latency and errors
+        """
+        if distribution not in ("lognormal", "normal", "fixed"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.verdicts = verdicts or {}
+        self.default_verdict = default_verdict
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.instructions = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "MockBackend":
+        """Load canned verdicts from a JSON file ({name or hash: verdict})"""
+        with open(path, 'r') as f:
+            return cls(verdicts=json.load(f), **kwargs)
+
+    def attach_instructions(self, instructions, mode="system"):
+        self.instructions = instructions
+        return True
+
+    def _delay(self) -> float:
+        if self.distribution == "fixed":
+            return self.latency
+        if self.distribution == "normal":
+            return max(0.0, self.random.gauss(self.latency, self.latency_jitter))
+        return self.latency * self.random.lognormvariate(0, self.latency_jitter)
+
+    def _verdict(self, image: Dict, item_schema: Dict) -> Dict:
+        image_hash = hashlib.sha256(image["data"]).hexdigest()
+        verdict = (self.verdicts.get(image.get("name"))
+                   or self.verdicts.get(image_hash)
+                   or self.default_verdict)
+        if verdict is None:
+            levels = item_schema["properties"]["safety_level"]["enum"]
+            level = levels[int(image_hash[:8], 16) % len(levels)]
+            verdict = {
+                "item_name": f"Mock item {image_hash[:6]}",
+                "safety_level": level,
+                "hazards": [],
+                "notes": "mock verdict",
+            }
+        return dict(verdict)
+
+    def generate(self, prompt, images, response_schema, labels=None, timeout=None):
+        with self._lock:
+            self.calls += 1
+            delay = self._delay()
+            fail = self.random.random() < self.error_rate
+
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Mock request timed out after {timeout:.1f}s")
+        time.sleep(delay)
+        if fail:
+            raise MockServiceError("503 Mock service unavailable")
+
+        if response_schema.get("type") == "array":
+            answers = []
+            for index, image in enumerate(images):
+                verdict = self._verdict(image, response_schema["items"])
+                verdict["image_index"] = index
+                answers.append(verdict)
+            return json.dumps(answers)
+        return json.dumps(self._verdict(images[0], response_schema))
+
+
+def make_backend(name: Optional[str] = None, **kwargs) -> AnalyzerBackend:
+    """
+    Create a backend by name
+
+    Args:
+        name: "gemini" or "mock" (defaults to $EWASTE_BACKEND, then "gemini")
+        **kwargs: Passed to the backend's constructor
+
+    Returns:
+        AnalyzerBackend
+    """
+    name = (name or os.getenv(BACKEND_ENV_VAR) or "gemini").lower()
+    if name == "gemini":
+        return GeminiBackend(**kwargs)
+    if name == "mock":
+        return MockBackend(**kwargs)
+    raise ValueError(f"Unknown analyzer backend: {name}")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Camera stream - keeps the camera open and reads frames on a background thread
+
+Opening a camera takes hundreds of milliseconds and the first frames are
+often under-exposed, so instead of opening it for every photo we open it
+once and keep reading into a small ring of preallocated frame buffers. The
+newest frame (or the last few) can then be taken at any moment without
+waiting and without copying.
+"""
+
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .camera_utils import find_available_camera
+
+logger = logging.getLogger(__name__)
+
+# Frames thrown away after opening while exposure and white balance settle
+WARMUP_FRAMES = 5
+
+# Give up on the camera after this many failed reads in a row
+MAX_READ_FAILURES = 30
+
+
+class CameraStream:
+    """
+    Continuously captured camera frames in a fixed-size ring buffer
+
+    Frames handed out are read-only views into the ring, not copies. A view
+    stays valid until the ring wraps around (buffer_size - 1 newer frames
+    later, about a quarter of a second at 30 FPS with the default size), so
+    copy a frame (copy=True) if you need to keep it longer than that.
+    """
+
+    def __init__(self, camera_index: Optional[int] = None, width: int = 640, height: int = 480,
+                 buffer_size: int = 8, warmup_frames: int = WARMUP_FRAMES):
+        """
+        Args:
+            camera_index: Camera to open (auto-detects if None)
+            width: Requested frame width
+            height: Requested frame height
+            buffer_size: Frames kept in the ring (at least 2)
+            warmup_frames: Frames skipped after opening before any are served
+        """
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.buffer_size = max(2, buffer_size)
+        self.warmup_frames = warmup_frames
+
+        self.cap = None
+        self._ring = None  # (buffer_size, h, w, 3) uint8, allocated from the first frame
+        self._times = np.zeros(self.buffer_size)
+        self._frame_id = -1  # Number of the newest finished frame (-1 = none yet)
+        self._read_id = -1  # Newest frame handed out by read()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.failed = False
+
+        # Measured frame rate (frames per second)
+        self._fps = 0.0
+        self._last_time = None
+
+    # ------------------------------------------------------------------
+    # Starting and stopping
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """
+        Open the camera and start reading frames in the background
+
+        Returns:
+            bool: True if the camera opened
+        """
+        if self._running:
+            return True
+
+        if self.camera_index is None:
+            self.camera_index = find_available_camera()
+            if self.camera_index is None:
+                return False
+
+        self.cap = cv2.VideoCapture(self.camera_index)
+        if not self.cap.isOpened():
+            logger.error(f"Failed to open camera {self.camera_index}")
+            self.cap = None
+            return False
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Don't let the driver queue up stale frames behind our back
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.failed = False
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop,
+                                        name=f"camera-{self.camera_index}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop reading and release the camera"""
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __enter__(self):
+        if not self.start():
+            raise RuntimeError(f"Could not open camera {self.camera_index}")
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Background capture
+    # ------------------------------------------------------------------
+
+    def _capture_loop(self):
+        skipped = 0
+        failures = 0
+        while self._running:
+            # Read straight into the slot after the newest frame - readers
+            # never look at that slot, so nothing they hold is overwritten
+            slot = None
+            if self._ring is not None:
+                slot = (self._frame_id + 1) % self.buffer_size
+                ok, frame = self.cap.read(self._ring[slot])
+            else:
+                ok, frame = self.cap.read()
+
+            if not ok or frame is None:
+                failures += 1
+                if failures >= MAX_READ_FAILURES:
+                    logger.error(f"Camera {self.camera_index} stopped delivering frames")
+                    self.failed = True
+                    self._running = False
+                    with self._condition:
+                        self._condition.notify_all()
+                    return
+                time.sleep(0.01)
+                continue
+            failures = 0
+
+            if skipped < self.warmup_frames:
+                skipped += 1
+                continue
+
+            if self._ring is None or self._ring.shape[1:] != frame.shape:
+                # First frame (or the camera changed resolution): size the ring
+                self._ring = np.empty((self.buffer_size,) + frame.shape, dtype=frame.dtype)
+                slot = (self._frame_id + 1) % self.buffer_size
+            if not np.may_share_memory(frame, self._ring[slot]):
+                # Some backends ignore the buffer we pass in
+                np.copyto(self._ring[slot], frame)
+
+            now = time.monotonic()
+            if self._last_time is not None:
+                instant = 1.0 / max(now - self._last_time, 1e-6)
+                self._fps = instant if self._fps == 0 else 0.9 * self._fps + 0.1 * instant
+            self._last_time = now
+
+            with self._condition:
+                self._times[slot] = now
+                self._frame_id += 1
+                self._condition.notify_all()
+
+    # ------------------------------------------------------------------
+    # Getting frames
+    # ------------------------------------------------------------------
+
+    def _view(self, frame_id: int, copy: bool) -> np.ndarray:
+        frame = self._ring[frame_id % self.buffer_size]
+        if copy:
+            return frame.copy()
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
+    def _wait_for(self, frame_id: int, timeout: Optional[float]) -> bool:
+        """Wait (holding the condition) until frame_id exists; False on timeout/stop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._frame_id < frame_id:
+            if not self._running:
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._condition.wait(remaining)
+        return True
+
+    def latest(self, timeout: Optional[float] = 2.0, copy: bool = False) -> Optional[np.ndarray]:
+        """
+        The newest frame, waiting for the first one if needed
+
+        Args:
+            timeout: Seconds to wait for a first frame (None = forever)
+            copy: Return a private copy instead of a view into the ring
+
+        Returns:
+            numpy.ndarray, or None if no frame arrived in time
+        """
+        with self._condition:
+            if not self._wait_for(0, timeout):
+                return None
+            return self._view(self._frame_id, copy)
+
+    def last(self, n: int, copy: bool = False) -> List[np.ndarray]:
+        """
+        The newest n frames, oldest first
+
+        At most buffer_size - 1 frames are available (one slot is always
+        being written).
+        """
+        with self._condition:
+            newest = self._frame_id
+            count = min(n, self.buffer_size - 1, newest + 1)
+            return [self._view(frame_id, copy) for frame_id in range(newest - count + 1, newest + 1)]
+
+    def read(self, timeout: Optional[float] = 2.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Wait for a frame newer than the one read() returned last time
+
+        Works like cv2.VideoCapture.read() so frame loops can switch over
+        directly (frames that arrive while the caller is busy are skipped).
+
+        Returns:
+            (ok, frame)
+        """
+        with self._condition:
+            if not self._wait_for(self._read_id + 1, timeout):
+                return False, None
+            self._read_id = self._frame_id
+            return True, self._view(self._frame_id, copy=False)
+
+    @property
+    def frame_id(self) -> int:
+        """Number of the newest frame (-1 before the first one)"""
+        return self._frame_id
+
+    @property
+    def fps(self) -> float:
+        """Measured capture rate"""
+        return self._fps
+
+    def frame_age(self) -> float:
+        """Seconds since the newest frame was captured"""
+        with self._condition:
+            if self._frame_id < 0:
+                return float('inf')
+            return time.monotonic() - self._times[self._frame_id % self.buffer_size]
+
+    def stats(self) -> Dict:
+        """Frame count, frame rate and whether the camera is still running"""
+        return {
+            "frames": self._frame_id + 1,
+            "fps": self._fps,
+            "running": self._running,
+            "failed": self.failed,
+        }
+
+
+# Streams shared by the one-shot capture functions, so repeated photos
+# reuse an already open (and already exposed) camera
+_shared_streams: Dict[Tuple[Optional[int], int, int], CameraStream] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_stream(camera_index: Optional[int] = None, width: int = 640,
+                      height: int = 480) -> Optional[CameraStream]:
+    """
+    Get a running stream for a camera, opening it the first time
+
+    The stream stays open until the program exits (or stop_shared_streams
+    is called).
+
+    Returns:
+        CameraStream, or None if the camera couldn't be opened
+    """
+    key = (camera_index, width, height)
+    with _shared_lock:
+        stream = _shared_streams.get(key)
+        if stream is not None and stream.running:
+            return stream
+        stream = CameraStream(camera_index, width, height)
+        if not stream.start():
+            return None
+        _shared_streams[key] = stream
+        return stream
+
+
+def stop_shared_streams():
+    """Release every camera opened by get_shared_stream"""
+    with _shared_lock:
+        for stream in _shared_streams.values():
+            stream.stop()
+        _shared_streams.clear()
+
+
+atexit.register(stop_shared_streams)
@@ -5,8 +5,7 @@ Camera utilities - auto camera detection and capture
 
 import cv2
 import logging
-from pathlib import Path
-from datetime import datetime
+from .photo_store import get_photo_writer
 
 logger = logging.getLogger(__name__)
 
@@ -30,49 +29,57 @@ def find_available_camera():
     logger.error("No camera found")
     return None
 
-def capture_photo(camera_index=None, save_dir="captured_photos"):
+def capture_frame(camera_index=None):
     """
-    Capture a photo from camera with auto-detection
+    Capture a single frame from camera with auto-detection
+    
+    The camera is opened the first time and then kept running in the
+    background (see CameraStream), so later calls return immediately with a
+    properly exposed frame.
     
     Args:
         camera_index: Camera index (auto-detects if None)
-        save_dir: Directory to save photos
         
     Returns:
-        str: Path to saved photo or None if failed
+        numpy.ndarray: The captured frame, or None if failed
     """
-    # Auto-detect camera if not specified
-    if camera_index is None:
-        camera_index = find_available_camera()
+    from .camera_stream import get_shared_stream
+    
+    stream = get_shared_stream(camera_index, 640, 480)
+    if stream is None:
         if camera_index is None:
             print("❌ No camera found!")
-            return None
-    
-    # Create save directory if needed
-    Path(save_dir).mkdir(exist_ok=True)
-    
-    # Open camera
-    cap = cv2.VideoCapture(camera_index)
-    if not cap.isOpened():
-        print(f"❌ Failed to open camera {camera_index}")
+        else:
+            print(f"❌ Failed to open camera {camera_index}")
         return None
     
-    # Set camera resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    # A private copy - the caller may keep it for as long as it likes
+    frame = stream.latest(copy=True)
+    if frame is None:
+        print("❌ Failed to capture frame")
+        return None
     
-    # Capture frame
-    ret, frame = cap.read()
-    cap.release()
+    return frame
+
+def capture_photo(camera_index=None, save_dir="captured_photos"):
+    """
+    Capture a photo from camera with auto-detection
     
-    if not ret:
-        print("❌ Failed to capture frame")
+    Args:
+        camera_index: Camera index (auto-detects if None)
+        save_dir: Directory to save photos
+        
+    Returns:
+        str: Path to saved photo or None if failed (the photo is written
+             in the background - it is on disk a moment later, or call
+             get_photo_writer(save_dir).flush() to wait for it)
+    """
+    frame = capture_frame(camera_index)
+    if frame is None:
         return None
     
-    # Save photo
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    photo_path = f"{save_dir}/captured_{timestamp}.jpg"
-    cv2.imwrite(photo_path, frame)
+    # Save photo (encoding and writing happen on the writer's thread)
+    photo_path = get_photo_writer(save_dir).save(frame, prefix="captured", block=True)
     
     print(f"✅ Photo saved: {photo_path}")
     return photo_path
@@ -84,22 +91,18 @@ def preview_camera(camera_index=None):
     Args:
         camera_index: Camera index (auto-detects if None)
     """
-    # Auto-detect camera if not specified
-    if camera_index is None:
-        camera_index = find_available_camera()
-        if camera_index is None:
-            print("❌ No camera found!")
-            return
+    from .camera_stream import CameraStream
     
-    cap = cv2.VideoCapture(camera_index)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    stream = CameraStream(camera_index, 640, 480)
+    if not stream.start():
+        print("❌ No camera found!")
+        return
     
-    print(f"Camera preview (index {camera_index})")
+    print(f"Camera preview (index {stream.camera_index})")
     print("Press 'q' to quit, SPACE to capture")
     
     while True:
-        ret, frame = cap.read()
+        ret, frame = stream.read()
         if not ret:
             break
         
@@ -109,10 +112,12 @@ def preview_camera(camera_index=None):
         if key == ord('q'):
             break
         elif key == ord(' '):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            photo_path = f"captured_photos/manual_{timestamp}.jpg"
-            cv2.imwrite(photo_path, frame)
-            print(f"✅ Captured: {photo_path}")
+            # A copy - the stream reuses the frame's buffer for later frames
+            photo_path = get_photo_writer().save(frame.copy(), prefix="manual")
+            if photo_path:
+                print(f"✅ Captured: {photo_path}")
+            else:
+                print("⚠️ Still saving earlier photos - capture skipped")
     
-    cap.release()
+    stream.stop()
     cv2.destroyAllWindows()
\ No newline at end of file
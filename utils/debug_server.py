@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Debug view server - look at a headless sorter from a browser
+
+Serves the annotated camera view as a single snapshot (/snapshot.jpg) or a
+low-rate MJPEG stream (/stream.mjpg). Nothing is drawn or encoded unless
+someone is actually watching: the frame loop asks wanted() and only renders
+a frame when a viewer asked for one recently.
+"""
+
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A viewer counts as watching for this long after its last request
+VIEWER_TIMEOUT = 5.0
+
+INDEX_PAGE = b"""<!doctype html>
+<html><head><title>E-Waste Sorter</title></head>
+<body style="margin:0;background:#222">
+<img src="/stream.mjpg" style="max-width:100%">
+</body></html>
+"""
+
+
+class DebugViewServer:
+    """Tiny HTTP server for snapshots and an MJPEG stream"""
+
+    def __init__(self, port: int = 8080, fps: float = 2.0, host: str = "127.0.0.1",
+                 quality: int = 70):
+        """
+        Args:
+            port: Port to listen on
+            fps: Most frames per second rendered for viewers
+            host: Address to listen on. The default only lets this computer in;
+                  "0.0.0.0" lets anyone on the network watch the camera
+            quality: JPEG quality of the served frames
+        """
+        self.port = port
+        self.fps = fps
+        self.host = host
+        self.quality = quality
+
+        self._jpeg: Optional[bytes] = None
+        self._frame_number = 0
+        self._last_publish = 0.0
+        self._last_request = 0.0
+        self._condition = threading.Condition()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/":
+                    self._send(200, "text/html", INDEX_PAGE)
+                elif self.path.startswith("/snapshot.jpg"):
+                    jpeg = server.next_jpeg(timeout=2.0)
+                    if jpeg is None:
+                        self._send(503, "text/plain", b"No frame yet")
+                    else:
+                        self._send(200, "image/jpeg", jpeg)
+                elif self.path.startswith("/stream.mjpg"):
+                    self._stream()
+                else:
+                    self._send(404, "text/plain", b"Not found")
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                try:
+                    while server._server is not None:
+                        jpeg = server.next_jpeg(timeout=5.0)
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg + b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="debug-view", daemon=True)
+        self._thread.start()
+        logger.info(f"Debug view on http://{self.host}:{self.port}/")
+
+    def stop(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.shutdown()
+            server.server_close()
+        with self._condition:
+            self._condition.notify_all()
+
+    def wanted(self) -> bool:
+        """True if a viewer is waiting and it's time for another frame"""
+        now = time.monotonic()
+        return (now - self._last_request < VIEWER_TIMEOUT
+                and now - self._last_publish >= 1.0 / self.fps)
+
+    def publish(self, frame: np.ndarray):
+        """Encode and hand out a rendered frame (call only when wanted())"""
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._condition:
+            self._jpeg = buffer.tobytes()
+            self._frame_number += 1
+            self._last_publish = time.monotonic()
+            self._condition.notify_all()
+
+    def next_jpeg(self, timeout: float) -> Optional[bytes]:
+        """Ask for a frame and wait for the frame loop to render it"""
+        with self._condition:
+            self._last_request = time.monotonic()
+            seen = self._frame_number
+            self._condition.wait_for(lambda: self._frame_number > seen or self._server is None,
+                                     timeout)
+            return self._jpeg if self._frame_number > seen else None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Best-frame selection - keep the sharpest frames while an object settles
+
+Blurry photos make the AI answer "Unknown", so instead of sending whatever
+frame is current when the object becomes stable, every frame during the
+stability window gets a cheap sharpness score (variance of the Laplacian
+on a small grayscale copy of the object's area) and the sharpest few are
+kept. Scoring is timed and thinned out if it would eat into the frame
+budget.
+"""
+
+import time
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .motion import Box
+
+logger = logging.getLogger(__name__)
+
+# Width the object's area is shrunk to before scoring
+SCORE_WIDTH = 160
+
+
+def sharpness(frame: np.ndarray, box: Optional[Box] = None, width: int = SCORE_WIDTH) -> float:
+    """
+    How sharp a frame (or the boxed part of it) is - higher is sharper
+
+    Args:
+        frame: BGR frame
+        box: Optional (x, y, w, h) to score only the object
+        width: Shrink to this width first (keeps it cheap)
+
+    Returns:
+        Variance of the Laplacian
+    """
+    if box is not None:
+        x, y, w, h = box
+        x, y = max(0, x), max(0, y)
+        if w > 0 and h > 0:
+            frame = frame[y:y + h, x:x + w]
+    height, frame_width = frame.shape[:2]
+    if frame_width > width:
+        frame = cv2.resize(frame, (width, max(1, round(height * width / frame_width))),
+                           interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    _, std = cv2.meanStdDev(laplacian)
+    return float(std[0, 0]) ** 2
+
+
+class BestFrameSelector:
+    """
+    Keeps the `burst` sharpest frames offered since the last reset
+
+    Frames are only copied when they beat one already kept, into buffers
+    that are reused between objects.
+    """
+
+    def __init__(self, burst: int = 1, max_cost_ms: float = 2.0):
+        """
+        Args:
+            burst: How many of the sharpest frames to keep
+            max_cost_ms: Average scoring time allowed per frame; when scoring
+                         is slower, only every Nth frame is scored
+        """
+        self.burst = max(1, burst)
+        self.max_cost_ms = max_cost_ms
+
+        self._buffers: List[Optional[np.ndarray]] = [None] * self.burst
+        self._scores = [-1.0] * self.burst  # -1 = empty slot
+        self._offered = 0
+        self._every = 1
+        self._average_ms = 0.0
+
+    def reset(self):
+        """Forget the kept frames (start a new object)"""
+        self._scores = [-1.0] * self.burst
+        self._offered = 0
+
+    @property
+    def stride(self) -> int:
+        """Currently scoring every this many frames"""
+        return self._every
+
+    @property
+    def average_cost_ms(self) -> float:
+        return self._average_ms
+
+    def offer(self, frame: np.ndarray, box: Optional[Box] = None) -> Optional[float]:
+        """
+        Score a frame and keep it if it is among the sharpest
+
+        Returns:
+            The score, or None if this frame was skipped to save time
+        """
+        self._offered += 1
+        # Always score the first frame so there is something to send
+        if self._offered > 1 and self._offered % self._every:
+            return None
+
+        start = time.perf_counter()
+        score = sharpness(frame, box)
+        worst = min(range(self.burst), key=self._scores.__getitem__)
+        if score > self._scores[worst]:
+            buffer = self._buffers[worst]
+            if buffer is None or buffer.shape != frame.shape:
+                buffer = self._buffers[worst] = np.empty_like(frame)
+            np.copyto(buffer, frame)
+            self._scores[worst] = score
+        cost_ms = (time.perf_counter() - start) * 1000
+
+        # Thin out scoring if it costs more than the budget allows
+        self._average_ms = cost_ms if self._average_ms == 0 else 0.9 * self._average_ms + 0.1 * cost_ms
+        self._every = max(1, int(np.ceil(self._average_ms / self.max_cost_ms)))
+        return score
+
+    def take(self) -> List[Tuple[np.ndarray, float]]:
+        """
+        Hand over the kept frames, sharpest first, and reset
+
+        The frames belong to the caller afterwards (fresh buffers are used
+        for the next object).
+        """
+        kept = sorted(((self._buffers[i], self._scores[i]) for i in range(self.burst)
+                       if self._scores[i] >= 0), key=lambda pair: -pair[1])
+        for i in range(self.burst):
+            if self._scores[i] >= 0:
+                self._buffers[i] = None
+        self.reset()
+        return kept
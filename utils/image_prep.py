@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Image preparation - turns files, byte buffers and camera frames into
+encoded image bytes that can be sent to the AI inline, optionally shrinking
+them first so less data has to be uploaded
+"""
+
+import time
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
+
+# NumPy and OpenCV are imported when a frame is actually handled, so
+# analyzing files doesn't pay for loading them at startup
+if TYPE_CHECKING:
+    import numpy as np
+
+# An image can be a file on disk, already-encoded bytes or a camera frame
+ImageInput = Union[str, Path, bytes, bytearray, memoryview, "np.ndarray"]
+
+# File signatures for the image types we accept
+MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+SUFFIX_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.webp': 'image/webp',
+}
+
+# JPEG quality used when encoding raw camera frames
+FRAME_JPEG_QUALITY = 90
+
+# Assumed upload speed, used to estimate the time saved by smaller images
+UPLINK_BYTES_PER_SECOND = 1_000_000
+
+# Savings for raw frames need a second, full-size encode - done for one
+# frame in this many, and estimated from that for the others
+SAVINGS_SAMPLE_EVERY = 20
+
+OUTPUT_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg'),
+    'webp': ('.webp', 'image/webp'),
+}
+
+
+def guess_mime_type(data: bytes) -> str:
+    """
+    Work out the image type from the first few bytes
+
+    Returns:
+        str: MIME type (defaults to image/jpeg)
+    """
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mime_type in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime_type
+    return 'image/jpeg'
+
+
+def encode_frame(frame: "np.ndarray", quality: int = FRAME_JPEG_QUALITY) -> bytes:
+    """
+    JPEG-encode a camera frame in memory
+
+    Args:
+        frame: BGR image from OpenCV
+        quality: JPEG quality (0-100)
+
+    Returns:
+        bytes: Encoded JPEG
+    """
+    import cv2
+
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return buffer.tobytes()
+
+
+def encode_image(image: ImageInput) -> Tuple[bytes, str]:
+    """
+    Get encoded bytes and a MIME type for any supported image input
+
+    Args:
+        image: File path, encoded image bytes, or a BGR NumPy frame
+
+    Returns:
+        (data, mime_type)
+    """
+    if isinstance(image, (str, Path)):
+        path = Path(image)
+        data = path.read_bytes()
+        return data, SUFFIX_MIME_TYPES.get(path.suffix.lower(), guess_mime_type(data))
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        return data, guess_mime_type(data)
+
+    import numpy as np
+    if isinstance(image, np.ndarray):
+        return encode_frame(image), 'image/jpeg'
+
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+class ImagePreprocessor:
+    """
+    Resize, optionally crop, and re-encode images before they are sent
+
+    The classifier doesn't need full camera resolution, so shrinking to a
+    target long edge cuts upload size (and time) a lot. Each prepared image
+    reports how many bytes were saved and an estimate of the upload time
+    saved, after subtracting the extra time spent preprocessing. For raw
+    camera frames that means encoding the frame a second time, so it is
+    measured on one frame in SAVINGS_SAMPLE_EVERY and estimated for the
+    rest (or measured every time with measure_savings=True, for benchmarks).
+    """
+
+    def __init__(self, max_long_edge: int = 1536, output_format: str = 'jpeg',
+                 quality: int = 85, crop_to_box: bool = False, box_margin: float = 0.15,
+                 uplink_bytes_per_second: float = UPLINK_BYTES_PER_SECOND,
+                 measure_savings: bool = False):
+        """
+        Args:
+            max_long_edge: Longest side in pixels after resizing (0 = keep size)
+            output_format: "jpeg" or "webp"
+            quality: Encoder quality (0-100)
+            crop_to_box: Crop to the motion bounding box when one is given
+            box_margin: Extra space kept around the box (fraction of its size)
+            uplink_bytes_per_second: Upload speed used for the latency estimate
+            measure_savings: Encode every raw frame at full size as well, for
+                             exact savings (costs a second encode per frame)
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        self.max_long_edge = max_long_edge
+        self.output_format = output_format
+        self.quality = quality
+        self.crop_to_box = crop_to_box
+        self.box_margin = box_margin
+        self.uplink_bytes_per_second = uplink_bytes_per_second
+        self.measure_savings = measure_savings
+
+        # Last full-size measurement for raw frames:
+        # (full-size bytes per byte sent, seconds the full-size encode took)
+        self._baseline = None
+        self._frames_since_sample = 0
+        self._lock = threading.Lock()
+
+    def signature(self) -> Dict:
+        """Settings that change what is sent (part of the result cache key)"""
+        return {
+            "max_long_edge": self.max_long_edge,
+            "format": self.output_format,
+            "quality": self.quality,
+            "crop_to_box": self.crop_to_box,
+            "box_margin": self.box_margin,
+        }
+
+    def _crop(self, frame: "np.ndarray", box: Tuple[int, int, int, int]) -> "np.ndarray":
+        """Crop to an (x, y, w, h) box plus margin, clamped to the frame"""
+        x, y, w, h = box
+        pad_x, pad_y = int(w * self.box_margin), int(h * self.box_margin)
+        height, width = frame.shape[:2]
+        x1, y1 = max(0, x - pad_x), max(0, y - pad_y)
+        x2, y2 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+        if x2 <= x1 or y2 <= y1:
+            return frame
+        return frame[y1:y2, x1:x2]
+
+    def _frame_baseline(self, frame: "np.ndarray", bytes_sent: int) -> Tuple[int, float]:
+        """
+        Size and encode time of a raw frame as it would have been sent
+        without preprocessing (full size, FRAME_JPEG_QUALITY)
+
+        Really encoded for the first frame and one in SAVINGS_SAMPLE_EVERY
+        after it (every frame with measure_savings); the frames in between
+        are estimated from the last measurement, since a camera's frames
+        compress about the same.
+        """
+        with self._lock:
+            measure = (self.measure_savings or self._baseline is None
+                       or self._frames_since_sample + 1 >= SAVINGS_SAMPLE_EVERY)
+            self._frames_since_sample = 0 if measure else self._frames_since_sample + 1
+            baseline = self._baseline
+
+        if not measure:
+            ratio, seconds = baseline
+            return round(bytes_sent * ratio), seconds
+
+        start = time.perf_counter()
+        size = len(encode_frame(frame))
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self._baseline = (size / max(1, bytes_sent), seconds)
+        return size, seconds
+
+    def prepare(self, image: ImageInput, box: Optional[Tuple[int, int, int, int]] = None) -> Dict:
+        """
+        Prepare one image for sending
+
+        Args:
+            image: File path, encoded image bytes, or a BGR NumPy frame
+            box: Optional (x, y, w, h) motion bounding box
+
+        Returns:
+            dict with data, mime_type, original_bytes, bytes_sent, bytes_saved,
+            prep_seconds and latency_saved (estimated seconds) - for raw frames
+            the original size is usually estimated (see _frame_baseline)
+        """
+        import cv2
+        import numpy as np
+
+        start = time.perf_counter()
+
+        # Work out how big the image would have been without us
+        if isinstance(image, np.ndarray):
+            frame = image
+            original_data, original_mime = None, 'image/jpeg'
+        else:
+            original_data, original_mime = encode_image(image)
+            frame = cv2.imdecode(np.frombuffer(original_data, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode image")
+
+        changed = False
+        if self.crop_to_box and box is not None:
+            frame = self._crop(frame, box)
+            changed = True
+
+        height, width = frame.shape[:2]
+        long_edge = max(height, width)
+        if self.max_long_edge and long_edge > self.max_long_edge:
+            scale = self.max_long_edge / long_edge
+            frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+            changed = True
+
+        extension, mime_type = OUTPUT_FORMATS[self.output_format]
+        quality_flag = (cv2.IMWRITE_WEBP_QUALITY if self.output_format == 'webp'
+                        else cv2.IMWRITE_JPEG_QUALITY)
+        ok, buffer = cv2.imencode(extension, frame, [quality_flag, self.quality])
+        if not ok:
+            raise ValueError(f"Could not encode image as {self.output_format}")
+        data = buffer.tobytes()
+
+        prep_seconds = time.perf_counter() - start
+
+        # Time the baseline path would have spent anyway (encoding a raw frame)
+        baseline_seconds = 0.0
+        if original_data is None:
+            if not (changed or self.output_format != 'jpeg'
+                    or self.quality != FRAME_JPEG_QUALITY):
+                original_size, baseline_seconds = len(data), prep_seconds
+            else:
+                original_size, baseline_seconds = self._frame_baseline(image, len(data))
+        else:
+            original_size = len(original_data)
+            # Re-encoding an already small file can make it bigger - keep the original
+            if not changed and len(data) >= original_size:
+                data, mime_type = original_data, original_mime
+
+        bytes_saved = original_size - len(data)
+        extra_seconds = prep_seconds - baseline_seconds
+        return {
+            "data": data,
+            "mime_type": mime_type,
+            "original_bytes": original_size,
+            "bytes_sent": len(data),
+            "bytes_saved": bytes_saved,
+            "prep_seconds": prep_seconds,
+            "latency_saved": bytes_saved / self.uplink_bytes_per_second - extra_seconds,
+        }
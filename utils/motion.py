@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Motion detection - how much of the picture changed since the last frame
+
+FastMotionDetector does the work on a small copy of the frame, counts changed
+pixels directly instead of tracing contours, reuses the same buffers for
+every frame and can be limited to a region of interest. LegacyMotionDetector
+is the original full-resolution contour method, kept for comparison (see
+tests/bench_motion.py).
+
+Both report the changed area in full-frame pixels, so the same area
+thresholds work with either.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # (x, y, w, h) in full-frame pixels
+
+
+class MotionResult:
+    """What changed in one frame"""
+
+    __slots__ = ("area", "box", "mask")
+
+    def __init__(self, area: float, box: Optional[Box], mask: Optional[np.ndarray]):
+        self.area = area  # Changed area in full-frame pixels
+        self.box = box  # Box around everything that changed (None if nothing did)
+        self.mask = mask  # Changed-pixel mask (at the detector's working size)
+
+
+class LegacyMotionDetector:
+    """The original method: full-resolution blur, dilate and contours"""
+
+    name = "legacy"
+
+    def __init__(self, threshold: int = 30, blur: int = 21, min_box_area: float = 1000):
+        """
+        Args:
+            threshold: Pixel difference that counts as a change
+            blur: Gaussian blur size (odd)
+            min_box_area: Ignore changed areas smaller than this in the box
+        """
+        self.threshold = threshold
+        self.blur = blur
+        self.min_box_area = min_box_area
+        self.prev = None
+        self._contours = []
+
+    def reset(self):
+        self.prev = None
+
+    def detect(self, frame: np.ndarray) -> Optional[MotionResult]:
+        """Compare with the previous frame (None for the very first frame)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+        if self.prev is None:
+            self.prev = gray
+            return None
+
+        frame_diff = cv2.absdiff(self.prev, gray)
+        thresh = cv2.threshold(frame_diff, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        area = sum(cv2.contourArea(c) for c in contours)
+        self._contours = contours
+        self.prev = gray
+
+        boxes = self.boxes()
+        box = None
+        if boxes:
+            x1, y1 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+            x2, y2 = max(b[0] + b[2] for b in boxes), max(b[1] + b[3] for b in boxes)
+            box = (x1, y1, x2 - x1, y2 - y1)
+        return MotionResult(area, box, thresh)
+
+    def boxes(self) -> List[Box]:
+        """Boxes around each changed area bigger than min_box_area (for drawing)"""
+        return [cv2.boundingRect(c) for c in self._contours
+                if cv2.contourArea(c) > self.min_box_area]
+
+
+class FastMotionDetector:
+    """
+    Frame differencing on a downscaled, optionally cropped frame
+
+    Per frame this is one resize, a grayscale conversion, a small blur, a
+    difference, a threshold and a pixel count - all into preallocated
+    buffers. Contours are only traced when boxes() is called (e.g. to draw
+    them).
+    """
+
+    name = "fast"
+
+    def __init__(self, threshold: int = 30, scale: float = 0.25, blur: int = 5,
+                 roi: Optional[Box] = None, min_box_area: float = 1000):
+        """
+        Args:
+            threshold: Pixel difference that counts as a change
+            scale: Working size relative to the frame (0.25 = a quarter)
+            blur: Gaussian blur size at the working size (odd, 0 = no blur)
+            roi: Only look inside this (x, y, w, h) part of the frame
+            min_box_area: Ignore changed areas smaller than this in boxes()
+        """
+        if not 0 < scale <= 1:
+            raise ValueError("scale must be between 0 and 1")
+        self.threshold = threshold
+        self.scale = scale
+        self.blur = blur
+        self.roi = roi
+        self.min_box_area = min_box_area
+
+        self._shape = None  # Shape of the (cropped) input the buffers fit
+        self._small = None
+        self._gray = None
+        self._prev = None
+        self._diff = None
+        self._mask = None
+        self._has_prev = False
+        self._area_per_pixel = 1.0
+        self._offset = (0, 0)
+        self._to_full = (1.0, 1.0)
+
+    def reset(self):
+        self._has_prev = False
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        small_size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        self._shape = shape
+        self._small_size = small_size
+        self._small = np.empty((small_size[1], small_size[0], 3), np.uint8)
+        self._gray = np.empty((small_size[1], small_size[0]), np.uint8)
+        self._prev = np.empty_like(self._gray)
+        self._diff = np.empty_like(self._gray)
+        self._mask = np.empty_like(self._gray)
+        self._to_full = (width / small_size[0], height / small_size[1])
+        self._area_per_pixel = self._to_full[0] * self._to_full[1]
+        self._has_prev = False
+
+    def _crop(self, frame: np.ndarray) -> np.ndarray:
+        if self.roi is None:
+            self._offset = (0, 0)
+            return frame
+        x, y, w, h = self.roi
+        self._offset = (x, y)
+        return frame[y:y + h, x:x + w]  # A view - nothing is copied
+
+    def detect(self, frame: np.ndarray) -> Optional[MotionResult]:
+        """Compare with the previous frame (None for the very first frame)"""
+        frame = self._crop(frame)
+        if frame.shape != self._shape:
+            self._allocate(frame.shape)
+
+        cv2.resize(frame, self._small_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        # Swap buffers: last frame's gray becomes prev, and we write over the old prev
+        self._gray, self._prev = self._prev, self._gray
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self.blur:
+            cv2.GaussianBlur(self._gray, (self.blur, self.blur), 0, dst=self._gray)
+
+        if not self._has_prev:
+            self._has_prev = True
+            return None
+
+        cv2.absdiff(self._prev, self._gray, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+        changed = cv2.countNonZero(self._mask)
+
+        box = None
+        if changed:
+            x, y, w, h = cv2.boundingRect(self._mask)
+            box = self.to_full_box((x, y, w, h))
+        return MotionResult(changed * self._area_per_pixel, box, self._mask)
+
+    @property
+    def area_per_pixel(self) -> float:
+        """Full-frame pixels covered by one working-size pixel"""
+        return self._area_per_pixel
+
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        """Blurred grayscale of the last frame at the working size (reused buffer)"""
+        return self._gray if self._has_prev else None
+
+    def to_full_box(self, box: Box) -> Box:
+        """Convert a box on the working-size image to full-frame pixels"""
+        x, y, w, h = box
+        sx, sy = self._to_full
+        ox, oy = self._offset
+        return (int(x * sx) + ox, int(y * sy) + oy, int(np.ceil(w * sx)), int(np.ceil(h * sy)))
+
+    def boxes(self) -> List[Box]:
+        """Boxes around each changed area bigger than min_box_area (for drawing)"""
+        if self._mask is None:
+            return []
+        contours, _ = cv2.findContours(self._mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = self.min_box_area / self._area_per_pixel
+        return [self.to_full_box(cv2.boundingRect(c)) for c in contours
+                if cv2.contourArea(c) > min_area]
+
+
+MOTION_DETECTORS = {"fast": FastMotionDetector, "legacy": LegacyMotionDetector}
+
+
+def make_motion_detector(mode: str = "fast", **kwargs):
+    """
+    Create a motion detector by name
+
+    Args:
+        mode: "fast" or "legacy"
+        **kwargs: Passed to the detector (legacy ignores scale and roi)
+    """
+    if mode not in MOTION_DETECTORS:
+        raise ValueError(f"Unknown motion detection mode: {mode}")
+    if mode == "legacy":
+        kwargs.pop("scale", None)
+        if kwargs.pop("roi", None) is not None:
+            logger.warning("The legacy motion detector ignores the region of interest")
+    return MOTION_DETECTORS[mode](**kwargs)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Perceptual hash index - reuse verdicts for items that look the same
+
+Identical SKUs (the same charger, the same keyboard) come down the line over
+and over. A 64-bit perceptual hash of each analyzed frame is kept with its
+verdict; a new frame whose hash is within a small Hamming distance of a known
+one gets that verdict back without calling the AI.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = ".ewaste_cache/phash_index.json"
+
+# Verdict fields worth remembering
+VERDICT_FIELDS = ("item_name", "safety_level", "hazards", "notes")
+
+# The AI couldn't tell what it was - not worth reusing
+UNKNOWN_ITEM = "Unknown"
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    Difference hash: compares neighbouring pixels of a 9x8 thumbnail
+
+    Args:
+        image: BGR or grayscale image
+
+    Returns:
+        int: 64-bit hash
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash(image: np.ndarray) -> int:
+    """
+    DCT hash: compares the low-frequency DCT coefficients of a 32x32
+    thumbnail with their median (more robust to lighting than dhash)
+
+    Args:
+        image: BGR or grayscale image
+
+    Returns:
+        int: 64-bit hash
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    bits = low > np.median(low.flatten()[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+HASH_METHODS = {"dhash": dhash, "phash": phash}
+
+
+class PerceptualHashIndex:
+    """In-memory LRU index of frame hashes -> verdicts, persisted to JSON"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH, method: str = "phash",
+                 max_distance: int = 6, critical_max_distance: int = 2,
+                 critical_levels: Tuple[str, ...] = ("Safe to Shred", "Do Not Shred"),
+                 max_entries: int = 2000, namespace: str = "",
+                 autosave_every: int = 20):
+        """
+        Args:
+            path: JSON file to load/save the index (None keeps it in memory only)
+            method: "phash" or "dhash"
+            max_distance: Largest Hamming distance (out of 64) counted as a match
+            critical_max_distance: Stricter limit for safety-critical verdicts
+            critical_levels: Safety levels that use the stricter limit (by
+                             default the one that sends items to the
+                             shredder, and the one that must never)
+            max_entries: Least recently used hashes above this count are dropped
+            namespace: Analyzer configuration id; entries from another
+                       configuration (e.g. an older prompt) are ignored
+            autosave_every: Save to disk after this many new entries
+        """
+        if method not in HASH_METHODS:
+            raise ValueError(f"Unknown hash method: {method}")
+
+        self.path = Path(path) if path else None
+        self.method = method
+        self.hash_function = HASH_METHODS[method]
+        self.max_distance = max_distance
+        self.critical_max_distance = critical_max_distance
+        self.critical_levels = set(critical_levels)
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.autosave_every = autosave_every
+
+        self.entries = OrderedDict()  # hash -> verdict
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        self.load()
+
+    def hash_frame(self, frame: np.ndarray, box: Optional[Tuple[int, int, int, int]] = None) -> int:
+        """
+        Hash a frame, optionally only the (x, y, w, h) box around the object
+
+        Returns:
+            int: 64-bit perceptual hash
+        """
+        if box is not None:
+            x, y, w, h = box
+            crop = frame[y:y + h, x:x + w]
+            if crop.size:
+                frame = crop
+        return self.hash_function(frame)
+
+    def lookup(self, frame_hash: int) -> Optional[Dict]:
+        """
+        Find the closest known item, if it's within its allowed distance
+
+        Only the nearest item counts: when that's a safety-critical verdict
+        just outside the strict limit, the frame is a miss rather than a
+        match with some farther, less critical item. On a tie the critical
+        verdict is the one checked.
+
+        Returns:
+            A copy of the stored verdict plus "phash_distance", or None
+        """
+        best = None
+        best_distance = 65
+        best_critical = False
+        with self._lock:
+            for known_hash, verdict in self.entries.items():
+                distance = (known_hash ^ frame_hash).bit_count()
+                critical = verdict["safety_level"] in self.critical_levels
+                if distance < best_distance or (distance == best_distance
+                                                and critical and not best_critical):
+                    best, best_distance, best_critical = known_hash, distance, critical
+
+            limit = self.critical_max_distance if best_critical else self.max_distance
+            if best is None or best_distance > limit:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(best)
+            self.hits += 1
+            verdict = dict(self.entries[best])
+
+        verdict["phash_distance"] = best_distance
+        return verdict
+
+    def add(self, frame_hash: int, result: Dict) -> bool:
+        """
+        Remember the verdict for a frame (only call for successful analyses)
+
+        Returns:
+            False if it wasn't stored ("Unknown" items - the next similar
+            frame should be asked about again)
+        """
+        if result.get("item_name", UNKNOWN_ITEM) == UNKNOWN_ITEM:
+            return False
+        verdict = {field: result[field] for field in VERDICT_FIELDS if field in result}
+        with self._lock:
+            self.entries[frame_hash] = verdict
+            self.entries.move_to_end(frame_hash)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._unsaved += 1
+            save_now = self._unsaved >= self.autosave_every
+        if save_now:
+            self.save()
+        return True
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for reporting"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self):
+        """Load saved hashes (if the file matches our method and namespace)"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable hash index {self.path}: {e}")
+            return
+
+        if saved.get("method") != self.method or saved.get("namespace") != self.namespace:
+            logger.info("Hash index was built with a different configuration - starting fresh")
+            return
+
+        with self._lock:
+            for entry in saved.get("entries", [])[-self.max_entries:]:
+                if entry["verdict"].get("item_name", UNKNOWN_ITEM) != UNKNOWN_ITEM:
+                    self.entries[int(entry["hash"], 16)] = entry["verdict"]
+
+    def save(self):
+        """Write the index to disk (atomically, so a crash can't corrupt it)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "method": self.method,
+                "namespace": self.namespace,
+                "entries": [{"hash": f"{h:016x}", "verdict": v} for h, v in self.entries.items()],
+            }
+            self._unsaved = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
@@ -1,62 +1,69 @@
 #!/usr/bin/env python3
 
-import cv2
-import os
-from datetime import datetime
-from .camera_utils import find_available_camera
+from .camera_stream import get_shared_stream
+from .photo_store import PHOTOS_DIR, get_photo_writer
 
 
-def take_photo_from_front_camera(save_path=None):
+def capture_frame_from_front_camera():
     """
-    Takes a single photo from the front camera and saves it.
+    Takes a single frame from the front camera without saving it.
     Auto-detects available camera if default camera fails.
     
-    Args:
-        save_path: Optional custom path to save the photo. 
-                   If None, saves to captured_photos/ with timestamp.
-    
     Returns:
-        str: Path to the saved photo if successful, None if failed.
+        numpy.ndarray: The frame if successful, None if failed.
     """
-    # Create photos directory if it doesn't exist
-    photos_dir = "captured_photos"
-    if not os.path.exists(photos_dir):
-        os.makedirs(photos_dir)
+    # The camera stays open between photos (see CameraStream), so only the
+    # first photo waits for the camera to start
+    stream = get_shared_stream(0, 1920, 1080)  # Full HD for better quality
     
-    # Try to open camera with auto-detection
-    cap = cv2.VideoCapture(0)
-    
-    if not cap.isOpened():
+    if stream is None:
         print("Default camera not available, auto-detecting...")
-        camera_index = find_available_camera()
-        if camera_index is None:
+        stream = get_shared_stream(None, 1920, 1080)
+        if stream is None:
             print("Error: No camera found. Check camera connections.")
             return None
-        print(f"Found camera at index {camera_index}")
-        cap = cv2.VideoCapture(camera_index)
+        print(f"Found camera at index {stream.camera_index}")
+    
+    # Take photo (a private copy the caller can keep)
+    frame = stream.latest(copy=True)
     
-    # Set camera properties for better quality
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+    if frame is None:
+        print("Error: Failed to capture photo")
+        return None
     
-    # Take photo
-    ret, frame = cap.read()
+    return frame
+
+
+def photo_path_for_now():
+    """Default save location: captured_photos/ with a timestamp and a counter"""
+    # The counter keeps two photos taken in the same second apart
+    return get_photo_writer(PHOTOS_DIR).new_path("photo")
+
+
+def take_photo_from_front_camera(save_path=None):
+    """
+    Takes a single photo from the front camera and saves it.
+    Auto-detects available camera if default camera fails.
     
-    # Release camera immediately
-    cap.release()
+    Args:
+        save_path: Optional custom path to save the photo. 
+                   If None, saves to captured_photos/ with timestamp.
     
-    if not ret or frame is None:
-        print("Error: Failed to capture photo")
+    Returns:
+        str: Path to the saved photo if successful, None if failed.
+             The photo is written in the background and is on disk a
+             moment later (and always before the program exits).
+    """
+    frame = capture_frame_from_front_camera()
+    if frame is None:
         return None
     
     # Generate filename if not provided
     if save_path is None:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"photo_{timestamp}.jpg"
-        save_path = os.path.join(photos_dir, filename)
+        save_path = photo_path_for_now()
     
-    # Save the photo
-    cv2.imwrite(save_path, frame)
+    # Save the photo (encoded and written on the photo writer's thread)
+    get_photo_writer(PHOTOS_DIR).save(frame, save_path, block=True)
     print(f"Photo saved: {save_path}")
     
     return save_path
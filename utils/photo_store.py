@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Photo store - save captured photos without slowing the camera down
+
+PhotoWriter takes frames from any thread and encodes and writes them on its
+own background thread, through a small queue. If the disk can't keep up,
+new photos are dropped (and counted) instead of piling up in memory.
+
+File names get a counter after the timestamp, so two photos taken in the
+same second never overwrite each other. A retention limit (number of files
+and/or total size) deletes the oldest photos so a week of running doesn't
+fill the disk.
+"""
+
+import os
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PHOTOS_DIR = "captured_photos"
+DEFAULT_MAX_FILES = 10000
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+PHOTO_SUFFIX = ".jpg"
+
+
+class PhotoWriter:
+    """Background JPEG writer with collision-free names and a retention limit"""
+
+    def __init__(self, directory: str = PHOTOS_DIR, max_queue: int = 16,
+                 max_files: Optional[int] = DEFAULT_MAX_FILES,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES, quality: int = 95):
+        """
+        Args:
+            directory: Folder the photos go in (created if needed)
+            max_queue: Photos waiting to be written before new ones are dropped
+            max_files: Keep at most this many photos (None = no limit)
+            max_bytes: Keep at most this many bytes of photos (None = no limit)
+            quality: JPEG quality (0-100)
+        """
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.quality = quality
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._counter = 0
+        self._thread = None
+
+        # Photos on disk, oldest first, for the retention limit
+        self._files = deque()
+        self._total_bytes = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.deleted = 0
+        self.bytes_written = 0
+
+    def start(self):
+        """Create the folder, look at what's already there and start the writer"""
+        with self._start_lock:
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = []
+        for path in self.directory.glob(f"*{PHOTO_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            existing.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._files.append((path, size))
+            self._total_bytes += size
+        self._enforce_retention()
+
+        self._thread = threading.Thread(target=self._write_loop, name="photo-writer",
+                                        daemon=True)
+        self._thread.start()
+
+    def new_path(self, prefix: str = "photo") -> str:
+        """
+        A fresh photo path: <prefix>_<date>_<time>_<counter>.jpg
+
+        Never returns the same path twice, and skips names already on disk.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        with self._lock:
+            while True:
+                self._counter += 1
+                path = self.directory / f"{prefix}_{timestamp}_{self._counter:04d}{PHOTO_SUFFIX}"
+                if not path.exists():
+                    return str(path)
+
+    def save(self, frame: np.ndarray, path: Optional[str] = None, prefix: str = "photo",
+             block: bool = False) -> Optional[str]:
+        """
+        Queue a frame to be written
+
+        Args:
+            frame: Image to save (the caller must not modify it afterwards)
+            path: Where to save it (a new_path(prefix) if None)
+            prefix: Name prefix when no path is given
+            block: Wait for room in the queue instead of dropping the photo
+
+        Returns:
+            str: The photo's path, or None if it was dropped (queue full)
+        """
+        if self._thread is None:
+            self.start()
+        path = path or self.new_path(prefix)
+        try:
+            self._queue.put((frame, str(path)), block=block)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"Photo writer busy - dropped {path}")
+            return None
+        return str(path)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued photo is on disk
+
+        Returns:
+            bool: False if the timeout ran out first
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True).start()
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Write what's queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        """Photos written, dropped, failed and deleted, and what's on disk now"""
+        with self._lock:
+            return {
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "deleted": self.deleted,
+                "bytes_written": self.bytes_written,
+                "queued": self._queue.qsize(),
+                "files": len(self._files),
+                "bytes": self._total_bytes,
+            }
+
+    def _write_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                # A bad frame (cv2.error from imencode, etc.) mustn't stop the writer
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"Failed to save photo {job[1]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, frame: np.ndarray, path: str):
+        ok, buffer = cv2.imencode(PHOTO_SUFFIX, frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            with self._lock:
+                self.failed += 1
+            logger.error(f"Failed to encode photo {path}")
+            return
+
+        # Write to a temporary name first so nobody sees a half-written photo
+        path = Path(path)
+        temp = path.with_name(path.name + ".part")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp, "wb") as f:
+                f.write(buffer)
+            os.replace(temp, path)
+        except OSError as e:
+            with self._lock:
+                self.failed += 1
+            logger.error(f"Failed to save photo {path}: {e}")
+            try:
+                temp.unlink()  # Don't leave half-written files behind
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self.written += 1
+            self.bytes_written += buffer.size
+            if path.parent.resolve() == self.directory.resolve():
+                self._files.append((path, buffer.size))
+                self._total_bytes += buffer.size
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        """Delete the oldest photos until we're within the limits"""
+        while True:
+            with self._lock:
+                over_files = self.max_files is not None and len(self._files) > self.max_files
+                over_bytes = self.max_bytes is not None and self._total_bytes > self.max_bytes
+                if not self._files or not (over_files or over_bytes):
+                    return
+                path, size = self._files.popleft()
+                self._total_bytes -= size
+            try:
+                path.unlink()
+                with self._lock:
+                    self.deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Couldn't delete old photo {path}: {e}")
+
+
+_shared_writers: Dict[str, PhotoWriter] = {}
+_shared_lock = threading.Lock()
+
+
+def get_photo_writer(directory: str = PHOTOS_DIR) -> PhotoWriter:
+    """
+    The running writer for a folder, started on first use
+
+    Everything saving into the same folder shares one writer, so the names
+    and the retention limit cover all of it. Queued photos are written
+    before the program exits.
+    """
+    key = str(Path(directory).resolve())
+    with _shared_lock:
+        writer = _shared_writers.get(key)
+        if writer is None:
+            writer = _shared_writers[key] = PhotoWriter(directory)
+            writer.start()
+        return writer
+
+
+def close_photo_writers():
+    """Finish writing and stop all shared writers"""
+    with _shared_lock:
+        writers = list(_shared_writers.values())
+        _shared_writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_photo_writers)
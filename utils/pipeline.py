@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Pipeline stages - worker threads connected by bounded queues
+
+Each stage has its own small queue and pool of worker threads, so a slow
+stage (the AI, a servo) never stops the stages before it. Queues are bounded:
+when one is full the stage feeding it has to wait (or, for the camera loop,
+hold off on new items) instead of piling up work without limit. Every stage
+counts what it did so the pipeline can report throughput and queue depths.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Put on a stage's queue to tell one of its workers to finish
+_STOP = object()
+
+
+def placeholder(seq: int, error: str) -> Dict:
+    """Stands in for an item that failed, so ordered stages don't wait for it"""
+    return {"seq": seq, "error": error, "skipped": True}
+
+
+class StageStats:
+    """Items handled and time spent by one stage"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.count = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, error: bool = False):
+        with self._lock:
+            self.count += 1
+            self.busy_seconds += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "per_second": self.count / elapsed,
+                "average_seconds": self.busy_seconds / self.count if self.count else 0.0,
+            }
+
+
+class WorkerStage:
+    """
+    A bounded queue feeding a pool of worker threads
+
+    Items are dicts. Whatever handler(item) returns is passed to the
+    `output` stage (if any), waiting while that stage's queue is full - that
+    is the backpressure. With ordered=True items are handled strictly in
+    order of item["seq"] (0, 1, 2, ...) however they arrive. If a handler
+    raises or returns None, an ordered next stage gets a placeholder
+    ({"seq": ..., "error": ..., "skipped": True}) in its place, which it
+    skips instead of waiting forever for that seq.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict], Optional[Dict]],
+                 workers: int = 1, max_queue: int = 4,
+                 output: Optional["WorkerStage"] = None, ordered: bool = False):
+        """
+        Args:
+            name: Name used in reports and thread names
+            handler: Function that processes one item
+            workers: Number of worker threads (ordered stages use one)
+            max_queue: Most items waiting in the queue
+            output: Next stage to pass results to
+            ordered: Handle items in item["seq"] order
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = 1 if ordered else max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.output = output
+        self.ordered = ordered
+
+        self.queue = queue.Queue(maxsize=self.max_queue)
+        self.stats = StageStats()
+        self.max_depth = 0
+        self.in_progress = 0
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        # Ordered stages park early arrivals here until their turn comes
+        self._next_seq = 0
+        self._waiting: Dict[int, Dict] = {}
+        self.skipped = 0  # Placeholders for items an earlier stage lost
+
+    def start(self):
+        """Start the worker threads"""
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item: Dict, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Queue an item
+
+        Args:
+            item: The item to process
+            block: Wait for room if the queue is full
+            timeout: Most seconds to wait (None = as long as it takes)
+
+        Returns:
+            bool: False if the queue stayed full
+        """
+        try:
+            self.queue.put(item, block=block, timeout=timeout)
+        except queue.Full:
+            return False
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def full(self) -> bool:
+        """True if submitting now would have to wait"""
+        return self.queue.full()
+
+    @property
+    def depth(self) -> int:
+        """Items waiting in the queue (and, for ordered stages, parked)"""
+        return self.queue.qsize() + len(self._waiting)
+
+    @property
+    def pending(self) -> int:
+        """Items queued or being worked on"""
+        return self.depth + self.in_progress
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Stop the workers
+
+        Args:
+            drain: Finish everything already queued first
+            timeout: Most seconds to wait for the workers
+        """
+        if not drain:
+            try:
+                while True:
+                    self.queue.get_nowait()
+            except queue.Empty:
+                pass
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._waiting:
+            logger.warning(f"{self.name} stage stopped with {len(self._waiting)} items "
+                           f"still waiting for item {self._next_seq}")
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            if not self.ordered:
+                self._handle(item)
+                continue
+
+            # Hold items that overtook an earlier one, then run every item
+            # whose turn has come
+            self._waiting[item["seq"]] = item
+            while self._next_seq in self._waiting:
+                waiting = self._waiting.pop(self._next_seq)
+                if waiting.get("skipped"):
+                    self.skipped += 1
+                    logger.warning(f"{self.name} stage skipped item {waiting['seq']}: "
+                                   f"{waiting['error']}")
+                    self._forward(waiting)
+                else:
+                    self._handle(waiting)
+                self._next_seq += 1
+
+    def _forward(self, result: Optional[Dict], item: Optional[Dict] = None,
+                 error: str = "no result"):
+        """Pass a result on - or, for an ordered next stage, a placeholder"""
+        if self.output is None:
+            return
+        if result is None:
+            if not self.output.ordered or item is None or "seq" not in item:
+                return
+            result = placeholder(item["seq"], error)
+        self.output.submit(result)
+
+    def _handle(self, item: Dict):
+        with self._lock:
+            self.in_progress += 1
+        start = time.perf_counter()
+        error = None
+        try:
+            result = self.handler(item)
+        except Exception as e:
+            logger.exception(f"{self.name} stage failed: {e}")
+            result, error = None, f"{self.name} failed: {e}"
+        finally:
+            with self._lock:
+                self.in_progress -= 1
+        self.stats.record(time.perf_counter() - start, error is not None)
+
+        self._forward(result, item, error or f"{self.name} gave no result")
+
+    def report(self) -> Dict:
+        """Throughput, average time per item and queue depth"""
+        report = self.stats.snapshot()
+        report.update({
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "capacity": self.max_queue,
+            "in_progress": self.in_progress,
+            "workers": self.workers,
+            "skipped": self.skipped,
+        })
+        return report
+
+
+def format_report(stages: Dict[str, Dict]) -> str:
+    """
+    Turn stage reports into a small table
+
+    Args:
+        stages: {stage name: report dict} - reports without queue fields
+                (like the camera loop's) just show counts and rates
+    """
+    lines = [f"  {'stage':<10} {'items':>7} {'per s':>7} {'avg s':>7} {'queue':>7} {'max':>5}"]
+    for name, report in stages.items():
+        queue_text = f"{report['depth']}/{report['capacity']}" if "capacity" in report else "-"
+        max_text = str(report["max_depth"]) if "max_depth" in report else "-"
+        lines.append(f"  {name:<10} {report['count']:>7} {report['per_second']:>7.2f} "
+                     f"{report['average_seconds']:>7.3f} {queue_text:>7} {max_text:>5}")
+    return "\n".join(lines)
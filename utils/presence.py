@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Object presence - is something sitting in front of the camera?
+
+Comparing each frame with the one before only tells us whether something is
+*moving*: a still object looks exactly like an empty belt, and slow lighting
+changes look like objects. PresenceDetector instead keeps a model of the
+empty scene (MOG2, KNN or a simple running average) and measures how much of
+the current frame differs from it.
+
+TriggerStateMachine decides when to take the picture. It only sees
+"present" and "moving" flags for each frame, so it can be tested without a
+camera.
+"""
+
+import time
+import logging
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from .motion import Box, FastMotionDetector
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_METHODS = ("mog2", "knn", "ema")
+
+
+class PresenceResult:
+    """Foreground (not part of the empty scene) and motion in one frame"""
+
+    __slots__ = ("area", "box", "mask", "motion_area", "ready")
+
+    def __init__(self, area: float, box: Optional[Box], mask: np.ndarray,
+                 motion_area: float, ready: bool):
+        self.area = area  # Foreground area in full-frame pixels
+        self.box = box  # Box around the foreground (None if there is none)
+        self.mask = mask  # Foreground mask at the working size
+        self.motion_area = motion_area  # Area changed since the last frame
+        self.ready = ready  # False while the background is still being learned
+
+
+class PresenceDetector:
+    """
+    Foreground area and box relative to a learned empty scene
+
+    Works on the motion detector's small grayscale frame, so presence and
+    motion together cost one downscale per frame.
+    """
+
+    def __init__(self, method: str = "mog2", motion: Optional[FastMotionDetector] = None,
+                 learning_rate: float = 0.01, present_learning_rate: float = 0.001,
+                 ema_threshold: int = 25, warmup_frames: int = 30):
+        """
+        Args:
+            method: "mog2", "knn" or "ema" (running average)
+            motion: Motion detector to share the downscaled frame with
+                    (a FastMotionDetector with default settings if None)
+            learning_rate: How fast the empty-scene model adapts (0-1) -
+                           this follows slow lighting changes
+            present_learning_rate: Adaptation while an object is in view -
+                                   slow, so something left behind for good
+                                   eventually becomes part of the scene
+                                   (0 = never)
+            ema_threshold: Pixel difference that counts as foreground ("ema")
+            warmup_frames: Frames used to learn the scene before reporting
+        """
+        if method not in BACKGROUND_METHODS:
+            raise ValueError(f"Unknown background method: {method}")
+        self.method = method
+        self.motion = motion or FastMotionDetector()
+        self.learning_rate = learning_rate
+        self.present_learning_rate = present_learning_rate
+        self.ema_threshold = ema_threshold
+        self.warmup_frames = warmup_frames
+
+        self.frames_seen = 0
+        self._subtractor = None
+        self._background = None  # float32 running average ("ema")
+        self._mask = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.reset()
+
+    def reset(self):
+        """Forget the learned scene (e.g. after moving the camera)"""
+        self.frames_seen = 0
+        self._background = None
+        self._mask = None
+        if self.method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16,
+                                                                  detectShadows=False)
+        elif self.method == "knn":
+            self._subtractor = cv2.createBackgroundSubtractorKNN(history=500,
+                                                                 detectShadows=False)
+        self.motion.reset()
+
+    @property
+    def ready(self) -> bool:
+        return self.frames_seen >= self.warmup_frames
+
+    def update(self, frame: np.ndarray, learn: bool = True) -> Optional[PresenceResult]:
+        """
+        Measure the foreground in a frame and update the scene model
+
+        Args:
+            frame: BGR camera frame
+            learn: True while the scene is believed empty - the model then
+                   adapts at learning_rate, otherwise at present_learning_rate
+
+        Returns:
+            PresenceResult, or None for the very first frame
+        """
+        motion = self.motion.detect(frame)
+        gray = self.motion.gray
+        if gray is None:
+            return None
+        if self._mask is None or self._mask.shape != gray.shape:
+            self._mask = np.empty_like(gray)
+            self._background = None
+            self.frames_seen = 0
+
+        # Learn quickly at first, then slowly (and hardly at all around objects)
+        if not self.ready:
+            rate = max(self.learning_rate, 1.0 / (self.frames_seen + 1))
+        else:
+            rate = self.learning_rate if learn else self.present_learning_rate
+        self.frames_seen += 1
+
+        if self.method == "ema":
+            if self._background is None:
+                self._background = gray.astype(np.float32)
+            background = cv2.convertScaleAbs(self._background)
+            cv2.absdiff(gray, background, dst=self._mask)
+            cv2.threshold(self._mask, self.ema_threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+            if rate > 0:
+                cv2.accumulateWeighted(gray, self._background, rate)
+        else:
+            self._subtractor.apply(gray, self._mask, rate)
+
+        # Remove speckle noise (a 3x3 opening on the small mask is cheap)
+        cv2.morphologyEx(self._mask, cv2.MORPH_OPEN, self._kernel, dst=self._mask)
+
+        motion_area = motion.area if motion is not None else 0.0
+        if not self.ready:
+            return PresenceResult(0.0, None, self._mask, motion_area, False)
+
+        pixels = cv2.countNonZero(self._mask)
+        box = self.motion.to_full_box(cv2.boundingRect(self._mask)) if pixels else None
+        return PresenceResult(pixels * self.motion.area_per_pixel, box, self._mask,
+                              motion_area, True)
+
+
+class TriggerStateMachine:
+    """
+    Decides when an object has arrived and settled, and fires once per object
+
+    States:
+        empty      - nothing there
+        moving     - something is moving
+        settling   - still for fewer than stability_frames frames
+        held       - ready, but the caller can't take it yet (busy)
+        triggered  - fired this frame
+        present    - already fired, waiting for the object to leave
+        cooldown   - ignoring everything for a few frames after firing
+    """
+
+    def __init__(self, stability_frames: int = 10, cooldown_frames: int = 30,
+                 clear_frames: int = 1):
+        """
+        Args:
+            stability_frames: Still frames needed before firing
+            cooldown_frames: Frames ignored after firing
+            clear_frames: Empty frames in a row before a new object can fire
+        """
+        self.stability_frames = stability_frames
+        self.cooldown_frames = cooldown_frames
+        self.clear_frames = clear_frames
+
+        self.state = "empty"
+        self.stable_count = 0
+        self.cooldown_count = 0
+        self.empty_count = 0
+        self.handled = False  # Already fired for the object in view
+        self.arrived_at = None  # When the current object first showed up
+
+        self.started = time.monotonic()
+        self.triggers = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+
+    def update(self, present: bool, moving: bool, can_trigger: bool = True,
+               now: Optional[float] = None) -> bool:
+        """
+        Feed one frame
+
+        Args:
+            present: Something is in view
+            moving: Something moved since the last frame
+            can_trigger: False to hold off firing (e.g. analyzers are busy)
+            now: Frame time in seconds (defaults to time.monotonic())
+
+        Returns:
+            bool: True if the picture should be taken now
+        """
+        now = time.monotonic() if now is None else now
+
+        if self.cooldown_count > 0:
+            self.cooldown_count -= 1
+            self.state = "cooldown"
+            return False
+
+        if present or moving:
+            self.empty_count = 0
+            if self.arrived_at is None:
+                self.arrived_at = now
+        else:
+            self.empty_count += 1
+            if self.empty_count >= self.clear_frames:
+                self.handled = False
+                self.arrived_at = None
+
+        if moving:
+            self.stable_count = 0
+            self.state = "moving"
+            return False
+
+        if not present:
+            # Only still frames *with* the object count towards settling -
+            # otherwise an object that appears without visible motion fires
+            # on its very first frame
+            self.stable_count = 0
+            self.state = "empty"
+            return False
+        self.stable_count += 1
+        if self.handled:
+            self.state = "present"
+            return False
+        if self.stable_count <= self.stability_frames:
+            self.state = "settling"
+            return False
+        if not can_trigger:
+            self.state = "held"
+            return False
+
+        # Fire!
+        self.state = "triggered"
+        self.handled = True
+        self.cooldown_count = self.cooldown_frames
+        self.triggers += 1
+        if self.arrived_at is not None:
+            self.last_latency = now - self.arrived_at
+            self.total_latency += self.last_latency
+        return True
+
+    def stats(self) -> Dict:
+        """Triggers so far, per hour, and average time from arrival to trigger"""
+        hours = max(time.monotonic() - self.started, 1e-9) / 3600
+        return {
+            "triggers": self.triggers,
+            "per_hour": self.triggers / hours,
+            "average_latency": self.total_latency / self.triggers if self.triggers else 0.0,
+            "last_latency": self.last_latency,
+        }
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Replay and recording - run the detection loop without a camera
+
+ReplayStream plays back a video file or a folder of images and can be used
+anywhere a CameraStream is (same read/latest/last/stats methods). It plays
+at the recorded speed, faster or slower, or - with speed 0 - hands over
+every frame as fast as the caller asks for them, which makes benchmark runs
+repeatable on a machine without a camera.
+
+FrameRecorder saves a camera feed (e.g. a whole shift) to a video file or a
+folder of JPEGs, on a background thread, so it can be replayed later.
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mkv", ".mov", ".m4v"}
+DEFAULT_FPS = 30.0  # For image folders, and videos that don't say
+
+# Codec used for each recording container
+FOURCC = {".mp4": "mp4v", ".m4v": "mp4v", ".mov": "mp4v", ".avi": "MJPG", ".mkv": "MJPG"}
+
+
+class ImageSequenceCapture:
+    """Reads a folder of images in name order, like cv2.VideoCapture reads a video"""
+
+    def __init__(self, directory: str):
+        self.files = sorted(path for path in Path(directory).iterdir()
+                            if path.suffix.lower() in IMAGE_EXTENSIONS)
+        self.position = 0
+
+    def isOpened(self) -> bool:
+        return bool(self.files)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        while self.position < len(self.files):
+            frame = cv2.imread(str(self.files[self.position]))
+            self.position += 1
+            if frame is not None:
+                return True, frame
+            logger.warning(f"Skipping unreadable image {self.files[self.position - 1]}")
+        return False, None
+
+    def grab(self) -> bool:
+        """Skip a frame without decoding it"""
+        if self.position >= len(self.files):
+            return False
+        self.position += 1
+        return True
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        return 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            return True
+        return False
+
+    def release(self):
+        self.files = []
+
+
+def open_capture(path: str):
+    """cv2.VideoCapture for a video file, ImageSequenceCapture for a folder"""
+    if Path(path).is_dir():
+        return ImageSequenceCapture(path)
+    return cv2.VideoCapture(str(path))
+
+
+class ReplayStream:
+    """
+    Plays back a recording through the CameraStream interface
+
+    At speed > 0 frames are paced by their recorded frame rate and, like a
+    real camera, frames the caller was too busy to take are skipped. At
+    speed 0 there is no pacing and no skipping: read() returns every frame
+    in order, so the same recording always gives the same results.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False,
+                 fps: Optional[float] = None, buffer_size: int = 8):
+        """
+        Args:
+            path: Video file, or folder of images (played in name order)
+            speed: 1 = recorded speed, 2 = twice as fast, 0 = as fast as
+                   frames are read (every frame, no skipping)
+            loop: Start again from the beginning at the end
+            fps: Recorded frame rate (read from the video if None)
+            buffer_size: Recent frames kept for last()
+        """
+        if speed < 0:
+            raise ValueError("speed must be 0 or more")
+        self.path = str(path)
+        self.camera_index = self.path  # Shown where a camera number would be
+        self.speed = speed
+        self.loop = loop
+        self.buffer_size = max(2, buffer_size)
+        self.source_fps = fps
+
+        self.cap = None
+        self._recent = deque(maxlen=self.buffer_size - 1)
+        self._lock = threading.Lock()
+        self._position = 0  # Frame number in the recording of the next read
+        self._frame_id = -1
+        self._started = None
+        self._running = False
+        self.failed = False
+        self.ended = False
+        self.skipped = 0  # Frames skipped because the caller was too slow
+
+        self._fps = 0.0
+        self._last_time = None
+        self._last_frame_time = None
+
+    def start(self) -> bool:
+        """
+        Open the recording
+
+        Returns:
+            bool: True if it could be opened
+        """
+        if self._running:
+            return True
+        self.cap = open_capture(self.path)
+        if not self.cap.isOpened():
+            logger.error(f"Failed to open recording {self.path}")
+            self.cap = None
+            return False
+        if self.source_fps is None:
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self.source_fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self._position = 0
+        self._started = time.monotonic()
+        self.ended = False
+        self.failed = False
+        self._running = True
+        return True
+
+    def stop(self):
+        self._running = False
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __enter__(self):
+        if not self.start():
+            raise RuntimeError(f"Could not open recording {self.path}")
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _rewind(self) -> bool:
+        """Back to the first frame (for loop=True)"""
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+            self.cap.release()
+            self.cap = open_capture(self.path)
+        self._started = time.monotonic()
+        self._position = 0
+        return self.cap.isOpened()
+
+    def _next_frame(self) -> Optional[np.ndarray]:
+        ok, frame = self.cap.read()
+        if not ok and self.loop and self._position > 0 and self._rewind():
+            ok, frame = self.cap.read()
+        if not ok:
+            return None
+        self._position += 1
+        return frame
+
+    def read(self, timeout: Optional[float] = 2.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        The next frame, waiting until it is due at the chosen speed
+
+        Returns:
+            (ok, frame) - ok is False at the end of the recording
+        """
+        with self._lock:
+            if not self._running:
+                return False, None
+
+            if self.speed > 0:
+                interval = 1.0 / (self.source_fps * self.speed)
+                due = self._started + self._position * interval
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    # Behind: skip the frames a camera would have replaced already
+                    behind = int(-wait / interval)
+                    for _ in range(behind):
+                        if not self.cap.grab():
+                            break
+                        self._position += 1
+                        self.skipped += 1
+
+            frame = self._next_frame()
+            if frame is None:
+                self.ended = True
+                self._running = False
+                return False, None
+
+            now = time.monotonic()
+            if self._last_time is not None:
+                instant = 1.0 / max(now - self._last_time, 1e-6)
+                self._fps = instant if self._fps == 0 else 0.9 * self._fps + 0.1 * instant
+            self._last_time = now
+            self._last_frame_time = now
+
+            frame.flags.writeable = False
+            self._recent.append(frame)
+            self._frame_id += 1
+            return True, frame
+
+    def latest(self, timeout: Optional[float] = 2.0, copy: bool = False) -> Optional[np.ndarray]:
+        """The newest frame (reads the first one if nothing was read yet)"""
+        with self._lock:
+            frame = self._recent[-1] if self._recent else None
+        if frame is None:
+            ok, frame = self.read(timeout)
+            if not ok:
+                return None
+        return frame.copy() if copy else frame
+
+    def last(self, n: int, copy: bool = False) -> List[np.ndarray]:
+        """The newest n frames read, oldest first"""
+        with self._lock:
+            frames = list(self._recent)[-n:] if n > 0 else []
+        return [frame.copy() for frame in frames] if copy else frames
+
+    @property
+    def frame_id(self) -> int:
+        return self._frame_id
+
+    @property
+    def position(self) -> int:
+        """Frame number in the recording of the next frame"""
+        return self._position
+
+    @property
+    def fps(self) -> float:
+        """Rate frames are being handed out"""
+        return self._fps
+
+    def frame_age(self) -> float:
+        if self._last_frame_time is None:
+            return float('inf')
+        return time.monotonic() - self._last_frame_time
+
+    def stats(self) -> Dict:
+        return {
+            "frames": self._frame_id + 1,
+            "fps": self._fps,
+            "running": self._running,
+            "failed": self.failed,
+            "ended": self.ended,
+            "skipped": self.skipped,
+        }
+
+
+class FrameRecorder:
+    """
+    Records frames to a video file or a folder of JPEGs on a background thread
+
+    write() copies the frame and returns straight away. If encoding can't
+    keep up, frames are dropped (and counted) rather than slowing the
+    caller down.
+    """
+
+    def __init__(self, path: str, fps: float = DEFAULT_FPS, max_queue: int = 64,
+                 quality: int = 90):
+        """
+        Args:
+            path: Video file (.mp4, .avi, .mkv, .mov) or a folder for JPEGs
+            fps: Frame rate stored in the video
+            max_queue: Frames waiting to be written before new ones are dropped
+            quality: JPEG quality for folder recordings
+        """
+        self.path = Path(path)
+        self.fps = fps
+        self.quality = quality
+        self.to_video = self.path.suffix.lower() in VIDEO_EXTENSIONS
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.to_video:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Recording to {self.path}")
+
+    def write(self, frame: np.ndarray, block: bool = False) -> bool:
+        """
+        Queue a frame (a copy is taken, so ring-buffer views are fine)
+
+        Args:
+            frame: BGR frame
+            block: Wait for room instead of dropping the frame (for
+                   recordings made offline, where nothing must be lost)
+
+        Returns:
+            bool: False if the frame was dropped
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put(frame.copy(), block=block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Write what's queued and close the file"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.error("Recorder stopped responding")
+        self._thread.join(timeout)
+        self._thread = None
+        if self.dropped:
+            logger.warning(f"Recording dropped {self.dropped} frames (encoding too slow)")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_loop(self):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    return
+                if self.to_video:
+                    self._write_video(frame)
+                else:
+                    cv2.imwrite(str(self.path / f"{self.written:06d}.jpg"), frame,
+                                [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                self.written += 1
+        except Exception as e:
+            logger.error(f"Recording to {self.path} failed: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+                self._writer = None
+
+    def _write_video(self, frame: np.ndarray):
+        if self._writer is None:
+            # The size comes from the first frame
+            height, width = frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*FOURCC.get(self.path.suffix.lower(), "mp4v"))
+            self._writer = cv2.VideoWriter(str(self.path), fourcc, self.fps, (width, height))
+            if not self._writer.isOpened():
+                raise RuntimeError(f"Could not create video {self.path}")
+        self._writer.write(frame)
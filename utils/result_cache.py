@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Result cache - remembers verdicts for images we've already analyzed
+
+Entries are keyed by the SHA-256 of the image bytes inside a namespace made
+from everything that can change the answer (prompt, response schema, model).
+Editing prompt.md or the schema gives a new namespace, so old verdicts are
+never returned again and simply age out.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = ".ewaste_cache/results.sqlite"
+
+# Only rewrite an entry's last-access time if it is older than this
+ACCESS_UPDATE_INTERVAL = 3600.0
+
+# Verdicts and file hashes kept in memory in front of the database
+MEMORY_ENTRIES = 4096
+
+
+def make_namespace(instructions: str, response_schema: Dict, model_name: str,
+                   extra: Optional[Dict] = None) -> str:
+    """
+    Build the cache namespace for one analyzer configuration
+
+    Args:
+        instructions: Prompt text sent with every image
+        response_schema: JSON schema the model answers with
+        model_name: Model used for analysis
+        extra: Any other settings that change what the model sees
+
+    Returns:
+        str: Hex digest identifying this configuration
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(instructions.encode('utf-8')).digest())
+    digest.update(json.dumps(response_schema, sort_keys=True).encode('utf-8'))
+    digest.update(model_name.encode('utf-8'))
+    if extra:
+        digest.update(json.dumps(extra, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """SHA-256 hex digest of some image bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """Persistent SQLite-backed verdict cache with size and age eviction"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 50000,
+                 max_age_days: float = 30.0):
+        """
+        Open (or create) the cache
+
+        Args:
+            path: SQLite file to store verdicts in
+            max_entries: Least recently used entries above this count are evicted
+            max_age_days: Entries older than this are evicted
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+        # In-memory layer: (namespace, hash) -> (verdict, created, accessed)
+        self._memory = OrderedDict()
+        # path -> (size, mtime_ns, hash)
+        self._file_memory = OrderedDict()
+
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                namespace TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, image_hash)
+            )""")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        # Remember file hashes so unchanged files don't need to be re-read
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                image_hash TEXT NOT NULL
+            )""")
+        self.evict()
+
+    def hash_file(self, image_path: Path) -> str:
+        """
+        Content hash of an image file, reusing the stored hash if the file's
+        size and modification time haven't changed
+
+        Args:
+            image_path: Image file to hash
+
+        Returns:
+            str: SHA-256 hex digest of the file contents
+        """
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            row = self._file_memory.get(path)
+            if row is None:
+                row = self._db.execute(
+                    "SELECT size, mtime_ns, image_hash FROM file_hashes WHERE path = ?",
+                    (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self._remember_file(path, row)
+            return row[2]
+
+        with open(path, 'rb') as f:
+            image_hash = hash_bytes(f.read())
+
+        row = (stat.st_size, stat.st_mtime_ns, image_hash)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)", (path,) + row)
+        self._remember_file(path, row)
+        return image_hash
+
+    def _remember_file(self, path: str, row: tuple):
+        """Keep a file hash in memory"""
+        with self._lock:
+            self._file_memory[path] = row
+            self._file_memory.move_to_end(path)
+            if len(self._file_memory) > MEMORY_ENTRIES:
+                self._file_memory.popitem(last=False)
+
+    def _lookup(self, namespace: str, image_hash: str) -> Optional[list]:
+        """Find an entry in memory or on disk (lock must be held)"""
+        key = (namespace, image_hash)
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self._db.execute(
+                "SELECT verdict, created, accessed FROM results "
+                "WHERE namespace = ? AND image_hash = ?", key).fetchone()
+            if row is None:
+                return None
+            entry = [json.loads(row[0]), row[1], row[2]]
+            self._memory[key] = entry
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+        self._memory.move_to_end(key)
+        return entry
+
+    def get(self, namespace: str, image_hash: str) -> Optional[Dict]:
+        """
+        Look up a stored verdict
+
+        Returns:
+            The cached AI answer, or None if not cached (or expired)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._lookup(namespace, image_hash)
+            if entry is None or now - entry[1] > self.max_age:
+                self.misses += 1
+                return None
+            # Access times only matter for eviction, so don't write on every hit
+            if now - entry[2] > ACCESS_UPDATE_INTERVAL:
+                entry[2] = now
+                self._db.execute(
+                    "UPDATE results SET accessed = ? WHERE namespace = ? AND image_hash = ?",
+                    (now, namespace, image_hash))
+            self.hits += 1
+        return dict(entry[0])
+
+    def contains(self, namespace: str, image_hash: str) -> bool:
+        """Check for a fresh verdict without touching the hit/miss counters"""
+        with self._lock:
+            entry = self._lookup(namespace, image_hash)
+        return entry is not None and time.time() - entry[1] <= self.max_age
+
+    def put(self, namespace: str, image_hash: str, verdict: Dict):
+        """Store a verdict (evicting old entries every so often)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (namespace, image_hash, json.dumps(verdict), now, now))
+            self._memory[(namespace, image_hash)] = [dict(verdict), now, now]
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+            self._puts_since_evict += 1
+            evict_now = self._puts_since_evict >= 100
+        if evict_now:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used above max_entries"""
+        with self._lock:
+            self._puts_since_evict = 0
+            self._memory.clear()
+            self._db.execute("DELETE FROM results WHERE created < ?",
+                             (time.time() - self.max_age,))
+            count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,))
+            # File hash rows are cheap, but don't let them grow forever
+            count = self._db.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM file_hashes WHERE rowid IN "
+                    "(SELECT rowid FROM file_hashes ORDER BY rowid LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Results log - streams analysis results to an append-only JSONL file
+
+Every result is written (and flushed) as soon as it is ready, so a crash or
+Ctrl-C never loses finished work, and a later run can resume by skipping the
+files already recorded. Each result names the folder it came from, so one
+log can be shared by several folders. The summary is built incrementally
+from the stream instead of from a list of every result.
+"""
+
+import os
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = "analysis_results.jsonl"
+
+
+def result_key(result: Dict) -> str:
+    """
+    Identify the file a result belongs to (path inside the folder if known)
+
+    Keys are only unique within one folder - see the `root` filter of
+    read_results.
+    """
+    return result.get("path") or result["filename"]
+
+
+class ResultLog:
+    """Append-only JSONL writer"""
+
+    def __init__(self, path: str = DEFAULT_LOG_PATH, sync: bool = False):
+        """
+        Args:
+            path: File to append results to
+            sync: fsync after every line (survives power loss, but slower)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sync = sync
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, result: Dict):
+        """Write one result and flush it to disk"""
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+def read_results(path: str, root: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream results back from a log, one at a time
+
+    A half-written last line (from a crash mid-write) is skipped.
+
+    Args:
+        path: The results log
+        root: Only results for this folder (one log can be shared by
+              several folders); None returns every result
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable line {line_num} in {path}")
+                continue
+            if root is None or result.get("root") == root:
+                yield result
+
+
+def completed_files(path: str, root: Optional[str] = None) -> Set[str]:
+    """
+    Files that already have a successful result in the log
+
+    Failed results don't count, so resuming retries them.
+
+    Args:
+        path: The results log
+        root: Only files in this folder (see read_results)
+    """
+    done = set()
+    for result in read_results(path, root):
+        key = result_key(result)
+        if result.get("error"):
+            done.discard(key)
+        else:
+            done.add(key)
+    return done
+
+
+class SummaryStats:
+    """
+    Running totals for the processing summary
+
+    Each file's key is remembered with what it was counted as, so a file
+    that shows up again (retried after failing, or analyzed again by a
+    later run into the same log) replaces its old result instead of being
+    counted twice.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.levels = Counter()
+        self.failed = {}  # key -> safety level it was counted under
+        self.prepared = 0
+        self.bytes_saved = 0
+        self.latency_saved = 0.0
+        self._counted = {}  # key -> (safety level, (bytes saved, latency saved) or None)
+
+    def add(self, result: Dict):
+        """Count one result"""
+        key = result_key(result)
+
+        previous = self._counted.pop(key, None)
+        if previous is not None:
+            level, saved = previous
+            self.levels[level] -= 1
+            self.total -= 1
+            self.failed.pop(key, None)
+            if saved is not None:
+                self.prepared -= 1
+                self.bytes_saved -= saved[0]
+                self.latency_saved -= saved[1]
+
+        self.total += 1
+        self.levels[result['safety_level']] += 1
+        if result.get('error'):
+            self.failed[key] = result['safety_level']
+
+        saved = None
+        if 'bytes_saved' in result:
+            saved = (result['bytes_saved'], result['latency_saved'])
+            self.prepared += 1
+            self.bytes_saved += saved[0]
+            self.latency_saved += saved[1]
+        self._counted[key] = (result['safety_level'], saved)
+
+    @property
+    def errors(self) -> int:
+        return len(self.failed)
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict]) -> "SummaryStats":
+        """Build totals from any iterable of results (a list or a log stream)"""
+        stats = cls()
+        for result in results:
+            stats.add(result)
+        return stats
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Retries and circuit breaking for AI API calls
+
+Transient failures (rate limits, 5xx, timeouts, dropped connections) are
+retried with jittered exponential backoff, honouring any retry-after hint
+the server sends. If calls keep failing, the circuit breaker opens and
+further calls fail immediately for a while instead of each one waiting out
+its own timeouts, so the caller can queue the item and move on.
+"""
+
+import re
+import json
+import time
+import random
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# gRPC status names worth retrying
+TRANSIENT_GRPC_CODES = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED",
+                        "INTERNAL", "ABORTED"}
+
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry[- ]after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+def status_code(error: Exception):
+    """HTTP status (int) or gRPC status name (str) of an API error, if any"""
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            return None
+    if code is None:
+        return None
+    if isinstance(code, int):  # includes http.HTTPStatus
+        return int(code)
+    return getattr(code, "name", code)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Check if an error is worth retrying
+
+    Rate limits, server errors, timeouts, dropped connections and truncated
+    JSON answers are transient; bad requests, auth and permission errors
+    are not.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError, json.JSONDecodeError)):
+        return True
+
+    code = status_code(error)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS_CODES
+    if isinstance(code, str):
+        return code in TRANSIENT_GRPC_CODES
+
+    # requests/urllib3 connection problems don't share a base class with ours
+    name = type(error).__name__
+    return name in ("ConnectionError", "ReadTimeout", "ConnectTimeout", "ProtocolError")
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Find how long the server asked us to wait, if it said
+
+    Looks at a Retry-After header, a google.rpc.RetryInfo detail, and
+    finally the error message.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+
+    message = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff settings"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0,
+                 max_delay: float = 20.0):
+        """
+        Args:
+            max_attempts: Total tries, including the first one
+            base_delay: Backoff before the first retry (doubles each time)
+            max_delay: Never wait longer than this; a server asking for a
+                       longer wait counts as giving up
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """
+        How long to wait before retry number `attempt` (1 = first retry)
+
+        Returns:
+            Seconds to wait, or None to give up
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        # "Full jitter" so many callers don't all retry at the same moment
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            if hint > self.max_delay:
+                return None
+            backoff = max(backoff, hint)
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing API for a while
+
+    Closed: calls go through. After `failure_threshold` failures in a row it
+    opens: calls fail immediately with CircuitOpenError. After
+    `reset_timeout` seconds one trial call is let through (half-open); if it
+    works the breaker closes, otherwise it opens again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError if we shouldn't call the API right now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout or self.trial_running:
+                raise CircuitOpenError(
+                    f"AI service unavailable, not retrying for "
+                    f"{max(0.0, self.reset_timeout - waited):.0f}s")
+            self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("AI service is back - circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release_trial(self):
+        """
+        The call ended without saying whether the service works (e.g. a bad
+        request) - let another trial through, but don't close the breaker
+        """
+        with self._lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None
+                                      and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    logger.warning(f"{self.failures} failed AI calls in a row - circuit open")
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+def call_with_retry(function: Callable, policy: RetryPolicy,
+                    breaker: Optional[CircuitBreaker] = None,
+                    before_attempt: Optional[Callable] = None):
+    """
+    Call function(), retrying transient errors
+
+    Args:
+        function: The API call
+        policy: Backoff settings
+        breaker: Optional circuit breaker shared by all callers
+        before_attempt: Called before every attempt (e.g. rate limiter)
+
+    Returns:
+        Whatever function returns
+
+    Raises:
+        CircuitOpenError if the breaker is open, otherwise the last error
+    """
+    attempt = 0
+    while True:
+        if breaker:
+            breaker.before_call()
+        if before_attempt:
+            before_attempt()
+
+        try:
+            result = function()
+        except Exception as error:
+            transient = is_transient(error)
+            if breaker:
+                # Only count failures that say something about the service -
+                # a rejected request doesn't mean it's healthy either
+                if transient:
+                    breaker.record_failure()
+                else:
+                    breaker.release_trial()
+            if not transient:
+                raise
+
+            # Don't sit out a backoff if the breaker has just given up
+            if breaker and breaker.state == "open":
+                raise
+
+            attempt += 1
+            delay = policy.delay(attempt, error)
+            if delay is None:
+                raise
+            logger.warning(f"AI call failed ({error}), retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Image scanner - lazily walks (possibly huge, nested) image folders
+
+Files are yielded one at a time as directories are read, so analysis can
+start right away and the full file list never has to fit in memory. Sharding
+splits an archive between machines by hashing each file's relative path, so
+every machine gets a stable, non-overlapping share without coordinating.
+"""
+
+import os
+import zlib
+import fnmatch
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """
+    Parse a shard spec like "2/8" (shard 2 of 8, counting from 0)
+
+    Returns:
+        (shard_index, shard_count)
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got '{text}'")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, got '{text}'")
+    return index, count
+
+
+def parse_since(text: str) -> float:
+    """Parse an ISO date/time (e.g. 2025-08-01 or 2025-08-01T14:30) to a timestamp"""
+    return datetime.fromisoformat(text).timestamp()
+
+
+def in_shard(relative_path: str, shard: Optional[Tuple[int, int]]) -> bool:
+    """Check if a file belongs to our shard (stable across machines and runs)"""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(relative_path.encode('utf-8')) % count == index
+
+
+def _matches(relative_path: str, name: str, patterns: Sequence[str]) -> bool:
+    """Glob match against either the relative path or just the file name"""
+    return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+               for pattern in patterns)
+
+
+def scan_images(root: str, recursive: bool = True,
+                include: Optional[Sequence[str]] = None,
+                exclude: Optional[Sequence[str]] = None,
+                modified_since: Optional[float] = None,
+                shard: Optional[Tuple[int, int]] = None,
+                extensions: Sequence[str] = IMAGE_EXTENSIONS) -> Iterator[Path]:
+    """
+    Yield image files under root, one directory at a time
+
+    Args:
+        root: Folder to scan
+        recursive: Also scan sub-folders
+        include: Only yield files matching one of these globs (path or name)
+        exclude: Skip files and folders matching any of these globs
+        modified_since: Only yield files modified at or after this timestamp
+        shard: (index, count) to only yield this machine's share of files
+        extensions: File extensions to accept (lower case, with dot)
+
+    Yields:
+        Path of each matching image, in a stable (sorted) order
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    root = os.fspath(root)
+    stack = [root]
+
+    # Folders already queued, by (device, inode) - symlinked folders are
+    # followed, but a link back up the tree mustn't loop forever
+    visited = set()
+    try:
+        info = os.stat(root)
+        visited.add((info.st_dev, info.st_ino))
+    except OSError:
+        pass
+
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                # Sorting one directory at a time keeps the order stable
+                # without ever listing the whole tree
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable folder {directory}: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative = os.path.relpath(entry.path, root).replace(os.sep, '/')
+
+            if exclude and _matches(relative, entry.name, exclude):
+                continue
+
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        info = os.stat(entry.path)
+                        key = (info.st_dev, info.st_ino)
+                        if key in visited:
+                            logger.warning(f"Skipping {entry.path}: already scanned "
+                                           f"(symlink loop?)")
+                        else:
+                            visited.add(key)
+                            subdirectories.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if not entry.name.lower().endswith(extensions):
+                continue
+            if include and not _matches(relative, entry.name, include):
+                continue
+            if not in_shard(relative, shard):
+                continue
+            if modified_since is not None:
+                try:
+                    if entry.stat().st_mtime < modified_since:
+                        continue
+                except OSError:
+                    continue
+
+            yield Path(entry.path)
+
+        # Visit sub-folders in name order (the stack pops the last one first)
+        stack.extend(reversed(subdirectories))
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Acknowledged serial protocol for the servo board
+
+Commands carry a sequence number ("L180@42"). The firmware (see
+arduino/simple_arduino_servo.ino) answers "ACK 42" when it reads the
+command and "DONE 42" when the motor is back home, or "ERR 42 <reason>".
+
+CommandTracker keeps the commands that are waiting for those replies. It
+resolves each command's Future when DONE arrives, spots commands that were
+never acknowledged (lost on the wire - these can safely be sent again) or
+never finished, and measures how long the board really takes. A resent
+command whose first copy did arrive (only the ACK was lost) is answered
+"ERR <seq> busy" by older firmware; that counts as an ACK. When the
+board goes away, commands it never acknowledged are kept to be sent again
+once it's back; ones it was in the middle of fail.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READY_LINE = "READY"  # Sent by the firmware once after start-up
+ACK_TIMEOUT = 0.5  # Seconds to wait for ACK before sending again
+DONE_MARGIN = 1.5  # Extra seconds allowed on top of the expected move time
+MAX_RESENDS = 1  # Resends of a command that was never acknowledged
+LATENCY_HISTORY = 500
+
+
+def format_command(command: str, seq: int) -> str:
+    """The line sent to the board, e.g. "L180@42" """
+    return f"{command}@{seq}"
+
+
+def parse_reply(line: str) -> Tuple[str, Optional[int], str]:
+    """
+    Split a line from the board
+
+    Returns:
+        (kind, seq, rest) - kind is "ACK", "DONE", "ERR", "READY" or
+        "OTHER"; seq is None when there isn't one
+    """
+    parts = line.strip().split(" ", 2)
+    kind = parts[0].upper() if parts and parts[0] else ""
+    if kind == READY_LINE:
+        return kind, None, ""
+    if kind in ("ACK", "DONE", "ERR") and len(parts) > 1:
+        try:
+            return kind, int(parts[1]), parts[2] if len(parts) > 2 else ""
+        except ValueError:
+            pass
+    return "OTHER", None, line.strip()
+
+
+class _Tracked:
+    __slots__ = ("seq", "command", "future", "created_at", "sent_at", "acked_at", "expected",
+                 "resends")
+
+    def __init__(self, seq: int, command: str, expected: float):
+        self.seq = seq
+        self.command = command
+        self.future = Future()
+        self.created_at = time.monotonic()
+        self.sent_at = self.created_at
+        self.acked_at = None
+        self.expected = expected
+        self.resends = 0
+
+
+class CommandTracker:
+    """Commands sent to the board that are still waiting for ACK or DONE"""
+
+    def __init__(self, ack_timeout: float = ACK_TIMEOUT, done_margin: float = DONE_MARGIN,
+                 max_resends: int = MAX_RESENDS):
+        """
+        Args:
+            ack_timeout: Seconds without ACK before a command counts as lost
+            done_margin: Seconds past the expected move time before a move
+                         that was acknowledged but never finished fails
+            max_resends: How often a lost command is sent again
+        """
+        self.ack_timeout = ack_timeout
+        self.done_margin = done_margin
+        self.max_resends = max_resends
+
+        self._lock = threading.Lock()
+        self._next_seq = 1
+        self._waiting: Dict[int, _Tracked] = {}
+
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0  # Never acknowledged, even after resending
+        self.resent = 0
+        self.timed_out = 0  # Acknowledged, but DONE never came
+        self.interrupted = 0  # The board went away in the middle of the move
+        self.expired = 0  # Board back too late to still send them
+        self.ack_latencies = deque(maxlen=LATENCY_HISTORY)
+        self.done_latencies = deque(maxlen=LATENCY_HISTORY)
+
+    def track(self, command: str, expected_seconds: float) -> Tuple[int, Future]:
+        """
+        Register a command about to be sent
+
+        Returns:
+            (seq, future) - send format_command(command, seq); the future's
+            result is True on DONE and False on ERR, drop or timeout
+        """
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            tracked = _Tracked(seq, command, expected_seconds)
+            self._waiting[seq] = tracked
+            self.sent += 1
+        return seq, tracked.future
+
+    def forget(self, seq: int):
+        """Stop tracking a command that couldn't be written at all"""
+        with self._lock:
+            tracked = self._waiting.pop(seq, None)
+        if tracked is not None:
+            tracked.future.set_result(False)
+
+    def on_line(self, line: str) -> str:
+        """
+        Handle one line from the board
+
+        Returns:
+            The reply kind (see parse_reply)
+        """
+        kind, seq, rest = parse_reply(line)
+        if seq is None:
+            return kind
+        now = time.monotonic()
+        finished = None
+        with self._lock:
+            tracked = self._waiting.get(seq)
+            if tracked is None:
+                return kind  # Late reply to a command we already gave up on
+            if kind == "ACK":
+                if tracked.acked_at is None:
+                    tracked.acked_at = now
+                    self.ack_latencies.append(now - tracked.sent_at)
+            elif kind == "DONE":
+                finished = self._waiting.pop(seq)
+                self.completed += 1
+                self.done_latencies.append(now - tracked.sent_at)
+            elif kind == "ERR" and tracked.resends and rest.strip() == "busy":
+                # The board is busy with our first copy - it's moving
+                if tracked.acked_at is None:
+                    tracked.acked_at = now
+                    self.ack_latencies.append(now - tracked.sent_at)
+            elif kind == "ERR":
+                finished = self._waiting.pop(seq)
+                self.errors += 1
+                logger.error(f"Board refused {tracked.command}: {rest}")
+        if finished is not None:
+            finished.future.set_result(kind == "DONE")
+        return kind
+
+    def check_timeouts(self) -> List[Tuple[int, str]]:
+        """
+        Fail overdue commands
+
+        Returns:
+            [(seq, command)] never acknowledged that should be sent again
+            (the board never saw them, so resending can't move a servo twice)
+        """
+        now = time.monotonic()
+        resend, failed = [], []
+        with self._lock:
+            for seq, tracked in list(self._waiting.items()):
+                if tracked.acked_at is None:
+                    if now - tracked.sent_at < self.ack_timeout:
+                        continue
+                    if tracked.resends < self.max_resends:
+                        tracked.resends += 1
+                        tracked.sent_at = now
+                        self.resent += 1
+                        resend.append((seq, tracked.command))
+                        continue
+                    self.dropped += 1
+                    logger.error(f"Command {tracked.command} (#{seq}) was never acknowledged")
+                elif now - tracked.acked_at < tracked.expected + self.done_margin:
+                    continue
+                else:
+                    self.timed_out += 1
+                    logger.error(f"Command {tracked.command} (#{seq}) never finished")
+                failed.append(self._waiting.pop(seq))
+        for tracked in failed:
+            tracked.future.set_result(False)
+        return resend
+
+    def connection_lost(self) -> int:
+        """
+        The board went away: fail the moves it had started (it restarts when
+        it comes back, so they won't finish) and keep the rest for replay()
+
+        Returns:
+            How many commands are kept
+        """
+        with self._lock:
+            started = [tracked for tracked in self._waiting.values()
+                       if tracked.acked_at is not None]
+            for tracked in started:
+                del self._waiting[tracked.seq]
+            self.interrupted += len(started)
+            kept = len(self._waiting)
+        for tracked in started:
+            logger.error(f"Command {tracked.command} (#{tracked.seq}) interrupted - "
+                         f"the Arduino went away mid-move")
+            tracked.future.set_result(False)
+        return kept
+
+    def replay(self, max_age: float) -> List[Tuple[int, str]]:
+        """
+        The board is back: commands to send again, oldest first
+
+        Args:
+            max_age: Commands created longer ago than this fail instead
+                     (the item has gone past the gate by now)
+
+        Returns:
+            [(seq, command)] to send
+        """
+        now = time.monotonic()
+        resend, expired = [], []
+        with self._lock:
+            for seq, tracked in sorted(self._waiting.items()):
+                if now - tracked.created_at > max_age:
+                    expired.append(self._waiting.pop(seq))
+                    continue
+                tracked.sent_at = now
+                tracked.resends = 0
+                resend.append((seq, tracked.command))
+            self.expired += len(expired)
+        for tracked in expired:
+            logger.error(f"Command {tracked.command} (#{tracked.seq}) too old to replay")
+            tracked.future.set_result(False)
+        return resend
+
+    def fail_all(self, reason: str):
+        """Fail everything still waiting (e.g. the port was closed)"""
+        with self._lock:
+            waiting = list(self._waiting.values())
+            self._waiting.clear()
+        for tracked in waiting:
+            logger.warning(f"Command {tracked.command} (#{tracked.seq}) abandoned: {reason}")
+            tracked.future.set_result(False)
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return len(self._waiting)
+
+    def stats(self) -> Dict:
+        """Counts, and ACK / completion latency (average and 95th percentile, seconds)"""
+        def summary(values):
+            if not values:
+                return {"mean": 0.0, "p95": 0.0}
+            ordered = sorted(values)
+            return {"mean": sum(ordered) / len(ordered),
+                    "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]}
+
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "completed": self.completed,
+                "errors": self.errors,
+                "dropped": self.dropped,
+                "resent": self.resent,
+                "timed_out": self.timed_out,
+                "interrupted": self.interrupted,
+                "expired": self.expired,
+                "waiting": len(self._waiting),
+                "ack_latency": summary(self.ack_latencies),
+                "actuation_latency": summary(self.done_latencies),
+            }
@@ -7,8 +7,13 @@ Simple L/R + degrees command format with auto port detection
 import serial
 import time
 import logging
-from typing import Optional
-from .arduino_utils import find_arduino_port
+import threading
+from concurrent.futures import Future
+from collections import deque
+from typing import Callable, Dict, Optional
+from .arduino_utils import PortWatcher, find_arduino_port, forget_arduino_port, wait_for_ready
+from .actuator import ActuatorWorker
+from .serial_protocol import CommandTracker, format_command
 
 # Configure logging
 logging.basicConfig(
@@ -17,19 +22,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# The board restarts when the port opens; the firmware says READY when it's
+# up. Older firmware says nothing, so then we wait this long.
+STARTUP_TIMEOUT = 2.5
+
+# After losing the Arduino, wait this long before trying again - doubling
+# after each failed try, up to the maximum (plugging it in tries at once)
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 5.0
+
+# Sorts wait this long for a lost Arduino to come back before failing
+REPLAY_WINDOW = 5.0
+
 
 class ArduinoController:
     """Simple Arduino servo controller with auto port detection"""
     
-    def __init__(self, port: str = None, baud_rate: int = 9600):
+    def __init__(self, port: str = None, baud_rate: int = 9600,
+                 auto_reconnect: bool = True, replay_window: float = REPLAY_WINDOW):
         """
         Initialize Arduino controller
         
         Args:
             port: Serial port (auto-detects if None)
             baud_rate: Communication speed (9600 for this Arduino)
+            auto_reconnect: If the Arduino goes away (USB unplugged, reset),
+                            keep trying to reconnect in the background
+            replay_window: Seconds a command may wait for the Arduino to come
+                           back - after that it fails (the item has passed)
         """
         # Auto-detect port if not provided
+        self.auto_port = port is None
         if port is None:
             port = find_arduino_port()
             if port is None:
@@ -39,6 +62,34 @@ class ArduinoController:
         self.baud_rate = baud_rate
         self.connection = None
         self.connected = False
+        
+        # Firmware that answers ACK/DONE (see utils/serial_protocol.py) -
+        # moves then take exactly as long as they take, and lost commands
+        # are noticed. Older firmware gets fire-and-forget with fixed times.
+        self.acknowledged = False
+        self.tracker = CommandTracker()
+        self._write_lock = threading.Lock()
+        self._reader = None
+        
+        # Reconnecting: a supervisor thread reopens the port after a drop.
+        # Commands wait (up to replay_window) instead of failing meanwhile.
+        self.auto_reconnect = auto_reconnect
+        self.replay_window = replay_window
+        self._state_lock = threading.Lock()
+        self._online = threading.Event()  # Set while connected
+        self._wake = threading.Event()  # Try reconnecting now
+        self._closing = False
+        self._supervisor = None
+        self._port_watcher = None
+        self.offline_since = None
+        self.losses = 0
+        self.reconnects = 0
+        self.reconnect_times = deque(maxlen=100)
+        self.failed_offline = 0  # Commands failed because the Arduino stayed away
+        self.replayed = 0  # Commands sent again after a reconnect
+        
+        # Sends sort commands in the background (started once connected)
+        self.actuator = ActuatorWorker(self._send_for_actuator)
     
     def connect(self) -> bool:
         """
@@ -55,19 +106,150 @@ class ArduinoController:
                 return False
         
         try:
-            self.connection = serial.Serial(self.port, self.baud_rate, timeout=1)
-            time.sleep(2)  # Wait for Arduino to initialize
-            
-            # Test connection by sending home command
-            self.send_command("H90")  # Home position
-            
-            self.connected = True
-            logger.info(f"Arduino connected on {self.port}")
-            return True
-                    
+            self._open()
         except serial.SerialException as e:
             logger.error(f"Failed to connect to Arduino: {e}")
+            if self.auto_port:
+                # The saved port is stale - look for the board again next time
+                forget_arduino_port()
+                self.port = None
+            return False
+        
+        self._online.set()
+        if not self.acknowledged:
+            logger.info("Arduino firmware doesn't acknowledge commands - using fixed "
+                        "move times (upload arduino/simple_arduino_servo.ino to upgrade)")
+        
+        # Test connection by sending home command
+        self.actuator.start()
+        self.actuator.submit("H90")  # Home position
+        
+        if self.auto_reconnect and self._supervisor is None:
+            self._closing = False
+            self._supervisor = threading.Thread(target=self._supervise,
+                                                name="arduino-supervisor", daemon=True)
+            self._supervisor.start()
+            # Plugging the board back in wakes the supervisor at once
+            self._port_watcher = PortWatcher(lambda added, removed: self._wake.set())
+            self._port_watcher.start()
+        
+        logger.info(f"Arduino connected on {self.port}")
+        return True
+    
+    def _open(self):
+        """Open the port, wait for the board to start and begin reading replies"""
+        connection = serial.Serial(self.port, self.baud_rate, timeout=0.1)
+        try:
+            # Wait for Arduino to initialize (as long as it takes, if it tells us)
+            acknowledged = wait_for_ready(connection, STARTUP_TIMEOUT)
+        except Exception:
+            connection.close()
+            raise
+        with self._state_lock:
+            self.connection = connection
+            self.acknowledged = acknowledged
+            self.connected = True
+        if acknowledged:
+            self._reader = threading.Thread(target=self._read_loop, args=(connection,),
+                                            name="arduino-reader", daemon=True)
+            self._reader.start()
+    
+    @property
+    def available(self) -> bool:
+        """Connected, or reconnecting and still within replay_window - worth sending sorts"""
+        if self.connected:
+            return True
+        if self._supervisor is None or self._closing or self.offline_since is None:
+            return False
+        return time.monotonic() < self.offline_since + self.replay_window
+    
+    def _connection_lost(self, connection, reason: str):
+        """The port failed: close it and let the supervisor bring it back"""
+        with self._state_lock:
+            if connection is not self.connection or not self.connected:
+                return  # Already handled (or an old connection)
+            self.connected = False
+            self._online.clear()
+            self.offline_since = time.monotonic()
+            self.losses += 1
+        logger.error(f"Lost the Arduino: {reason}")
+        try:
+            connection.close()
+        except Exception:
+            pass
+        kept = self.tracker.connection_lost()
+        if self._supervisor is not None and not self._closing:
+            if kept:
+                logger.warning(f"{kept} command(s) will be sent again after reconnecting")
+            self._wake.set()
+        else:
+            self.tracker.fail_all("connection lost")
+    
+    def _supervise(self):
+        """Reconnect after a drop, waiting longer after each failed try"""
+        delay = RECONNECT_MIN_DELAY
+        while not self._closing:
+            if self.connected:
+                delay = RECONNECT_MIN_DELAY
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if self._reconnect():
+                continue
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    
+    def _reconnect(self) -> bool:
+        if self.auto_port:
+            # It may come back under another name (see find_arduino_port)
+            self.port = find_arduino_port() or self.port
+        if self.port is None:
             return False
+        try:
+            self._open()
+        except (serial.SerialException, OSError) as e:
+            logger.debug(f"Reconnect to {self.port} failed: {e}")
+            return False
+        
+        seconds = time.monotonic() - self.offline_since
+        self.reconnects += 1
+        self.reconnect_times.append(seconds)
+        logger.info(f"Arduino reconnected on {self.port} after {seconds:.1f} s")
+        
+        # Commands the board never saw before it went away, oldest first. New
+        # sorts wait for _online, so they can't get in between; and each of
+        # these still has its actuator Future pending, so the actuator keeps
+        # its servo busy until the board reports it DONE.
+        for seq, command in self.tracker.replay(self.replay_window):
+            logger.info(f"Replaying {command} (#{seq})")
+            self.replayed += 1
+            self.send_command(format_command(command, seq))
+        self._online.set()  # Now the waiting sorts (after the replayed ones)
+        return True
+    
+    def _wait_online(self) -> bool:
+        """Wait for a reconnect (and its replay), up to replay_window after the drop"""
+        if self._online.is_set():
+            return self.connected
+        if self._supervisor is None or self._closing or self.offline_since is None:
+            return False
+        remaining = self.offline_since + self.replay_window - time.monotonic()
+        return self._online.wait(max(0.0, remaining)) and self.connected
+    
+    def _read_loop(self, connection):
+        """Replies from the board: resolve finished commands, resend lost ones"""
+        while self.connected and self.connection is connection:
+            try:
+                line = connection.readline()
+                if line:
+                    self.tracker.on_line(line.decode('utf-8', errors='replace'))
+                for seq, command in self.tracker.check_timeouts():
+                    logger.warning(f"No reply to {command} (#{seq}) - sending it again")
+                    self.send_command(format_command(command, seq))
+            except Exception as e:
+                self._connection_lost(connection, str(e))
+                return
     
     def send_command(self, command: str) -> bool:
         """
@@ -79,32 +261,102 @@ class ArduinoController:
         Returns:
             True if command sent successfully
         """
-        if not self.connected or not self.connection:
+        connection = self.connection
+        if not self.connected or not connection:
             logger.error("Arduino not connected")
             return False
         
         try:
             command_bytes = (command + '\n').encode('utf-8')
-            self.connection.write(command_bytes)
-            self.connection.flush()
+            with self._write_lock:
+                connection.write(command_bytes)
+                connection.flush()
             logger.info(f"Sent to Arduino: {command}")
             return True
                 
         except Exception as e:
             logger.error(f"Error sending command: {e}")
-            self.connected = False
+            self._connection_lost(connection, str(e))
             return False
     
-    def move_servo(self, direction: str, degrees: int = None) -> bool:
+    def send_tracked(self, command: str, expected_seconds: float) -> Future:
+        """
+        Send a command with a sequence number and follow it until the board
+        reports it done
+        
+        If the write fails and the Arduino is reconnecting, the command is
+        kept and sent again once it's back (or fails after replay_window).
+        
+        Args:
+            command: Command string (e.g., "L180")
+            expected_seconds: Roughly how long the move takes (for spotting
+                              moves that never finish)
+            
+        Returns:
+            Future - True when the board says DONE, False on an error, a
+            dropped command or a timeout
         """
-        Move servo to specified direction and degrees
+        seq, future = self.tracker.track(command, expected_seconds)
+        if not self.send_command(format_command(command, seq)) and not self.available:
+            self.tracker.forget(seq)
+        return future
+    
+    def _send_for_actuator(self, command: str):
+        # Always through _online: after a reconnect, connected is True before
+        # the replay has finished, and this must not overtake it
+        if not self._wait_online():
+            # Explicitly failed - the caller's callback hears about it
+            self.failed_offline += 1
+            logger.error(f"Arduino offline - {command} not sent")
+            return False
+        if self.acknowledged:
+            expected = self.actuator.move_seconds.get(command[:1].upper(), 0.0)
+            return self.send_tracked(command, expected)
+        if self.send_command(command):
+            return True
+        # Older firmware: nothing to replay from, so wait and try once more
+        if self._wait_online() and self.send_command(command):
+            return True
+        self.failed_offline += 1
+        return False
+    
+    def connection_stats(self) -> Dict:
+        """Drops, reconnects and commands lost to them"""
+        times = sorted(self.reconnect_times)
+        protocol = self.tracker.stats()
+        return {
+            "connected": self.connected,
+            "losses": self.losses,
+            "reconnects": self.reconnects,
+            "offline_seconds": (time.monotonic() - self.offline_since
+                                if not self.connected and self.offline_since else 0.0),
+            "reconnect_time": {
+                "mean": sum(times) / len(times) if times else 0.0,
+                "p95": times[min(len(times) - 1, int(0.95 * len(times)))] if times else 0.0,
+                "last": self.reconnect_times[-1] if times else 0.0,
+            },
+            "replayed": self.replayed,
+            "failed_offline": self.failed_offline,
+            "commands_lost": (self.failed_offline + protocol["interrupted"]
+                              + protocol["expired"]),
+        }
+    
+    def protocol_stats(self) -> Dict:
+        """Commands sent, completed and lost, and measured latencies (see CommandTracker)"""
+        stats = self.tracker.stats()
+        stats["acknowledged"] = self.acknowledged
+        return stats
+    
+    def servo_command(self, direction: str, degrees: int = None) -> Optional[str]:
+        """
+        Build the command for a servo move
         
         Args:
             direction: "left", "right", or "center"
             degrees: 0-180 (optional, defaults based on direction)
             
         Returns:
-            True if movement successful
+            Command string (e.g. "L180"), or None for an invalid direction
         """
         direction = direction.lower()
         
@@ -118,42 +370,85 @@ class ArduinoController:
                 degrees = 90   # Center position
             else:
                 logger.error(f"Invalid direction: {direction}")
-                return False
+                return None
         
         # Clamp degrees to valid range
         degrees = max(0, min(180, degrees))
         
         # Create command
         if direction == "left":
-            command = f"L{degrees}"
+            return f"L{degrees}"
         elif direction == "right":
-            command = f"R{degrees}"
+            return f"R{degrees}"
         elif direction == "center":
-            command = "L90"  # Either L90 or R90 centers both motors
-        else:
-            logger.error(f"Invalid direction: {direction}")
+            return "L90"  # Either L90 or R90 centers both motors
+        logger.error(f"Invalid direction: {direction}")
+        return None
+    
+    def move_servo(self, direction: str, degrees: int = None) -> bool:
+        """
+        Move servo to specified direction and degrees (sent right away,
+        without waiting for the move)
+        
+        Args:
+            direction: "left", "right", or "center"
+            degrees: 0-180 (optional, defaults based on direction)
+            
+        Returns:
+            True if movement successful
+        """
+        command = self.servo_command(direction, degrees)
+        if command is None:
             return False
         
         success = self.send_command(command)
         if success:
-            logger.info(f"Moved {direction} to {degrees} degrees")
+            logger.info(f"Moved {direction} to {command[1:]} degrees")
         return success
     
-    def sort_safe(self) -> bool:
-        """Sort item to safe bin (left motor: 0→180→0)"""
+    def move_servo_async(self, direction: str, degrees: int = None,
+                         callback: Optional[Callable[[bool], None]] = None) -> Future:
+        """
+        Queue a servo move and return at once
+        
+        Moves of the same servo run in order; a left and a right move can
+        run at the same time.
+        
+        Args:
+            direction: "left", "right", or "center"
+            degrees: 0-180 (optional, defaults based on direction)
+            callback: Called with True/False when the move has finished
+            
+        Returns:
+            Future - result() is True once the move is done, False if it
+            couldn't be sent
+        """
+        command = self.servo_command(direction, degrees)
+        if command is None:
+            future = Future()
+            future.set_result(False)
+            if callback:
+                callback(False)
+            return future
+        return self.actuator.submit(command, callback=callback)
+    
+    def sort_safe_async(self, callback: Optional[Callable[[bool], None]] = None) -> Future:
+        """Queue a sort to the safe bin (left motor: 0→180→0) - returns at once"""
         logger.info("Sorting to SAFE bin")
-        success = self.move_servo("left", 180)
-        if success:
-            time.sleep(2)  # Wait for movement to complete (Arduino auto-returns)
-        return success
+        return self.move_servo_async("left", 180, callback)
     
-    def sort_unsafe(self) -> bool:
-        """Sort item to unsafe bin (right motor: 180→0→180)"""
+    def sort_unsafe_async(self, callback: Optional[Callable[[bool], None]] = None) -> Future:
+        """Queue a sort to the unsafe bin (right motor: 180→0→180) - returns at once"""
         logger.info("Sorting to UNSAFE bin")
-        success = self.move_servo("right", 180)
-        if success:
-            time.sleep(2)  # Wait for movement to complete (Arduino auto-returns)
-        return success
+        return self.move_servo_async("right", 180, callback)
+    
+    def sort_safe(self) -> bool:
+        """Sort item to safe bin (left motor: 0→180→0) and wait until it's done"""
+        return self.sort_safe_async().result()
+    
+    def sort_unsafe(self) -> bool:
+        """Sort item to unsafe bin (right motor: 180→0→180) and wait until it's done"""
+        return self.sort_unsafe_async().result()
     
     def test_servo(self) -> bool:
         """
@@ -183,13 +478,32 @@ class ArduinoController:
     def disconnect(self):
         """Disconnect from Arduino"""
         if self.connection:
+            # Let queued sorts finish first (a reconnect may still bring them through)
+            self.actuator.stop(drain=True)
+            
+            # No more reconnecting
+            self._closing = True
+            self._wake.set()
+            if self._port_watcher:
+                self._port_watcher.stop()
+                self._port_watcher = None
+            if self._supervisor:
+                self._supervisor.join(timeout=STARTUP_TIMEOUT + 1.0)
+                self._supervisor = None
+            
             try:
-                self.move_servo("center")  # Center before disconnecting
-                self.connection.close()
+                if self.connected:
+                    self.move_servo("center")  # Center before disconnecting
                 self.connected = False
+                self._online.clear()
+                if self._reader:
+                    self._reader.join(timeout=1.0)
+                    self._reader = None
+                self.connection.close()
                 logger.info("Arduino disconnected")
             except:
                 pass
+            self.tracker.fail_all("disconnected")
 
 
 def main():
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Virtual Arduino - the servo board, simulated on a pseudo-terminal
+
+VirtualArduino creates a pty that behaves like the board running
+arduino/simple_arduino_servo.ino. It restarts when a program opens the port
+and says READY, answers ACK/DONE/ERR, and moves two virtual servos with the
+sketch's timing (1 s hold, then ~3 ms per degree back home). ArduinoController
+connects to it like to a real board:
+
+    sim = VirtualArduino(speed=10)     # 10x faster than real servos
+    sim.start()
+    arduino = ArduinoController(port=sim.port)
+
+It can also pretend to be the old firmware (no replies, blocking delay), drop
+commands or its replies on purpose, and be "unplugged" and plugged back in,
+to test how the sorter copes. Linux and macOS only (needs pty).
+
+From a terminal:
+    python -m utils.virtual_arduino --link /tmp/arduino --speed 5
+"""
+
+import os
+import pty
+import time
+import random
+import select
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Timing of arduino/simple_arduino_servo.ino
+HOLD_MS = 1000
+MS_PER_DEGREE = 3
+BOOT_SECONDS = 0.5  # Bootloader + setup() after the port opens
+
+LEFT_HOME = 0
+RIGHT_HOME = 180
+
+
+class _Motor:
+    __slots__ = ("name", "home", "angle", "state", "seq", "last_seq", "phase_end",
+                 "return_seconds")
+
+    def __init__(self, name: str, home: int):
+        self.name = name
+        self.home = home
+        self.angle = home
+        self.state = "idle"  # idle, holding, returning
+        self.seq = None
+        self.last_seq = None  # Last sequence number started (kept when idle)
+        self.phase_end = 0.0
+        self.return_seconds = 0.0
+
+
+class VirtualArduino:
+    """Simulated servo board on a pseudo-terminal"""
+
+    def __init__(self, link: Optional[str] = None, speed: float = 1.0,
+                 drop_rate: float = 0.0, legacy: bool = False,
+                 boot_seconds: float = BOOT_SECONDS, seed: Optional[int] = None,
+                 reply_drop_rate: float = 0.0):
+        """
+        Args:
+            link: Also make the port available under this path (a symlink
+                  that survives unplug()/plug(), like a udev rule)
+            speed: Run servo timing this many times faster than real
+            drop_rate: Fraction of received lines to lose (0-1)
+            legacy: Behave like the old sketch: no READY, no replies, and
+                    each move blocks the next one for the hold time
+            boot_seconds: Time from opening the port to READY (real time)
+            seed: Random seed for drop_rate and reply_drop_rate
+            reply_drop_rate: Fraction of ACK/DONE/ERR replies lost on the
+                             way back to the host (0-1)
+        """
+        if speed <= 0:
+            raise ValueError("speed must be more than 0")
+        self.link = link
+        self.speed = speed
+        self.drop_rate = drop_rate
+        self.reply_drop_rate = reply_drop_rate
+        self.legacy = legacy
+        self.boot_seconds = boot_seconds
+        self._random = random.Random(seed)
+
+        self.motors = {"left": _Motor("left", LEFT_HOME), "right": _Motor("right", RIGHT_HOME)}
+        self._master = None
+        self._port = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._buffer = b""
+        self._blocked_until = 0.0  # Legacy: busy in delay()
+        self._host_open = False
+
+        self.received = 0
+        self.dropped = 0
+        self.replies_dropped = 0
+        self.errors = 0
+        self.resets = 0
+        self.moves = {"left": 0, "right": 0}
+
+    # ------------------------------------------------------------------
+    # Port
+    # ------------------------------------------------------------------
+
+    @property
+    def port(self) -> Optional[str]:
+        """Path to open (the link if there is one)"""
+        return self.link or self._port
+
+    def start(self) -> str:
+        """Create the port and start the board; returns the port path"""
+        self.plug()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="virtual-arduino", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.unplug()
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def unplug(self):
+        """Pull the USB cable: the open port starts failing"""
+        with self._lock:
+            if self._master is not None:
+                os.close(self._master)
+                self._master = None
+            self._buffer = b""
+
+    def plug(self):
+        """Plug the board (back) in - a new port, the link follows it"""
+        with self._lock:
+            if self._master is not None:
+                return
+            master, slave = pty.openpty()
+            self._port = os.ttyname(slave)
+            os.close(slave)  # The host opens it; we only keep the master end
+            self._master = master
+            self._host_open = False
+            if self.link:
+                temp = f"{self.link}.new"
+                if os.path.lexists(temp):
+                    os.unlink(temp)
+                os.symlink(self._port, temp)
+                os.replace(temp, self.link)
+        logger.info(f"Virtual Arduino on {self.port}")
+
+    @property
+    def plugged_in(self) -> bool:
+        return self._master is not None
+
+    # ------------------------------------------------------------------
+    # Board
+    # ------------------------------------------------------------------
+
+    def angle(self, motor: str) -> int:
+        """Current angle of "left" or "right" """
+        return self.motors[motor].angle
+
+    def stats(self) -> Dict:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "replies_dropped": self.replies_dropped,
+            "errors": self.errors,
+            "resets": self.resets,
+            "moves": dict(self.moves),
+        }
+
+    def _write(self, text: str):
+        with self._lock:
+            if self._master is not None:
+                try:
+                    os.write(self._master, (text + "\r\n").encode())
+                except OSError:
+                    pass
+
+    def _reply(self, word: str, seq: Optional[int], reason: str = ""):
+        if seq is None:
+            return
+        if self.reply_drop_rate and self._random.random() < self.reply_drop_rate:
+            self.replies_dropped += 1
+            return
+        self._write(f"{word} {seq}" + (f" {reason}" if reason else ""))
+
+    def _reset(self):
+        """The board restarts whenever the port is opened (DTR reset)"""
+        self.resets += 1
+        self._buffer = b""
+        self._blocked_until = 0.0
+        for motor in self.motors.values():
+            motor.angle = motor.home
+            motor.state = "idle"
+            motor.seq = None
+            motor.last_seq = None
+
+    def _run(self):
+        booted_at = None
+        while self._running:
+            with self._lock:
+                master = self._master
+            if master is None:
+                time.sleep(0.02)
+                continue
+
+            poller = select.poll()
+            poller.register(master, select.POLLIN | select.POLLHUP)
+            try:
+                events = poller.poll(5)
+            except OSError:
+                continue
+            now = time.monotonic()
+            flags = 0
+            for _, event in events:
+                flags |= event
+
+            if flags & select.POLLHUP:
+                # Nobody has the port open
+                if self._host_open:
+                    self._host_open = False
+                time.sleep(0.01)
+                continue
+            if not self._host_open:
+                self._host_open = True
+                self._reset()
+                booted_at = now + self.boot_seconds
+                ready_sent = False
+
+            if now < booted_at:
+                # Still in the bootloader - anything sent now is lost
+                if flags & select.POLLIN:
+                    self._read(master)
+                    self._buffer = b""
+                continue
+            if not ready_sent:
+                ready_sent = True
+                if not self.legacy:
+                    self._write("READY")
+
+            if flags & select.POLLIN:
+                self._buffer += self._read(master)
+            self._update_motors(now)
+            if not self.legacy or now >= self._blocked_until:
+                self._handle_lines(now)
+
+    def _read(self, master: int) -> bytes:
+        try:
+            return os.read(master, 1024)
+        except OSError:
+            return b""
+
+    def _handle_lines(self, now: float):
+        while b"\n" in self._buffer:
+            raw, self._buffer = self._buffer.split(b"\n", 1)
+            line = raw.decode("utf-8", errors="replace").strip()
+            self.received += 1
+            if self.drop_rate and self._random.random() < self.drop_rate:
+                self.dropped += 1
+                continue
+            self._handle_command(line, now)
+            if self.legacy and now < self._blocked_until:
+                return  # The old sketch sits in delay() - the rest waits
+
+    def _handle_command(self, command: str, now: float):
+        # Optional "@<seq>" at the end (ignored by the old sketch)
+        seq = None
+        if "@" in command:
+            command, _, seq_text = command.partition("@")
+            if not self.legacy:
+                try:
+                    seq = int(seq_text)
+                except ValueError:
+                    seq = 0  # toInt() gives 0 for garbage
+        self._reply("ACK", seq)
+
+        # Sent again because our ACK got lost - we already have this one
+        for motor in self.motors.values():
+            if seq is not None and seq == motor.last_seq:
+                if motor.state == "idle":
+                    self._reply("DONE", seq)  # Already finished
+                return
+
+        if len(command) < 2:
+            self.errors += 1
+            self._reply("ERR", seq, "bad command")
+            return
+        direction = command[0].upper()
+        try:
+            degrees = int("".join(c for c in command[1:] if c.isdigit() or c == "-") or 0)
+        except ValueError:
+            degrees = 0
+        degrees = max(0, min(180, degrees))
+
+        if direction in ("L", "R"):
+            motor = self.motors["left" if direction == "L" else "right"]
+            if motor.state != "idle" and not self.legacy:
+                self.errors += 1
+                self._reply("ERR", seq, "busy")
+                return
+            motor.angle = degrees if direction == "L" else 180 - degrees
+            motor.state = "holding"
+            motor.seq = seq
+            motor.last_seq = seq
+            motor.phase_end = now + HOLD_MS / 1000 / self.speed
+            motor.return_seconds = degrees * MS_PER_DEGREE / 1000 / self.speed
+            self.moves[motor.name] += 1
+            if self.legacy:
+                # delay(1000), then write(home) and on to the next command
+                self._blocked_until = motor.phase_end
+                motor.return_seconds = 0.0
+        elif direction == "H":
+            for motor in self.motors.values():
+                if motor.state != "idle":
+                    self._reply("ERR", motor.seq, "cancelled")
+                motor.angle = motor.home
+                motor.state = "idle"
+            if self.legacy:
+                return
+            right = self.motors["right"]
+            right.state = "returning"  # Report DONE once both are back
+            right.seq = seq
+            right.last_seq = seq
+            right.phase_end = now + 180 * MS_PER_DEGREE / 1000 / self.speed
+        else:
+            self.errors += 1
+            self._reply("ERR", seq, "unknown command")
+
+    def _update_motors(self, now: float):
+        for motor in self.motors.values():
+            if motor.state == "idle" or now < motor.phase_end:
+                continue
+            if motor.state == "holding":
+                motor.angle = motor.home  # Return to home
+                motor.state = "returning"
+                motor.phase_end = now + motor.return_seconds
+            else:
+                motor.state = "idle"
+                self._reply("DONE", motor.seq)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated servo board on a pseudo-terminal")
+    parser.add_argument("--link", help="Stable path for the port, e.g. /tmp/arduino")
+    parser.add_argument("--speed", type=float, default=1.0, help="Servo timing speed-up")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of lines lost")
+    parser.add_argument("--reply-drop-rate", type=float, default=0.0,
+                        help="Fraction of replies lost")
+    parser.add_argument("--legacy", action="store_true", help="Act like the old firmware")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with VirtualArduino(args.link, args.speed, args.drop_rate, args.legacy,
+                        reply_drop_rate=args.reply_drop_rate) as sim:
+        print(f"Virtual Arduino on {sim.port} - press Ctrl+C to stop")
+        print(f"Try: python -c \"from utils.sorter import ArduinoController; "
+              f"a = ArduinoController('{sim.port}'); a.connect(); a.sort_safe()\"")
+        try:
+            while True:
+                time.sleep(10)
+                print(sim.stats())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()